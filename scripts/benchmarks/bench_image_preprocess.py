@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Measure what image preprocessing saves before Cloudflare AI analysis.
+
+For generated photos-like images in several formats and sizes, reports the
+upload size before and after preprocessing, the preprocessing time, and the
+estimated upload time of the base64 payload at --uplink-mbps. With --e2e, both
+variants are also sent through CloudflareAIService to the fake Workers AI
+server (scripts/tests/fake_workers_ai.py) and the end-to-end latency is
+compared.
+
+Examples:
+    python scripts/benchmarks/bench_image_preprocess.py
+    python scripts/benchmarks/bench_image_preprocess.py --sizes 4000x3000 --formats png,tiff --e2e
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts", "tests"))
+
+from src.services.image_preprocessing import prepare_image_for_ai
+
+
+def generate_image(width: int, height: int, fmt: str) -> bytes:
+    """Gradient with noise: compresses roughly like a photo, unlike flat colour."""
+    from PIL import Image
+
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    output = io.BytesIO()
+    image.save(output, format={'jpg': 'JPEG', 'tif': 'TIFF'}.get(fmt, fmt.upper()))
+    return output.getvalue()
+
+
+async def e2e_latency(payload: bytes, repeat: int) -> float:
+    from src.services.cloudflare_ai import CloudflareAIService
+
+    service = CloudflareAIService()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await service.analyze_image(payload)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preprocessing benchmark")
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000,16x16")
+    parser.add_argument("--formats", default="png,bmp,tiff,jpeg")
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="Uplink used to estimate transfer time")
+    parser.add_argument("--e2e", action="store_true", help="Also time analyze_image against the fake server")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.e2e:
+        from bench_cloudflare_ai import start_fake_server
+        os.environ["CLOUDFLARE_API_BASE"] = start_fake_server(["--latency-dist", "fixed", "--latency-ms", "50"]) + "/accounts"
+        os.environ.setdefault("CLOUDFLARE_ACCOUNT_ID", "local")
+        os.environ.setdefault("CLOUDFLARE_API_TOKEN", "local")
+
+    def upload_ms(size: int) -> float:
+        return size * 4 / 3 * 8 / (args.uplink_mbps * 1_000_000) * 1000
+
+    header = f"{'image':<18} {'original':>10} {'prepared':>10} {'saved':>7} {'prep ms':>8} {'upload ms':>16}"
+    print(header + ("  e2e ms (orig -> prepared)" if args.e2e else ""))
+    for size in args.sizes.split(','):
+        width, height = (int(v) for v in size.lower().split('x'))
+        for fmt in args.formats.split(','):
+            content = generate_image(width, height, fmt)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                prepared = prepare_image_for_ai(content)
+            prep_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            label = f"{size} {fmt}"
+            if prepared.skip_reason:
+                print(f"{label:<18} {len(content):>10} {'skipped':>10}   ({prepared.skip_reason})")
+                continue
+            saved = 1 - len(prepared.data) / len(content)
+            line = (f"{label:<18} {len(content):>10} {len(prepared.data):>10} {saved:>6.0%} {prep_ms:>8.1f} "
+                    f"{upload_ms(len(content)):>7.0f} -> {upload_ms(len(prepared.data)):<6.0f}")
+            if args.e2e:
+                before = asyncio.run(e2e_latency(content, args.repeat)) * 1000
+                after = asyncio.run(e2e_latency(prepared.data, args.repeat)) * 1000 + prep_ms
+                line += f"  {before:7.0f} -> {after:.0f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
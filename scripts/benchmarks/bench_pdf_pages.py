@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measure the speedup of page-parallel PDF conversion.
+
+Converts the same PDF through ConversionService with 1 worker process and then
+with each --workers count, reporting wall time and speedup over the serial run.
+Without --file, a text-only PDF of --pages pages is generated.
+
+Examples:
+    python scripts/benchmarks/bench_pdf_pages.py --pages 300 --workers 2,4,8
+    python scripts/benchmarks/bench_pdf_pages.py --file report.pdf --workers 4 --spec 1-50
+    python scripts/benchmarks/bench_pdf_pages.py --workers 1 --engine pdfium
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from src.services.conversion import ConversionService
+from src.services.conversion_cache import ConversionCache
+from src.services.conversion_pool import ConversionPool
+
+
+def generate_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """Build a minimal multi-page PDF with a Helvetica text layer."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1} line {n}: the quick brown fox jumps over the lazy dog {page * n}"
+                 for n in range(lines_per_page)]
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 790 Td {text}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+async def timed_convert(workers: int, content: bytes, spec: str, engine: str, repeat: int) -> tuple:
+    service = ConversionService(ConversionPool(workers=workers), ConversionCache(max_chars=0))
+    service.start(['pdf'])
+    try:
+        # Warm-up: spawn the workers and import pdfminer in each
+        await asyncio.gather(*(service.convert(content, 'pdf', pages="1") for _ in range(max(workers, 1))))
+        options = {"pages": spec} if spec else {}
+        if engine:
+            options["engine"] = engine
+        best, output = float('inf'), ""
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = await service.convert(content, 'pdf', **options)
+            best = min(best, time.perf_counter() - start)
+        return best, output
+    finally:
+        service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-parallel PDF conversion benchmark")
+    parser.add_argument("--file", help="PDF to convert (default: generated)")
+    parser.add_argument("--pages", type=int, default=300, help="Pages in the generated PDF")
+    parser.add_argument("--workers", default=f"{os.cpu_count() or 1}", help="Comma separated worker counts")
+    parser.add_argument("--spec", default="", help="Page spec to convert, e.g. 1-50")
+    parser.add_argument("--engine", default="", help="PDF engine: auto, pdfium or pdfminer (default PDF_ENGINE)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            content = f.read()
+    else:
+        content = generate_pdf(args.pages)
+    print(f"PDF: {len(content) / (1024 * 1024):.1f}MB, {os.cpu_count()} CPUs")
+
+    serial, reference = asyncio.run(timed_convert(1, content, args.spec, args.engine, args.repeat))
+    print(f"workers=1   {serial:7.2f}s  engine {args.engine or 'default'}")
+    for workers in (int(w) for w in args.workers.split(',')):
+        if workers <= 1:
+            continue
+        elapsed, output = asyncio.run(timed_convert(workers, content, args.spec, args.engine, args.repeat))
+        same = "identical" if output == reference else "DIFFERS from serial output"
+        print(f"workers={workers:<3} {elapsed:7.2f}s  speedup {serial / elapsed:4.2f}x  ({same})")
+
+
+if __name__ == "__main__":
+    main()
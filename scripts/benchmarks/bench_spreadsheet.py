@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming xlsx converter against MarkItDown on a large workbook.
+
+Generates a workbook of --rows rows (openpyxl write-only mode), then converts
+it in a fresh process per engine so each reports its own latency and peak RSS.
+--sheet and --range exercise the selection path.
+
+Examples:
+    python scripts/benchmarks/bench_spreadsheet.py --rows 50000
+    python scripts/benchmarks/bench_spreadsheet.py --rows 50000 --range A1:C1000 --max-rows 0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+ENGINES = ('streaming', 'markitdown')
+
+
+def generate(path: str, rows: int, sheets: int) -> None:
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for index in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{index + 1}")
+        sheet.append(["id", "name", "city", "price", "in_stock", "updated"])
+        start = date(2024, 1, 1)
+        for row in range(rows):
+            sheet.append([row, f"Product {row}", f"City {row % 97}", round(row * 0.37, 2),
+                          row % 2 == 0, start + timedelta(days=row % 365)])
+    workbook.save(path)
+
+
+def run_engine(engine: str, path: str, sheet: str, cell_range: str, max_rows: int) -> dict:
+    """Convert in the current process and report latency and peak RSS."""
+    import resource
+    from src.services.converters import convert_with_markitdown
+    from src.services.spreadsheet_converters import convert_spreadsheet
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    start = time.perf_counter()
+    if engine == 'streaming':
+        output = convert_spreadsheet(content, 'xlsx', sheet=sheet or None, cell_range=cell_range or None,
+                                     max_rows=max_rows or sys.maxsize, max_chars=sys.maxsize)
+    else:
+        output = convert_with_markitdown(content, 'xlsx')
+    elapsed = time.perf_counter() - start
+    return {
+        "engine": engine,
+        "seconds": round(elapsed, 3),
+        "output_chars": len(output),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming spreadsheet converter benchmark")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--sheet", default="", help="Sheet selection passed to the streaming converter")
+    parser.add_argument("--range", dest="cell_range", default="", help="Cell range for the streaming converter")
+    parser.add_argument("--max-rows", type=int, default=0, help="Row cap per sheet (0 renders every row)")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--_run", help=argparse.SUPPRESS)
+    parser.add_argument("--_path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._run:
+        print(json.dumps(run_engine(args._run, args._path, args.sheet, args.cell_range, args.max_rows)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.xlsx")
+        start = time.perf_counter()
+        generate(path, args.rows, args.sheets)
+        print(f"workbook: {args.sheets} x {args.rows} rows, {os.path.getsize(path) / (1024 * 1024):.1f}MB "
+              f"(generated in {time.perf_counter() - start:.1f}s)")
+
+        for engine in args.engines.split(','):
+            command = [sys.executable, os.path.abspath(__file__), "--_run", engine, "--_path", path,
+                       "--sheet", args.sheet, "--range", args.cell_range, "--max-rows", str(args.max_rows)]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{engine:<11} failed: {completed.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{engine:<11} {result['seconds']:>7.2f}s  peak RSS {result['max_rss_mb']:>7.1f}MB  "
+                  f"output {result['output_chars'] / (1024 * 1024):.1f}M chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming CSV/JSON/XML converters on large generated files.
+
+Writes a synthetic file of --size-mb to a temp directory, converts it from disk
+with the streaming converter and reports throughput plus peak traced memory
+(measured in a second run, since tracemalloc slows execution). Use --max-rows 0
+to render every row; the output itself is then part of the peak.
+
+Examples:
+    python scripts/benchmarks/bench_structured.py --format csv --size-mb 100
+    python scripts/benchmarks/bench_structured.py --format json --size-mb 50 --compare
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from src.services.structured_converters import csv_to_markdown, json_to_markdown, xml_to_markdown
+
+CONVERTERS = {'csv': csv_to_markdown, 'json': json_to_markdown, 'xml': xml_to_markdown}
+
+
+def generate(path: str, fmt: str, size: int) -> int:
+    """Write roughly ``size`` bytes of tabular data. Returns the row count."""
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'csv':
+            f.write("id,name,city,price,in_stock,updated\n")
+        elif fmt == 'json':
+            f.write("[\n")
+        else:
+            f.write("<products>\n")
+        while f.tell() < size:
+            if fmt == 'csv':
+                f.write(f"{rows},Product {rows},City {rows % 97},{rows * 0.37:.2f},{rows % 2 == 0},2024-01-{rows % 28 + 1:02d}\n")
+            elif fmt == 'json':
+                prefix = ",\n" if rows else ""
+                f.write(prefix + json.dumps({"id": rows, "name": f"Product {rows}", "city": f"City {rows % 97}",
+                                             "price": round(rows * 0.37, 2), "in_stock": rows % 2 == 0}))
+            else:
+                f.write(f'<product id="{rows}"><name>Product {rows}</name><city>City {rows % 97}</city>'
+                        f'<price>{rows * 0.37:.2f}</price></product>\n')
+            rows += 1
+        f.write("\n]\n" if fmt == 'json' else "</products>\n" if fmt == 'xml' else "")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming structured converter benchmark")
+    parser.add_argument("--format", choices=sorted(CONVERTERS), default="csv")
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--max-rows", type=int, default=0, help="Row cap (0 renders every row)")
+    parser.add_argument("--compare", action="store_true", help="Also time MarkItDown on the same file")
+    args = parser.parse_args()
+
+    max_rows = args.max_rows or sys.maxsize
+    convert = CONVERTERS[args.format]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"bench.{args.format}")
+        rows = generate(path, args.format, int(args.size_mb * 1024 * 1024))
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"{args.format}: {size_mb:.1f}MB, {rows} rows, row cap {args.max_rows or 'none'}")
+
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            output = convert(f, max_rows=max_rows, max_chars=sys.maxsize)
+        elapsed = time.perf_counter() - start
+        output_mb = len(output) / (1024 * 1024)
+        del output
+        print(f"streaming:  {elapsed:.2f}s  {size_mb / elapsed:.1f} MB/s  output {output_mb:.1f}MB")
+
+        tracemalloc.start()
+        with open(path, 'rb') as f:
+            output = convert(f, max_rows=max_rows, max_chars=sys.maxsize)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        working = max(peak - sys.getsizeof(output), 0)
+        del output
+        print(f"peak traced {peak / (1024 * 1024):.1f}MB, excluding output {working / (1024 * 1024):.2f}MB, "
+              f"process max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+
+        if args.compare:
+            from src.services.converters import convert_with_markitdown
+            with open(path, 'rb') as f:
+                content = f.read()
+            start = time.perf_counter()
+            convert_with_markitdown(content, args.format)
+            elapsed = time.perf_counter() - start
+            print(f"markitdown: {elapsed:.2f}s  {size_mb / elapsed:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
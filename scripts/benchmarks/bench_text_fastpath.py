@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the native plain-text converters against the MarkItDown path.
+
+Simulates small-file-heavy traffic (txt, md, py, js, json between --min-kb and
+--max-kb) and times the in-process converter from the registry against
+MarkItDown's temp-file + convert() path for the same inputs.
+
+Example:
+    python scripts/benchmarks/bench_text_fastpath.py --files 2000 --min-kb 1 --max-kb 32
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from src.services.converters import convert_with_markitdown
+from src.services.text_converters import TEXT_EXTENSIONS, convert_text
+
+
+def make_sample(extension: str, size: int) -> bytes:
+    if extension == 'py':
+        unit = "def handler(event):\n    return {'ok': True, 'value': event * 2}\n\n"
+    elif extension == 'js':
+        unit = "function handler(event) {\n  return { ok: true, value: event * 2 };\n}\n\n"
+    elif extension == 'json':
+        unit = json.dumps({"id": 1, "name": "item", "tags": ["a", "b"], "price": 9.99}) + ",\n"
+    elif extension == 'md':
+        unit = "## Heading\n\nSome *markdown* text with `code` and a [link](http://example.com).\n\n"
+    else:
+        unit = "Plain text line with some words in it, and a café for good measure.\n"
+    text = unit * (size // len(unit) + 1)
+    return text[:size].encode('utf-8')
+
+
+def time_path(fn, samples):
+    latencies = []
+    for extension, content in samples:
+        start = time.perf_counter()
+        fn(content, extension)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(name, latencies):
+    total = sum(latencies)
+    ordered = sorted(latencies)
+    p99 = ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)]
+    print(f"{name:<12} total {total:>8.3f}s  mean {statistics.mean(latencies) * 1e6:>9.1f}us  "
+          f"p99 {p99 * 1e6:>9.1f}us  {len(latencies) / total:>10.0f} files/s")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plain-text fast path benchmark")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--min-kb", type=int, default=1)
+    parser.add_argument("--max-kb", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    extensions = sorted(TEXT_EXTENSIONS)
+    samples = [
+        (ext, make_sample(ext, rng.randint(args.min_kb, args.max_kb) * 1024))
+        for ext in (rng.choice(extensions) for _ in range(args.files))
+    ]
+    print(f"{args.files} files, {args.min_kb}-{args.max_kb}KB, extensions {extensions}\n")
+
+    native_total = summarize("native", time_path(convert_text, samples))
+    try:
+        # Warm up so MarkItDown's import/initialization is not counted
+        convert_with_markitdown(samples[0][1], samples[0][0])
+    except ImportError:
+        print("markitdown is not installed; skipping the comparison")
+        return
+    markitdown_total = summarize("markitdown", time_path(convert_with_markitdown, samples))
+    print(f"\nSpeedup: {markitdown_total / native_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
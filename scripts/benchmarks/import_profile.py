@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Startup profiling report: import time per module and converter load time per extension.
+
+Runs each measurement in a fresh interpreter so results reflect a cold worker:
+    1. ``python -X importtime -c "import src.main"`` aggregated per module and per
+       top-level package (what every process start / worker recycle pays)
+    2. time to load the converter for each extension via the converter registry
+       (what the first request for that extension pays, or what CONVERTER_PRELOAD
+       moves to startup)
+
+Examples:
+    python scripts/benchmarks/import_profile.py
+    python scripts/benchmarks/import_profile.py --module src.main_keycloak --top 40
+    python scripts/benchmarks/import_profile.py --extensions pdf,docx,xlsx,txt
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT, CONVERTER_PRELOAD="")
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+
+
+def import_times(module: str):
+    """Return (self_us, cumulative_us) per imported module name."""
+    proc = run_python(f"import {module}", "-X", "importtime")
+    if proc.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  self_us |  cumulative_us | <indent>module"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def converter_load_time(extension: str) -> float:
+    code = (
+        "import time, json\n"
+        "start = time.perf_counter()\n"
+        "from src.services.converters import converter_registry\n"
+        f"converter_registry.get({extension!r})\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    proc = run_python(code)
+    if proc.returncode != 0:
+        return float("nan")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and converter load profile")
+    parser.add_argument("--module", default="src.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--extensions", default="pdf,docx,pptx,xlsx,xls,msg,html,csv,json,txt,md,py,zip")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    times = import_times(args.module)
+    wall = time.perf_counter() - start
+
+    by_package = defaultdict(int)
+    for name, (self_us, _) in times.items():
+        by_package[name.split(".")[0]] += self_us
+    total_us = sum(by_package.values())
+
+    print(f"=== import {args.module}: {total_us / 1000:.0f}ms import time ({wall:.2f}s process wall) ===")
+    print(f"\n{'package':<40} {'self ms':>10} {'share':>7}")
+    for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<40} {us / 1000:>10.1f} {us / total_us:>7.1%}")
+
+    print(f"\n{'module':<60} {'cumulative ms':>14} {'self ms':>9}")
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{name:<60} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    print(f"\n=== converter load time per extension (fresh process each) ===")
+    for extension in args.extensions.split(","):
+        extension = extension.strip()
+        print(f".{extension:<8} {converter_load_time(extension) * 1000:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Replay inputs kept by the conversion flight recorder.
+
+Converts each quarantined input again in a fresh worker process, with the
+options it was recorded with, and reports wall time and peak worker RSS per
+run next to what was recorded. Used by the admin replay endpoint (--json) and
+by hand to check whether a fix helps.
+
+Examples:
+    python scripts/benchmarks/replay_quarantine.py --list
+    python scripts/benchmarks/replay_quarantine.py --id 1760000000-0123456789abcdef --repeat 3
+    python scripts/benchmarks/replay_quarantine.py --all --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from src.services.conversion_pool import ConversionPool
+from src.services.flight_recorder import FLIGHT_RECORDER_DIR, FlightRecorder, convert_document_watched
+
+
+async def replay(recorder: FlightRecorder, entry_id: str, repeat: int) -> dict:
+    meta = recorder.get(entry_id)
+    if meta is None:
+        return {"id": entry_id, "error": "not found"}
+    with open(recorder.input_path(entry_id), "rb") as f:
+        content = f.read()
+
+    runs = []
+    for _ in range(repeat):
+        # A fresh worker per run, so peak RSS is this conversion's own
+        pool = ConversionPool(workers=1)
+        pool.start([meta["extension"]])
+        try:
+            _, report = await pool.run(convert_document_watched, content, meta["extension"], meta["options"])
+            runs.append({"ok": True, "wall_seconds": report["wall_seconds"], "peak_rss_bytes": report["peak_rss_bytes"],
+                         "rss_growth_bytes": report["rss_growth_bytes"]})
+        except Exception as e:
+            runs.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            pool.shutdown()
+
+    timings = [run["wall_seconds"] for run in runs if run["ok"]]
+    return {
+        "id": entry_id,
+        "extension": meta["extension"],
+        "size_bytes": meta["size_bytes"],
+        "recorded": {"wall_seconds": meta["wall_seconds"], "peak_rss_bytes": meta["peak_rss_bytes"],
+                     "rss_growth_bytes": meta.get("rss_growth_bytes"), "reasons": meta["reasons"]},
+        "runs": runs,
+        "best_wall_seconds": min(timings) if timings else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay flight recorder quarantine entries")
+    parser.add_argument("--dir", default=FLIGHT_RECORDER_DIR, help="Quarantine directory (default FLIGHT_RECORDER_DIR)")
+    parser.add_argument("--id", action="append", default=[], help="Entry id (repeatable)")
+    parser.add_argument("--all", action="store_true", help="Replay every entry")
+    parser.add_argument("--list", action="store_true", help="List entries and exit")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per entry")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if not args.dir:
+        parser.error("no quarantine directory: pass --dir or set FLIGHT_RECORDER_DIR")
+    recorder = FlightRecorder(directory=args.dir)
+
+    if args.list:
+        for entry in recorder.list():
+            print(f"{entry['id']}  .{entry['extension']:<5} {entry['size_bytes'] / 1024:>9.1f}KB  "
+                  f"{entry['wall_seconds']:>7.2f}s  {', '.join(entry['reasons'])}")
+        return
+
+    ids = [entry["id"] for entry in recorder.list()] if args.all else args.id
+    if not ids:
+        parser.error("pass --id, --all or --list")
+    results = [asyncio.run(replay(recorder, entry_id, max(args.repeat, 1))) for entry_id in ids]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        if "error" in result:
+            print(f"{result['id']}: {result['error']}")
+            continue
+        recorded = result["recorded"]
+        print(f"{result['id']} (.{result['extension']}, recorded {recorded['wall_seconds']:.2f}s, "
+              f"{(recorded['peak_rss_bytes'] or 0) / (1024 * 1024):.0f}MB, "
+              f"+{(recorded['rss_growth_bytes'] or 0) / (1024 * 1024):.0f}MB during conversion)")
+        for run in result["runs"]:
+            if run["ok"]:
+                print(f"  {run['wall_seconds']:8.2f}s  {run['peak_rss_bytes'] / (1024 * 1024):8.0f}MB  "
+                      f"+{run['rss_growth_bytes'] / (1024 * 1024):.0f}MB")
+            else:
+                print(f"  failed: {run['error']}")
+
+
+if __name__ == "__main__":
+    main()
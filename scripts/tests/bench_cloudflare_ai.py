@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark and soak test for CloudflareAIService against the fake Workers AI server.
+
+Starts scripts/tests/fake_workers_ai.py in-process (or targets an already running
+instance with --base-url), points CLOUDFLARE_API_BASE at it and drives
+analyze_image/transcribe_audio at a fixed concurrency. Reports client-side
+throughput and latency percentiles together with what the fake server saw
+(requests received, peak concurrency), which exposes pooling, retry and
+concurrency behaviour of the service.
+
+Examples:
+    python scripts/tests/bench_cloudflare_ai.py --kind image --requests 500 --concurrency 50
+    python scripts/tests/bench_cloudflare_ai.py --kind audio --soak 600 --error-rate 0.05 --rate-limit-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from fake_workers_ai import create_app, parse_args as parse_fake_args, config_from_args
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(fake_argv: List[str]) -> str:
+    """Run the fake server on a background thread and return its accounts base URL."""
+    import uvicorn
+
+    port = free_port()
+    fake_args = parse_fake_args(fake_argv + ["--port", str(port)])
+    app = create_app(config_from_args(fake_args))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Fake Workers AI server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_load(service, kind: str, payload: bytes, concurrency: int,
+                   total: Optional[int], duration: Optional[float]):
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "none": 0, "exception": 0}
+    issued = 0
+    stop_at = time.perf_counter() + duration if duration else None
+
+    def next_slot() -> bool:
+        nonlocal issued
+        if stop_at is not None:
+            return time.perf_counter() < stop_at
+        if issued >= total:
+            return False
+        issued += 1
+        return True
+
+    async def worker():
+        while next_slot():
+            start = time.perf_counter()
+            try:
+                if kind == "image":
+                    result = await service.analyze_image(payload)
+                else:
+                    result = await service.transcribe_audio(payload)
+                outcomes["ok" if result else "none"] += 1
+            except Exception:
+                outcomes["exception"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, outcomes, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CloudflareAIService against a fake Workers AI")
+    parser.add_argument("--kind", choices=("image", "audio"), default="image")
+    parser.add_argument("--requests", type=int, default=200, help="Total calls (ignored with --soak)")
+    parser.add_argument("--soak", type=float, default=None, help="Run for this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--payload-kb", type=int, default=256, help="Size of the synthetic upload")
+    parser.add_argument("--base-url", default=None, help="Use a running fake server instead of starting one")
+    args, fake_argv = parser.parse_known_args()
+
+    server_url = args.base_url.rstrip("/") if args.base_url else start_fake_server(fake_argv)
+    os.environ["CLOUDFLARE_API_BASE"] = f"{server_url}/accounts"
+    os.environ.setdefault("CLOUDFLARE_ACCOUNT_ID", "local")
+    os.environ.setdefault("CLOUDFLARE_API_TOKEN", "local")
+
+    # Import after the environment is set so the service picks up the fake base URL
+    from src.services.cloudflare_ai import CloudflareAIService
+    import logging
+    logging.getLogger("src.services.cloudflare_ai").setLevel(logging.WARNING)
+
+    service = CloudflareAIService()
+    httpx.post(f"{server_url}/_fake/reset")
+    payload = os.urandom(args.payload_kb * 1024)
+
+    latencies, outcomes, elapsed = asyncio.run(
+        run_load(service, args.kind, payload, args.concurrency, args.requests, args.soak)
+    )
+    fake_stats = httpx.get(f"{server_url}/_fake/stats").json()
+    calls = len(latencies)
+    upstream_requests = sum(fake_stats["requests"].values())
+
+    print(f"\n=== {args.kind} x{calls} @ concurrency {args.concurrency} ({elapsed:.1f}s) ===")
+    print(f"Throughput:        {calls / elapsed:.1f} calls/s")
+    print(f"Latency mean:      {statistics.mean(latencies) * 1000:.0f} ms" if latencies else "Latency mean:      n/a")
+    for pct in (50, 90, 95, 99):
+        print(f"Latency p{pct:<2}:       {percentile(latencies, pct) * 1000:.0f} ms")
+    print(f"Outcomes:          {outcomes}")
+    print(f"Upstream requests: {upstream_requests} ({upstream_requests - calls:+d} vs calls, i.e. retries/hedges)")
+    print(f"Upstream outcomes: {fake_stats['outcomes']}")
+    print(f"Upstream peak concurrency: {fake_stats['peak_in_flight']}")
+    print(f"Upstream bytes received:   {fake_stats['bytes_received'] / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Cloudflare Workers AI endpoints used by CloudflareAIService.
+
+Serves ``POST /accounts/{account_id}/ai/run/@cf/...`` with configurable latency,
+error/429 rates and response shapes so image and audio throughput can be tested
+offline. Point the API at it with:
+
+    CLOUDFLARE_API_BASE=http://127.0.0.1:8787/accounts
+    CLOUDFLARE_ACCOUNT_ID=local
+    CLOUDFLARE_API_TOKEN=local
+
+Runtime control endpoints:
+    GET  /_fake/config   current configuration
+    PUT  /_fake/config   update any configuration field (JSON body)
+    GET  /_fake/stats    request counters, in-flight and peak concurrency
+    POST /_fake/reset    reset counters
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import random
+import time
+from dataclasses import dataclass, field, asdict, fields
+from typing import Dict, Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+IMAGE_MODEL = "@cf/microsoft/resnet-50"
+AUDIO_MODEL = "@cf/openai/whisper-large-v3-turbo"
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+RESPONSE_SHAPES = ("ok", "empty", "no-result", "string", "malformed")
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour of the fake server. Latencies are in milliseconds."""
+    latency_dist: str = "lognormal"
+    latency_ms: float = 250.0
+    latency_spread_ms: float = 100.0
+    audio_latency_factor: float = 4.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    rate_limit_rate: float = 0.0
+    retry_after: Optional[float] = 1.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 120.0
+    image_shape: str = "ok"
+    audio_shape: str = "ok"
+    require_auth: bool = True
+    seed: Optional[int] = None
+
+    def update(self, values: Dict[str, Any]) -> None:
+        known = {f.name for f in fields(self)}
+        for key, value in values.items():
+            if key not in known:
+                raise ValueError(f"Unknown config field: {key}")
+            setattr(self, key, value)
+        self.validate()
+
+    def validate(self) -> None:
+        if self.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}")
+        for shape in (self.image_shape, self.audio_shape):
+            if shape not in RESPONSE_SHAPES:
+                raise ValueError(f"shape must be one of {RESPONSE_SHAPES}")
+        for rate in (self.error_rate, self.rate_limit_rate, self.hang_rate):
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError("rates must be between 0 and 1")
+
+
+@dataclass
+class FakeStats:
+    requests: Dict[str, int] = field(default_factory=dict)
+    outcomes: Dict[str, int] = field(default_factory=dict)
+    bytes_received: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    def count(self, bucket: Dict[str, int], key: str) -> None:
+        bucket[key] = bucket.get(key, 0) + 1
+
+
+def sample_latency(config: FakeConfig, rng: random.Random, factor: float = 1.0) -> float:
+    """Draw one latency in seconds from the configured distribution."""
+    mean = config.latency_ms * factor
+    spread = config.latency_spread_ms * factor
+    if config.latency_dist == "fixed":
+        value = mean
+    elif config.latency_dist == "uniform":
+        value = rng.uniform(mean - spread, mean + spread)
+    elif config.latency_dist == "normal":
+        value = rng.gauss(mean, spread)
+    elif config.latency_dist == "exponential":
+        value = rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    else:
+        # lognormal with the given median and a long right tail, like real model latency
+        sigma = max(spread / mean, 0.01) if mean > 0 else 0.01
+        value = mean * rng.lognormvariate(0.0, sigma)
+    return max(value, 0.0) / 1000.0
+
+
+def _image_result(shape: str) -> Dict[str, Any]:
+    if shape == "empty":
+        return {"result": [], "success": True, "errors": [], "messages": []}
+    if shape == "no-result":
+        return {"success": True, "errors": [], "messages": []}
+    if shape == "string":
+        return {"result": "tabby, tabby cat", "success": True, "errors": [], "messages": []}
+    return {
+        "result": [
+            {"label": "TABBY", "score": 0.6123},
+            {"label": "TIGER CAT", "score": 0.2051},
+            {"label": "EGYPTIAN CAT", "score": 0.1102},
+            {"label": "LYNX", "score": 0.0214},
+            {"label": "PERSIAN CAT", "score": 0.0087},
+        ],
+        "success": True,
+        "errors": [],
+        "messages": [],
+    }
+
+
+def _audio_result(shape: str, audio_bytes: int) -> Dict[str, Any]:
+    if shape == "empty":
+        return {"result": {"text": "", "word_count": 0, "segments": []}, "success": True}
+    if shape == "no-result":
+        return {"success": True, "errors": [], "messages": []}
+    if shape == "string":
+        return {"result": "This is a transcription.", "success": True}
+    # Pretend 16 kB of payload is roughly one second of speech
+    duration = max(audio_bytes / 16000.0, 1.0)
+    segments = []
+    start = 0.0
+    index = 0
+    while start < duration:
+        end = min(start + 5.0, duration)
+        segments.append({"start": round(start, 2), "end": round(end, 2), "text": f"Segment {index} of the fake transcription."})
+        start = end
+        index += 1
+    text = " ".join(s["text"] for s in segments)
+    return {
+        "result": {"text": text, "word_count": len(text.split()), "segments": segments},
+        "success": True,
+        "errors": [],
+        "messages": [],
+    }
+
+
+def _error_body(code: int, message: str) -> Dict[str, Any]:
+    return {"result": None, "success": False, "errors": [{"code": code, "message": message}], "messages": []}
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    """Build the fake Workers AI application."""
+    config = config or FakeConfig()
+    config.validate()
+    stats = FakeStats()
+    rng = random.Random(config.seed)
+
+    app = FastAPI(title="Fake Workers AI", docs_url=None, redoc_url=None)
+    app.state.config = config
+    app.state.stats = stats
+
+    @app.get("/_fake/config")
+    async def get_config():
+        return asdict(config)
+
+    @app.put("/_fake/config")
+    async def put_config(request: Request):
+        try:
+            config.update(await request.json())
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+        return asdict(config)
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        data = asdict(stats)
+        data["uptime_seconds"] = round(time.time() - stats.started_at, 3)
+        return data
+
+    @app.post("/_fake/reset")
+    async def reset_stats():
+        nonlocal stats
+        stats = FakeStats()
+        app.state.stats = stats
+        return {"reset": True}
+
+    @app.post("/accounts/{account_id}/ai/run/{model:path}")
+    async def run_model(account_id: str, model: str, request: Request):
+        stats.count(stats.requests, model)
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            return await _run_model(model, request)
+        finally:
+            stats.in_flight -= 1
+
+    async def _run_model(model: str, request: Request) -> JSONResponse:
+        if config.require_auth and not request.headers.get("authorization", "").startswith("Bearer "):
+            stats.count(stats.outcomes, "401")
+            return JSONResponse(status_code=401, content=_error_body(10000, "Authentication error"))
+
+        body = await request.body()
+        stats.bytes_received += len(body)
+
+        if model not in (IMAGE_MODEL, AUDIO_MODEL):
+            stats.count(stats.outcomes, "404")
+            return JSONResponse(status_code=404, content=_error_body(5007, f"No such model {model}"))
+
+        try:
+            payload = await request.json()
+            field_name = "image" if model == IMAGE_MODEL else "file"
+            decoded = base64.b64decode(payload[field_name], validate=True)
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            stats.count(stats.outcomes, "400")
+            return JSONResponse(status_code=400, content=_error_body(5006, "Invalid input"))
+
+        # Rate limiting is decided before any model work, like the real gateway
+        if rng.random() < config.rate_limit_rate:
+            stats.count(stats.outcomes, "429")
+            headers = {}
+            if config.retry_after is not None:
+                headers["Retry-After"] = str(config.retry_after)
+            return JSONResponse(status_code=429, content=_error_body(3040, "Capacity temporarily exceeded"), headers=headers)
+
+        factor = config.audio_latency_factor if model == AUDIO_MODEL else 1.0
+        if rng.random() < config.hang_rate:
+            await asyncio.sleep(config.hang_seconds)
+        else:
+            await asyncio.sleep(sample_latency(config, rng, factor))
+
+        if rng.random() < config.error_rate:
+            stats.count(stats.outcomes, str(config.error_status))
+            return JSONResponse(status_code=config.error_status, content=_error_body(3043, "Internal server error"))
+
+        stats.count(stats.outcomes, "200")
+        if model == IMAGE_MODEL:
+            shape = config.image_shape
+            content = _image_result(shape)
+        else:
+            shape = config.audio_shape
+            content = _audio_result(shape, len(decoded))
+        if shape == "malformed":
+            return JSONResponse(status_code=200, content={"unexpected": True, "result": 42})
+        return JSONResponse(status_code=200, content=content)
+
+    return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    defaults = FakeConfig()
+    parser = argparse.ArgumentParser(description="Fake Cloudflare Workers AI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency_dist)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-spread-ms", type=float, default=defaults.latency_spread_ms)
+    parser.add_argument("--audio-latency-factor", type=float, default=defaults.audio_latency_factor)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--hang-rate", type=float, default=defaults.hang_rate)
+    parser.add_argument("--hang-seconds", type=float, default=defaults.hang_seconds)
+    parser.add_argument("--image-shape", choices=RESPONSE_SHAPES, default=defaults.image_shape)
+    parser.add_argument("--audio-shape", choices=RESPONSE_SHAPES, default=defaults.audio_shape)
+    parser.add_argument("--no-auth", action="store_true", help="Accept requests without a bearer token")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_spread_ms=args.latency_spread_ms,
+        audio_latency_factor=args.audio_latency_factor,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        image_shape=args.image_shape,
+        audio_shape=args.audio_shape,
+        require_auth=not args.no_auth,
+        seed=args.seed,
+    )
+
+
+def main():
+    import uvicorn
+    args = parse_args()
+    app = create_app(config_from_args(args))
+    print(f"Fake Workers AI listening on http://{args.host}:{args.port}")
+    print(f"Set CLOUDFLARE_API_BASE=http://{args.host}:{args.port}/accounts")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for a local ConvFlow API instance.
+
+Drives a weighted mix of realistic traffic:
+    anon_convert   anonymous POST /convert-file/
+    auth_convert   authenticated POST /convert-file/ (login once per virtual user,
+                   /auth/refresh every --refresh-every requests or on 401)
+    batch_convert  POST /convert-to-markdown/ with several files
+    history        authenticated GET /user/history
+
+Concurrency is ramped through --stages; for every stage the script reports
+throughput, latency percentiles and error rates per endpoint, then estimates the
+saturation point (the stage after which throughput stops growing or errors /
+503s from uvicorn's limit_concurrency appear).
+
+Examples:
+    python scripts/tests/load_test.py --stages 1,10,50,100,150 --stage-seconds 30
+    python scripts/tests/load_test.py --email test@example.com --password secret123 \\
+        --mix anon_convert=50,auth_convert=30,batch_convert=10,history=10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_MIX = "anon_convert=40,auth_convert=30,batch_convert=10,history=20"
+AUTH_SCENARIOS = {"auth_convert", "history"}
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+    def record(self, latency: float, status: str, ok: bool) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if not ok:
+            self.errors += 1
+
+
+@dataclass
+class StageResult:
+    concurrency: int
+    duration: float
+    endpoints: Dict[str, EndpointStats] = field(default_factory=lambda: defaultdict(EndpointStats))
+
+    @property
+    def total_requests(self) -> int:
+        return sum(len(s.latencies) for s in self.endpoints.values())
+
+    @property
+    def total_errors(self) -> int:
+        return sum(s.errors for s in self.endpoints.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.total_requests / self.duration if self.duration else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.total_errors / self.total_requests if self.total_requests else 0.0
+
+    @property
+    def rejected_503(self) -> int:
+        return sum(s.statuses.get("503", 0) for s in self.endpoints.values())
+
+    def latency_percentile(self, pct: float) -> float:
+        merged = [l for s in self.endpoints.values() for l in s.latencies]
+        return percentile(merged, pct)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("anon_convert", "auth_convert", "batch_convert", "history"):
+            raise ValueError(f"Unknown scenario in mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def load_sample_files(directory: Optional[str]) -> List[Tuple[str, bytes]]:
+    """Sample uploads from a directory, or small synthetic documents."""
+    if directory:
+        samples = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    samples.append((name, f.read()))
+        if samples:
+            return samples
+    rows = "\n".join(f"{i},item-{i},{i * 1.5:.2f}" for i in range(500))
+    return [
+        ("notes.txt", ("Lorem ipsum dolor sit amet. " * 200).encode()),
+        ("table.csv", f"id,name,price\n{rows}\n".encode()),
+        ("data.json", json.dumps([{"id": i, "name": f"item-{i}"} for i in range(200)]).encode()),
+        ("script.py", ("def f(x):\n    return x * 2\n\n" * 100).encode()),
+        ("page.html", ("<html><body>" + "<p>Paragraph</p>" * 300 + "</body></html>").encode()),
+    ]
+
+
+class Session:
+    """Per virtual user authentication state with login/refresh cycles."""
+
+    def __init__(self, client: httpx.AsyncClient, email: Optional[str], password: Optional[str], refresh_every: int):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.refresh_every = refresh_every
+        self.token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.requests_since_refresh = 0
+
+    @property
+    def can_authenticate(self) -> bool:
+        return bool(self.email and self.password)
+
+    async def login(self, stage: StageResult) -> bool:
+        start = time.perf_counter()
+        try:
+            response = await self.client.post("/auth/login", json={"email": self.email, "password": self.password})
+            status = str(response.status_code)
+            ok = response.status_code == 200
+        except httpx.HTTPError as e:
+            status, ok, response = type(e).__name__, False, None
+        stage.endpoints["POST /auth/login"].record(time.perf_counter() - start, status, ok)
+        if ok:
+            data = response.json()
+            self.token = data["token"]
+            self.refresh_token = data["refreshToken"]
+            self.requests_since_refresh = 0
+        return ok
+
+    async def refresh(self, stage: StageResult) -> bool:
+        if not self.refresh_token:
+            return await self.login(stage)
+        start = time.perf_counter()
+        try:
+            response = await self.client.post("/auth/refresh", json={"refreshToken": self.refresh_token})
+            status = str(response.status_code)
+            ok = response.status_code == 200
+        except httpx.HTTPError as e:
+            status, ok, response = type(e).__name__, False, None
+        stage.endpoints["POST /auth/refresh"].record(time.perf_counter() - start, status, ok)
+        if ok:
+            data = response.json()
+            self.token = data["token"]
+            self.refresh_token = data.get("refreshToken", self.refresh_token)
+            self.requests_since_refresh = 0
+            return True
+        return await self.login(stage)
+
+    async def headers(self, stage: StageResult) -> Optional[Dict[str, str]]:
+        if not self.token and not await self.login(stage):
+            return None
+        if self.requests_since_refresh >= self.refresh_every:
+            await self.refresh(stage)
+        self.requests_since_refresh += 1
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def timed_request(stage: StageResult, label: str, coro) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await coro
+    except httpx.HTTPError as e:
+        stage.endpoints[label].record(time.perf_counter() - start, type(e).__name__, False)
+        return None
+    stage.endpoints[label].record(time.perf_counter() - start, str(response.status_code), response.status_code < 400)
+    return response
+
+
+async def run_scenario(name: str, session: Session, stage: StageResult, samples, batch_size: int) -> None:
+    client = session.client
+    if name == "anon_convert":
+        filename, content = random.choice(samples)
+        await timed_request(stage, "POST /convert-file/ (anon)",
+                            client.post("/convert-file/", files={"file": (filename, content)}))
+    elif name == "batch_convert":
+        chosen = random.sample(samples, min(batch_size, len(samples)))
+        files = [("files", (filename, content)) for filename, content in chosen]
+        await timed_request(stage, "POST /convert-to-markdown/", client.post("/convert-to-markdown/", files=files))
+    elif name == "auth_convert":
+        headers = await session.headers(stage)
+        if headers is None:
+            return
+        filename, content = random.choice(samples)
+        response = await timed_request(stage, "POST /convert-file/ (auth)",
+                                       client.post("/convert-file/", files={"file": (filename, content)}, headers=headers))
+        if response is not None and response.status_code == 401:
+            await session.refresh(stage)
+    elif name == "history":
+        headers = await session.headers(stage)
+        if headers is None:
+            return
+        params = {"limit": random.choice((10, 25, 50)), "offset": random.choice((0, 0, 0, 50))}
+        response = await timed_request(stage, "GET /user/history",
+                                       client.get("/user/history", params=params, headers=headers))
+        if response is not None and response.status_code == 401:
+            await session.refresh(stage)
+
+
+async def run_stage(args, concurrency: int, mix, samples) -> StageResult:
+    stage = StageResult(concurrency=concurrency, duration=args.stage_seconds)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    stop_at = time.perf_counter() + args.stage_seconds
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def virtual_user():
+            session = Session(client, args.email, args.password, args.refresh_every)
+            while time.perf_counter() < stop_at:
+                name = random.choices(names, weights)[0]
+                if name in AUTH_SCENARIOS and not session.can_authenticate:
+                    name = "anon_convert"
+                await run_scenario(name, session, stage, samples, args.batch_size)
+                if args.think_ms:
+                    await asyncio.sleep(random.uniform(0, args.think_ms / 1000.0))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        stage.duration = time.perf_counter() - started
+    return stage
+
+
+def print_stage(stage: StageResult) -> None:
+    print(f"\n=== concurrency {stage.concurrency}: {stage.total_requests} requests in {stage.duration:.1f}s "
+          f"({stage.throughput:.1f} req/s, errors {stage.error_rate:.1%}, 503s {stage.rejected_503}) ===")
+    print(f"{'endpoint':<30} {'count':>7} {'rps':>7} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'err%':>6}  statuses")
+    for label in sorted(stage.endpoints):
+        s = stage.endpoints[label]
+        count = len(s.latencies)
+        print(f"{label:<30} {count:>7} {count / stage.duration:>7.1f} "
+              f"{percentile(s.latencies, 50) * 1000:>7.0f}ms {percentile(s.latencies, 90) * 1000:>7.0f}ms "
+              f"{percentile(s.latencies, 95) * 1000:>7.0f}ms {percentile(s.latencies, 99) * 1000:>7.0f}ms "
+              f"{(s.errors / count if count else 0):>6.1%}  {dict(s.statuses)}")
+
+
+def find_saturation(stages: List[StageResult], min_gain: float, max_error_rate: float) -> Optional[StageResult]:
+    """Return the last stage before throughput flattens or the service starts shedding load."""
+    for previous, current in zip(stages, stages[1:]):
+        gain = (current.throughput - previous.throughput) / previous.throughput if previous.throughput else 1.0
+        if gain < min_gain or current.error_rate > max_error_rate or current.rejected_503:
+            return previous
+    return None
+
+
+def stage_to_dict(stage: StageResult) -> Dict:
+    return {
+        "concurrency": stage.concurrency,
+        "duration": stage.duration,
+        "requests": stage.total_requests,
+        "throughput": stage.throughput,
+        "error_rate": stage.error_rate,
+        "rejected_503": stage.rejected_503,
+        "endpoints": {
+            label: {
+                "count": len(s.latencies),
+                "p50_ms": percentile(s.latencies, 50) * 1000,
+                "p90_ms": percentile(s.latencies, 90) * 1000,
+                "p95_ms": percentile(s.latencies, 95) * 1000,
+                "p99_ms": percentile(s.latencies, 99) * 1000,
+                "errors": s.errors,
+                "statuses": dict(s.statuses),
+            }
+            for label, s in stage.endpoints.items()
+        },
+    }
+
+
+async def main_async(args) -> None:
+    mix = parse_mix(args.mix)
+    samples = load_sample_files(args.files)
+    stages = []
+    for concurrency in (int(c) for c in args.stages.split(",")):
+        stage = await run_stage(args, concurrency, mix, samples)
+        print_stage(stage)
+        stages.append(stage)
+
+    knee = find_saturation(stages, args.min_gain, args.max_error_rate)
+    print("\n=== Saturation ===")
+    if knee is None:
+        print(f"No saturation up to concurrency {stages[-1].concurrency}; extend --stages.")
+    else:
+        print(f"Throughput peaks around concurrency {knee.concurrency} "
+              f"({knee.throughput:.1f} req/s, p95 {knee.latency_percentile(95) * 1000:.0f}ms).")
+    if any(s.rejected_503 for s in stages):
+        first = next(s for s in stages if s.rejected_503)
+        print(f"503s first seen at concurrency {first.concurrency} "
+              f"(uvicorn limit_concurrency in src/main.py is 100).")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"stages": [stage_to_dict(s) for s in stages],
+                       "saturation_concurrency": knee.concurrency if knee else None}, f, indent=2)
+        print(f"Results written to {args.json_out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConvFlow API load generator")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default=os.getenv("LOADTEST_EMAIL"))
+    parser.add_argument("--password", default=os.getenv("LOADTEST_PASSWORD"))
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. anon_convert=40,history=20")
+    parser.add_argument("--stages", default="1,5,10,25,50,75,100,125,150", help="Comma separated concurrency ramp")
+    parser.add_argument("--stage-seconds", type=float, default=20.0)
+    parser.add_argument("--files", default=None, help="Directory with sample uploads")
+    parser.add_argument("--batch-size", type=int, default=3)
+    parser.add_argument("--refresh-every", type=int, default=50, help="Requests per token refresh")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Random pause between requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--min-gain", type=float, default=0.05, help="Throughput gain below which a stage is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--json-out", default=None)
+    args = parser.parse_args()
+    if not (args.email and args.password):
+        print("No credentials given; authenticated scenarios fall back to anonymous conversions.")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
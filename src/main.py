@@ -1,13 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Header, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
-import tempfile
 import os
 import sys
-from markitdown import MarkItDown
 import logging
 from dotenv import load_dotenv
 
@@ -15,8 +13,25 @@ from dotenv import load_dotenv
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.services.cloudflare_ai import cloudflare_ai
+from src.services.logging_config import configure_logging
+from src.services.conversion import conversion_service
+from src.services.conversion_pool import ConversionTimeout, WorkerCrashed, conversion_pool
+from src.services.scheduler import set_lane as set_conversion_lane
+from src.services.converters import InvalidConversionOptions
+from src.services.deadlines import apply_client_deadline, error_category, error_status, run_until_disconnect
+from src.services.audio_preprocessing import prepare_audio_for_ai
+from src.services.image_cache import image_analysis_cache
+from src.services.image_preprocessing import prepare_image_for_ai
+from src.services.metrics import metrics
+from src.services.single_flight import SingleFlight, flight_key
+from src.services.tracing import TracingMiddleware, exporter as trace_exporter, span
+from src.services.profiling import PROFILING_SECRET, ProfileRequestMiddleware
+from src.services.flight_recorder import set_subject as set_recording_subject
 from src.services.database import db_service
 from src.services.auth_service import auth_service
+from src.services.admission import AdmissionMiddleware, admission_controller
+from src.services.client_rate_limit import RATE_LIMIT_ENABLED, ClientRateLimitMiddleware, client_rate_limiter
+from src.services.upload_limits import UploadLimitMiddleware, UploadTooLarge, read_upload
 from src.routes.auth import router as auth_router, get_current_user
 from src.routes.user import router as user_router
 from src.routes.keycloak_users import router as keycloak_users_router
@@ -25,8 +40,8 @@ from src.models.auth import User
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, sampled, JSON by default; see LOG_* settings)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Security scheme for optional authentication
@@ -40,9 +55,12 @@ async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCrede
     
     try:
         user = await auth_service.get_current_user(credentials.credentials)
-        return user
     except Exception:
         return None
+    if user:
+        # Later requests with this token are rate limited as this user, without a lookup
+        client_rate_limiter.remember_token(credentials.credentials, user.id, user.plan)
+    return user
 
 
 @asynccontextmanager
@@ -50,10 +68,13 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
     logger.info("Starting ConvFlow API...")
+    conversion_service.start(SUPPORTED_EXTENSIONS.keys())
     await db_service.init_pool()
     yield
     # Shutdown
     logger.info("Shutting down ConvFlow API...")
+    conversion_service.stop()
+    await cloudflare_ai.close()
     await db_service.close_pool()
 
 
@@ -64,22 +85,20 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Add your frontend URLs
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Include authentication and user routes
 app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(keycloak_users_router)
 
-# Initialize MarkItDown converter
-md_converter = MarkItDown()
+# Admin profiling and flight recorder endpoints authenticate admins through Keycloak, so they are only
+# available when Keycloak is configured
+try:
+    from src.routes.admin_profiling import router as profiling_router
+    from src.routes.admin_flight_recorder import router as flight_recorder_router
+    app.include_router(profiling_router)
+    app.include_router(flight_recorder_router)
+except ValueError as e:
+    logger.info("Admin profiling and flight recorder endpoints disabled: %s", e)
 
 # Supported file extensions
 SUPPORTED_EXTENSIONS = {
@@ -117,11 +136,67 @@ MAX_TOTAL_SIZE = 20 * 1024 * 1024  # 20MB total
 # File type categories
 IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff'}
 AUDIO_EXTENSIONS = {'wav', 'mp3', 'm4a', 'mp4'}
+SPREADSHEET_EXTENSIONS = {'xlsx', 'xls'}
+
+# Shed conversion requests up front when the estimated queue delay is too long
+# (registered first so it runs after the upload limits' Content-Length check)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission_controller,
+    paths=["/convert-file/", "/convert-to-markdown/"],
+    max_size=MAX_TOTAL_SIZE,
+)
+
+# Reject oversized uploads and unsupported file types while the body is still streaming
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=["/convert-file/"],
+    max_total_size=MAX_TOTAL_SIZE,
+    max_file_size=MAX_FILE_SIZE,
+    allowed_extensions=SUPPORTED_EXTENSIONS.keys(),
+)
+# Batch uploads only get the total budget: the handler reports bad files one by one
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=["/convert-to-markdown/"],
+    max_total_size=MAX_TOTAL_SIZE,
+)
+
+# Per-user / per-IP request rate limits, checked before the body is read
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        ClientRateLimitMiddleware,
+        limiter=client_rate_limiter,
+        paths=["/convert-file/", "/convert-to-markdown/"],
+    )
+
+# Root span per request and a Server-Timing header with per-stage durations
+app.add_middleware(TracingMiddleware)
+
+# Profile requests carrying a signed X-Profile header (only installed when configured)
+if PROFILING_SECRET:
+    app.add_middleware(ProfileRequestMiddleware)
+
+# Add CORS middleware (added last so it wraps every other middleware,
+# including early upload rejections)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Add your frontend URLs
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+media_flights = SingleFlight("media")
+# Conversion pool failures that must reach error_category/error_status rather than become success=False
+POOL_FAILURES = (ConversionTimeout, WorkerCrashed, MemoryError)
 
 async def process_media_file(content: bytes, file_extension: str, filename: str) -> Dict[str, Any]:
     """
     Process media files (images and audio) with Cloudflare AI.
     
+    Concurrent uploads of the same file share one analysis.
+    
     Args:
         content: File content as bytes
         file_extension: File extension (without dot)
@@ -130,8 +205,19 @@ async def process_media_file(content: bytes, file_extension: str, filename: str)
     Returns:
         Dictionary with processing results
     """
+    # Same scope as document conversions: the shared analysis runs with the first caller's lane and deadline
+    key = flight_key("media", content, file_extension) + conversion_service.flight_scope()
+    with span("media", extension=file_extension, bytes=len(content)):
+        shared = await media_flights.do(key, lambda: _process_media_content(content, file_extension))
+    
+    result = {"filename": filename, **shared}
+    if result.pop("metadata_failed", False):
+        result["markdown"] = f"# {filename}\n\n{result['markdown']}"
+    return result
+
+async def _process_media_content(content: bytes, file_extension: str) -> Dict[str, Any]:
+    """Filename-independent part of process_media_file, shared by identical uploads."""
     result = {
-        "filename": filename,
         "file_type": SUPPORTED_EXTENSIONS.get(file_extension, "Unknown"),
         "markdown": "",
         "success": True,
@@ -140,45 +226,53 @@ async def process_media_file(content: bytes, file_extension: str, filename: str)
     
     try:
         # First, try MarkItDown for basic metadata
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
-        
         try:
-            # Get basic metadata from MarkItDown
-            md_result = md_converter.convert(tmp_path)
-            basic_markdown = md_result.text_content if hasattr(md_result, 'text_content') else str(md_result)
-            result["markdown"] = basic_markdown
+            result["markdown"] = await conversion_service.convert(content, file_extension)
+        except POOL_FAILURES:
+            raise
         except Exception as e:
-            logger.warning(f"MarkItDown processing failed for {filename}: {e}")
-            result["markdown"] = f"# {filename}\n\nFile processed but metadata extraction failed."
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            logger.warning("MarkItDown processing failed for .%s file: %s", file_extension, e)
+            result["markdown"] = "File processed but metadata extraction failed."
+            result["metadata_failed"] = True
         
         # Enhanced processing with Cloudflare AI
         if file_extension in IMAGE_EXTENSIONS:
-            # Image analysis
-            ai_analysis = await cloudflare_ai.analyze_image(content)
-            if ai_analysis:
-                result["markdown"] += f"\n\n{ai_analysis}"
-                result["cloudflare_ai_used"] = True
+            # Downscale and re-encode before upload; the model only sees 224x224
+            prepared = await conversion_pool.run(prepare_image_for_ai, content)
+            if prepared.skip_reason:
+                result["markdown"] += f"\n\n## Image Analysis\nSkipped: {prepared.skip_reason}"
             else:
-                result["markdown"] += "\n\n## Image Analysis\nCloudflare AI analysis not available (check configuration)"
+                # Image analysis
+                with metrics.timer("media_ai_seconds", kind="image"):
+                    ai_analysis = await cloudflare_ai.analyze_image(prepared.data, image_hash=prepared.phash)
+                if ai_analysis:
+                    result["markdown"] += f"\n\n{ai_analysis}"
+                    result["cloudflare_ai_used"] = True
+                else:
+                    result["markdown"] += "\n\n## Image Analysis\nCloudflare AI analysis not available (check configuration)"
                 
         elif file_extension in AUDIO_EXTENSIONS:
-            # Audio transcription
-            ai_transcription = await cloudflare_ai.transcribe_audio(content)
-            if ai_transcription:
-                result["markdown"] += f"\n\n{ai_transcription}"
-                result["cloudflare_ai_used"] = True
+            # Mono 16 kHz with long silences cut; offsets keep segment times correct
+            prepared = await conversion_pool.run(prepare_audio_for_ai, content, file_extension)
+            if prepared.skip_reason:
+                result["markdown"] += "\n\n## Audio Transcription\n[No speech detected]"
             else:
-                result["markdown"] += "\n\n## Audio Transcription\nCloudflare AI transcription not available (check configuration)"
+                # Audio transcription
+                with metrics.timer("media_ai_seconds", kind="audio"):
+                    ai_transcription = await cloudflare_ai.transcribe_audio(prepared.data, offsets=prepared.offsets)
+                if ai_transcription:
+                    result["markdown"] += f"\n\n{ai_transcription}"
+                    result["cloudflare_ai_used"] = True
+                else:
+                    result["markdown"] += "\n\n## Audio Transcription\nCloudflare AI transcription not available (check configuration)"
         
         return result
         
+    except POOL_FAILURES:
+        # Deadline, worker crash or memory cap: the caller maps these to their status and category
+        raise
     except Exception as e:
-        logger.error(f"Error processing media file {filename}: {e}")
+        logger.error("Error processing .%s media file: %s", file_extension, e)
         result["success"] = False
         result["error"] = str(e)
         return result
@@ -193,6 +287,7 @@ async def root():
             "convert_single": "/convert-file/",
             "health": "/health",
             "ai_status": "/ai-status",
+            "metrics": "/metrics",
             "supported_formats": "/supported-formats/"
         },
         "ai_features": {
@@ -215,9 +310,25 @@ async def ai_status():
         "supported_features": {
             "image_analysis": cloudflare_ai.enabled,
             "audio_transcription": cloudflare_ai.enabled
-        }
+        },
+        "image_cache": image_analysis_cache.status(),
+        "resilience": cloudflare_ai.status()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Conversion timings, counters and cache/pool status."""
+    ai_status = cloudflare_ai.status()  # refreshes the ai_queue_depth gauges
+    snapshot = metrics.snapshot()
+    snapshot["conversion"] = conversion_service.status()
+    snapshot["admission"] = admission_controller.status()
+    snapshot["rate_limit"] = client_rate_limiter.status()
+    snapshot["cloudflare_ai"] = ai_status
+    if trace_exporter is not None:
+        snapshot["tracing"] = trace_exporter.status()
+    snapshot["media_single_flight"] = media_flights.status()
+    return snapshot
+
 @app.post("/convert-to-markdown/")
 async def convert_multiple_files_to_markdown(
     files: List[UploadFile] = File(...)
@@ -249,18 +360,18 @@ async def convert_multiple_files_to_markdown(
                 errors[filename] = f"Unsupported file type: {file_extension}"
                 continue
             
-            # Read file content
-            content = await file.read()
+            # Read file content in bounded chunks, stopping at the size limit
+            try:
+                content = await read_upload(file, MAX_FILE_SIZE)
+            except UploadTooLarge as e:
+                errors[filename] = e.detail
+                continue
             if not content:
                 errors[filename] = "File is empty"
                 continue
             
-            # Check file size limits
+            # Check total size limit
             file_size = len(content)
-            if file_size > MAX_FILE_SIZE:
-                errors[filename] = f"File too large: {file_size / (1024*1024):.1f}MB (max {MAX_FILE_SIZE / (1024*1024):.0f}MB)"
-                continue
-            
             total_size += file_size
             if total_size > MAX_TOTAL_SIZE:
                 errors[filename] = f"Total upload size too large: {total_size / (1024*1024):.1f}MB (max {MAX_TOTAL_SIZE / (1024*1024):.0f}MB)"
@@ -280,15 +391,9 @@ async def convert_multiple_files_to_markdown(
                 else:
                     errors[filename] = media_result.get("error", "Media processing failed")
             else:
-                # Use MarkItDown for document files
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-                    tmp_file.write(content)
-                    tmp_path = tmp_file.name
-                
+                # Use the converter registry for document files
                 try:
-                    # Convert to markdown using MarkItDown
-                    result = md_converter.convert(tmp_path)
-                    markdown_content = result.text_content if hasattr(result, 'text_content') else str(result)
+                    markdown_content = await conversion_service.convert(content, file_extension)
                     
                     results[filename] = {
                         "markdown": markdown_content,
@@ -299,17 +404,12 @@ async def convert_multiple_files_to_markdown(
                     
                 except Exception as convert_error:
                     errors[filename] = f"Conversion error: {str(convert_error)}"
-                    logger.error(f"Error converting {filename}: {convert_error}")
-                
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+                    logger.error("Error converting %s: %s", filename, convert_error)
                     
         except Exception as e:
             error_key = file.filename if file.filename else f"unnamed_file_{len(errors)}"
             errors[error_key] = f"Processing error: {str(e)}"
-            logger.error(f"Error processing file {error_key}: {e}")
+            logger.error("Error processing file %s: %s", error_key, e)
     
     response_data = {
         "results": results,
@@ -325,7 +425,14 @@ async def convert_multiple_files_to_markdown(
 
 @app.post("/convert-file/")
 async def convert_single_file_to_markdown(
+    request: Request,
     file: UploadFile = File(...),
+    sheet: Optional[str] = Query(None, description="Spreadsheets: comma separated sheet names or 1-based indexes"),
+    cell_range: Optional[str] = Query(None, alias="range", description="Spreadsheets: A1-style cell range, e.g. A1:F200"),
+    pages: Optional[str] = Query(None, description="PDF: 1-based pages to convert, e.g. 1-5,8,20-"),
+    engine: Optional[str] = Query(None, description="PDF: extraction engine (auto, pdfium, pdfminer)"),
+    request_timeout: Optional[str] = Header(None, alias="X-Request-Timeout",
+                                            description="Seconds the client is willing to wait (capped by the server)"),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ) -> JSONResponse:
     """
@@ -334,6 +441,12 @@ async def convert_single_file_to_markdown(
     Supports: pptx, docx, xlsx, xls, pdf, outlook messages, audio files, and more.
     Returns JSON with markdown content.
     
+    For spreadsheets, ``sheet`` and ``range`` select what is converted; for
+    PDFs, ``pages`` does and ``engine`` forces an extraction engine.
+    
+    Conversions are stopped when they exceed the server deadline (or a shorter
+    ``X-Request-Timeout``) and when the client disconnects.
+    
     Authentication is optional - works for both logged-in and anonymous users.
     """
     if not file.filename:
@@ -348,18 +461,31 @@ async def convert_single_file_to_markdown(
             detail=f"Unsupported file type: {file_extension}. Supported types: {list(SUPPORTED_EXTENSIONS.keys())}"
         )
     
-    # Read file content
-    content = await file.read()
+    options: Dict[str, Any] = {}
+    if file_extension in SPREADSHEET_EXTENSIONS:
+        if sheet:
+            options["sheet"] = sheet
+        if cell_range:
+            options["cell_range"] = cell_range
+    elif file_extension == 'pdf':
+        if pages:
+            options["pages"] = pages
+        if engine:
+            options["engine"] = engine
+    
+    # Read file content in bounded chunks (raises 413 past MAX_FILE_SIZE)
+    with span("upload_read", extension=file_extension) as read_span:
+        content = await read_upload(file, MAX_FILE_SIZE)
+        if read_span is not None:
+            read_span.set_attribute("bytes", len(content))
     if not content:
         raise HTTPException(status_code=400, detail="File is empty")
     
-    # Check file size
     file_size = len(content)
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"File too large: {file_size / (1024*1024):.1f}MB (max {MAX_FILE_SIZE / (1024*1024):.0f}MB)"
-        )
+    apply_client_deadline(request_timeout)
+    set_conversion_lane(current_user.plan if current_user else None)
+    # Lets the flight recorder honour per-tenant opt-outs
+    set_recording_subject(current_user.id if current_user else None, current_user.email if current_user else None)
     
     # For authenticated users, check usage limits
     if current_user:
@@ -373,17 +499,18 @@ async def convert_single_file_to_markdown(
         except HTTPException:
             raise
         except Exception as e:
-            logger.warning(f"Failed to check usage limits for user {current_user.id}: {e}")
+            logger.warning("Failed to check usage limits for user %s: %s", current_user.id, e)
             # Continue processing - don't fail conversion due to stats issues
     
     # Process the file
     conversion_successful = False
     error_message = None
+    failure_category = None
     
     try:
         if file_extension in IMAGE_EXTENSIONS or file_extension in AUDIO_EXTENSIONS:
             # Use Cloudflare AI for media files
-            media_result = await process_media_file(content, file_extension, filename)
+            media_result = await run_until_disconnect(request, process_media_file(content, file_extension, filename))
             if media_result["success"]:
                 conversion_successful = True
                 response_data = {
@@ -400,15 +527,12 @@ async def convert_single_file_to_markdown(
                     detail=f"Media processing error: {error_message}"
                 )
         else:
-            # Use MarkItDown for document files
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-                tmp_file.write(content)
-                tmp_path = tmp_file.name
-            
+            # Use the converter registry for document files
             try:
-                # Convert to markdown using MarkItDown
-                result = md_converter.convert(tmp_path)
-                markdown_content = result.text_content if hasattr(result, 'text_content') else str(result)
+                with span("convert", extension=file_extension, bytes=file_size):
+                    markdown_content = await run_until_disconnect(
+                        request, conversion_service.convert(content, file_extension, **options)
+                    )
                 
                 conversion_successful = True
                 response_data = {
@@ -419,18 +543,18 @@ async def convert_single_file_to_markdown(
                     "cloudflare_ai_used": False
                 }
                 
+            except InvalidConversionOptions as option_error:
+                error_message = str(option_error)
+                failure_category = error_category(option_error)
+                raise HTTPException(status_code=400, detail=error_message)
             except Exception as convert_error:
-                error_message = str(convert_error)
-                logger.error(f"Error converting {filename}: {convert_error}")
+                error_message = str(convert_error) or type(convert_error).__name__
+                failure_category = error_category(convert_error)
+                logger.error("Error converting %s (%s): %s", filename, failure_category, error_message)
                 raise HTTPException(
-                    status_code=500, 
+                    status_code=error_status(convert_error), 
                     detail=f"Conversion error: {error_message}"
                 )
-            
-            finally:
-                # Clean up temporary file
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
         
         # Record conversion for authenticated users
         if current_user and conversion_successful:
@@ -443,7 +567,7 @@ async def convert_single_file_to_markdown(
                     'completed'
                 )
             except Exception as e:
-                logger.warning(f"Failed to record conversion for user {current_user.id}: {e}")
+                logger.warning("Failed to record conversion for user %s: %s", current_user.id, e)
                 # Don't fail the conversion due to recording issues
         
         return JSONResponse(content=response_data)
@@ -457,14 +581,16 @@ async def convert_single_file_to_markdown(
                     SUPPORTED_EXTENSIONS.get(file_extension, "Unknown"),
                     file_size,
                     'failed',
-                    error_message
+                    error_message,
+                    failure_category
                 )
             except Exception as e:
-                logger.warning(f"Failed to record failed conversion for user {current_user.id}: {e}")
+                logger.warning("Failed to record failed conversion for user %s: %s", current_user.id, e)
         raise
     except Exception as e:
-        error_message = str(e)
-        logger.error(f"Error processing file {filename}: {e}")
+        error_message = str(e) or type(e).__name__
+        failure_category = error_category(e)
+        logger.error("Error processing file %s (%s): %s", filename, failure_category, error_message)
         
         # Record failed conversion for authenticated users
         if current_user:
@@ -475,13 +601,14 @@ async def convert_single_file_to_markdown(
                     SUPPORTED_EXTENSIONS.get(file_extension, "Unknown"),
                     file_size,
                     'failed',
-                    error_message
+                    error_message,
+                    failure_category
                 )
             except Exception as record_error:
-                logger.warning(f"Failed to record failed conversion for user {current_user.id}: {record_error}")
+                logger.warning("Failed to record failed conversion for user %s: %s", current_user.id, record_error)
         
         raise HTTPException(
-            status_code=500, 
+            status_code=error_status(e), 
             detail=f"Processing error: {error_message}"
         )
 
@@ -1,13 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
-import tempfile
 import os
 import sys
-from markitdown import MarkItDown
 import logging
 from dotenv import load_dotenv
 
@@ -15,15 +13,25 @@ from dotenv import load_dotenv
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.services.cloudflare_ai import cloudflare_ai
+from src.services.logging_config import configure_logging
+from src.services.admission import AdmissionMiddleware, admission_controller
+from src.services.client_rate_limit import RATE_LIMIT_ENABLED, ClientRateLimitMiddleware, client_rate_limiter
+from src.services.conversion import conversion_service
+from src.services.scheduler import set_lane as set_conversion_lane
+from src.services.deadlines import apply_client_deadline, error_status, run_until_disconnect
 from src.routes.auth_keycloak import router as auth_router, get_current_user_optional
 from src.routes.keycloak_users_updated import router as keycloak_users_router
+from src.routes.admin_profiling import router as profiling_router
+from src.routes.admin_flight_recorder import router as flight_recorder_router
+from src.services.flight_recorder import set_subject as set_recording_subject
+from src.services.profiling import PROFILING_SECRET, ProfileRequestMiddleware
 from src.models.auth_keycloak import User
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, sampled, JSON by default; see LOG_* settings)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Security scheme for optional authentication
@@ -35,9 +43,11 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
     logger.info("Starting ConvFlow API...")
+    conversion_service.start(SUPPORTED_EXTENSIONS.keys())
     yield
     # Shutdown
     logger.info("Shutting down ConvFlow API...")
+    conversion_service.stop()
 
 
 app = FastAPI(
@@ -47,6 +57,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Shed conversion requests up front when the estimated queue delay is too long
+app.add_middleware(AdmissionMiddleware, controller=admission_controller, paths=["/api/convert"])
+
+# Per-user / per-IP request rate limits, checked before the body is read
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(ClientRateLimitMiddleware, limiter=client_rate_limiter, paths=["/api/convert"])
+
+# Profile requests carrying a signed X-Profile header (only installed when configured)
+if PROFILING_SECRET:
+    app.add_middleware(ProfileRequestMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -59,9 +80,8 @@ app.add_middleware(
 # Include authentication and user routes
 app.include_router(auth_router)
 app.include_router(keycloak_users_router)
-
-# Initialize MarkItDown converter
-md_converter = MarkItDown()
+app.include_router(profiling_router)
+app.include_router(flight_recorder_router)
 
 # Supported file extensions
 SUPPORTED_EXTENSIONS = {
@@ -97,9 +117,11 @@ async def supported_formats():
 
 @app.post("/api/convert")
 async def convert_file(
+    request: Request,
     file: UploadFile = File(...),
     current_user: Optional[User] = Depends(get_current_user_optional),
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    request_timeout: Optional[str] = Header(None, alias="X-Request-Timeout")
 ):
     """
     Convert uploaded file to markdown
@@ -107,6 +129,7 @@ async def convert_file(
     - Requires Keycloak authentication token in the Authorization header
     - File will be processed based on its extension
     - Returns markdown content and any extracted metadata
+    - X-Request-Timeout (seconds) shortens the server's conversion deadline
     """
     # Check if authenticated
     if not current_user:
@@ -114,6 +137,8 @@ async def convert_file(
             status_code=401,
             detail="Authentication required for file conversion"
         )
+    # Lets the flight recorder honour per-tenant opt-outs
+    set_recording_subject(current_user.id, current_user.email)
     
     # Check file extension
     file_extension = file.filename.split('.')[-1].lower() if file.filename else ''
@@ -124,16 +149,15 @@ async def convert_file(
             detail=f"Unsupported file format: .{file_extension}"
         )
     
-    # Create temp file to save the uploaded file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-        # Read uploaded file content
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+    # Read uploaded file content
+    content = await file.read()
+    apply_client_deadline(request_timeout)
+    set_conversion_lane(current_user.plan)
     
     try:
-        # Convert file to markdown using MarkItDown
-        result = md_converter.convert(tmp_file_path)
+        # Convert file to markdown (converters are loaded lazily per extension);
+        # stopped at the deadline or when the client goes away
+        markdown_content = await run_until_disconnect(request, conversion_service.convert(content, file_extension))
         
         # Add to usage tracking
         # Removed database usage tracking and using only Keycloak
@@ -141,25 +165,18 @@ async def convert_file(
         # Return the converted markdown and metadata
         return {
             "success": True,
-            "markdown": result.markdown,
-            "metadata": result.metadata,
+            "markdown": markdown_content,
+            "metadata": {},
             "original_filename": file.filename,
             "size": len(content)
         }
         
     except Exception as e:
-        logger.error(f"Conversion error: {str(e)}")
+        logger.error("Conversion error: %s", e)
         raise HTTPException(
-            status_code=500,
-            detail=f"Error converting file: {str(e)}"
+            status_code=error_status(e),
+            detail=f"Error converting file: {str(e) or type(e).__name__}"
         )
-        
-    finally:
-        # Clean up the temp file
-        try:
-            os.unlink(tmp_file_path)
-        except Exception as e:
-            logger.error(f"Error removing temp file: {str(e)}")
 
 @app.post("/api/ai/process")
 async def process_with_ai(
@@ -200,7 +217,7 @@ async def process_with_ai(
         }
         
     except Exception as e:
-        logger.error(f"AI processing error: {str(e)}")
+        logger.error("AI processing error: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing with AI: {str(e)}"
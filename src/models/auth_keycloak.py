@@ -90,6 +90,7 @@ class ConversionRecord(BaseModel):
     createdAt: datetime
     completedAt: Optional[datetime] = None
     errorMessage: Optional[str] = None
+    errorCategory: Optional[str] = None
     
     class Config:
         from_attributes = True
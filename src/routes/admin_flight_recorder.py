@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import FileResponse
+import os
+import sys
+import json
+import asyncio
+
+from ..models.auth_keycloak import User
+from ..routes.auth_keycloak import get_admin_user
+from ..services.flight_recorder import flight_recorder
+
+router = APIRouter(prefix="/admin/flight-recorder", tags=["admin"])
+
+REPLAY_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "scripts", "benchmarks", "replay_quarantine.py"
+)
+REPLAY_TIMEOUT_SECONDS = float(os.getenv("FLIGHT_RECORDER_REPLAY_TIMEOUT", "300"))
+
+
+def _require_enabled():
+    if not flight_recorder.enabled:
+        raise HTTPException(status_code=503, detail="Flight recorder is disabled (FLIGHT_RECORDER_DIR not set)")
+
+
+@router.get("")
+async def list_entries(current_user: User = Depends(get_admin_user)):
+    """Quarantined inputs, newest first."""
+    _require_enabled()
+    return {"status": flight_recorder.status(), "entries": await asyncio.to_thread(flight_recorder.list)}
+
+
+@router.get("/{entry_id}")
+async def get_entry(entry_id: str, current_user: User = Depends(get_admin_user)):
+    """Recorded metadata, stage timings and stack samples of one entry."""
+    _require_enabled()
+    meta = await asyncio.to_thread(flight_recorder.get, entry_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return meta
+
+
+@router.get("/{entry_id}/input")
+async def download_input(entry_id: str, current_user: User = Depends(get_admin_user)):
+    _require_enabled()
+    path = await asyncio.to_thread(flight_recorder.input_path, entry_id)
+    if path is None or not await asyncio.to_thread(os.path.isfile, path):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+@router.post("/{entry_id}/replay")
+async def replay_entry(
+    entry_id: str,
+    repeat: int = Query(1, ge=1, le=10),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Convert the input again through the replay benchmark, in a separate
+    process so a pathological input cannot take the API down with it.
+    """
+    _require_enabled()
+    if await asyncio.to_thread(flight_recorder.get, entry_id) is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, REPLAY_SCRIPT, "--dir", flight_recorder.directory,
+        "--id", entry_id, "--repeat", str(repeat), "--json",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), REPLAY_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise HTTPException(status_code=504, detail=f"Replay exceeded {REPLAY_TIMEOUT_SECONDS:.0f}s")
+    if process.returncode != 0:
+        raise HTTPException(status_code=500, detail=f"Replay failed: {stderr.decode(errors='replace')[-500:]}")
+    return json.loads(stdout)[0]
+
+
+@router.delete("/{entry_id}")
+async def delete_entry(entry_id: str, current_user: User = Depends(get_admin_user)):
+    _require_enabled()
+    if not await asyncio.to_thread(flight_recorder.delete, entry_id):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"deleted": entry_id}
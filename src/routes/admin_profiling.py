@@ -0,0 +1,124 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse
+import time
+import asyncio
+
+from ..models.auth_keycloak import User
+from ..routes.auth_keycloak import get_admin_user
+from ..services.profiling import (
+    PROFILING_MAX_SECONDS,
+    PROFILING_SECRET,
+    ProfilerBusy,
+    memory_profiler,
+    profile_for,
+    profile_store,
+    sign_profile_token,
+)
+
+router = APIRouter(prefix="/admin/profiling", tags=["admin"])
+
+
+@router.post("/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=PROFILING_MAX_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Sample all threads for N seconds; returns collapsed stacks for a flamegraph.
+
+    Conversions that run in pool workers during the window are sampled there
+    and included under ``worker-<pid>`` roots.
+    """
+    try:
+        profiler = await profile_for(seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"X-Profile-Samples": str(profiler.samples)}
+    )
+
+
+@router.post("/request-token")
+async def create_request_token(
+    ttl_seconds: int = Query(300, gt=0, le=3600),
+    current_user: User = Depends(get_admin_user)
+):
+    """Signed X-Profile header value; requests sent with it are profiled."""
+    if not PROFILING_SECRET:
+        raise HTTPException(status_code=503, detail="Per-request profiling is disabled (PROFILING_SECRET not set)")
+    expires_at = int(time.time()) + ttl_seconds
+    return {"header": "X-Profile", "value": sign_profile_token(expires_at), "expires_at": expires_at}
+
+
+@router.get("/requests")
+async def list_request_profiles(current_user: User = Depends(get_admin_user)):
+    """Recent per-request profiles (without their stacks)."""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/requests/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str, current_user: User = Depends(get_admin_user)):
+    """Collapsed stacks of one profiled request (id from its X-Profile-Id header)."""
+    result = profile_store.get(profile_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(result["collapsed"])
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(
+    frames: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Start tracemalloc. Allocation tracing slows the process down until stopped.
+
+    Only allocations of the API process are traced, not those of conversions
+    in pool workers (their memory shows as RSS growth in the flight recorder).
+    """
+    memory_profiler.start(frames)
+    return {"tracing": True}
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing(current_user: User = Depends(get_admin_user)):
+    memory_profiler.stop()
+    return {"tracing": False}
+
+
+@router.post("/memory/baseline")
+async def take_memory_baseline(current_user: User = Depends(get_admin_user)):
+    """Snapshot to compare later snapshots against."""
+    try:
+        await asyncio.to_thread(memory_profiler.take_baseline)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"baseline": True}
+
+
+@router.get("/memory/top")
+async def memory_top(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: User = Depends(get_admin_user)
+):
+    """Largest live allocations by source location."""
+    try:
+        return await asyncio.to_thread(memory_profiler.top, limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/diff")
+async def memory_diff(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: User = Depends(get_admin_user)
+):
+    """Allocation growth since the baseline snapshot."""
+    try:
+        return await asyncio.to_thread(memory_profiler.diff, limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
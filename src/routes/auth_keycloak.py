@@ -4,6 +4,7 @@ from typing import Optional, List
 
 from ..models.auth_keycloak import User, TokenData
 from ..services.auth_service_keycloak import keycloak_auth_service
+from ..services.client_rate_limit import client_rate_limiter
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
@@ -37,9 +38,12 @@ async def get_current_user_optional(
     
     try:
         user = await keycloak_auth_service.get_current_user(credentials.credentials)
-        return user
     except Exception:
         return None
+    if user:
+        # Later requests with this token are rate limited as this user, without a lookup
+        client_rate_limiter.remember_token(credentials.credentials, user.id, user.plan)
+    return user
 
 
 async def get_admin_user(
@@ -0,0 +1,234 @@
+"""
+Cost-weighted admission control for the conversion routes.
+
+Each conversion request is given an estimated cost in worker-seconds from its
+size and file type (a 5MB PDF costs far more than a small text file). The
+controller keeps the total cost of admitted, unfinished requests; divided by
+the number of workers that is roughly how long a new request would queue
+before a worker is free. When that exceeds ADMISSION_TARGET_DELAY_SECONDS the
+request is refused up front with 503 and a Retry-After of about the time the
+backlog needs to drain, rather than queued to time out later. Other routes
+never pass through the controller.
+
+Estimates are corrected per file class from observed durations, so the model
+tracks the machine it runs on.
+
+The decision is taken from the headers alone: no body is read (and no
+``100 Continue`` sent) for a request that is refused.
+"""
+import os
+import re
+import math
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .conversion_pool import conversion_pool
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_TARGET_DELAY_SECONDS = float(os.getenv("ADMISSION_TARGET_DELAY_SECONDS", "10"))
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", "60"))
+# Worker-seconds that drain per second; defaults to the conversion pool size
+ADMISSION_CAPACITY = float(os.getenv("ADMISSION_CAPACITY", "0"))
+
+_FILENAME = re.compile(rb'filename="([^"]*)"', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class CostClass:
+    """Estimated worker-seconds: ``base`` per request plus ``per_mb`` per megabyte."""
+    base: float
+    per_mb: float
+
+
+COST_CLASSES: Dict[str, CostClass] = {
+    "text": CostClass(0.05, 0.1),
+    "spreadsheet": CostClass(0.3, 2.0),
+    "office": CostClass(0.3, 1.0),
+    "pdf": CostClass(0.5, 2.5),
+    "image": CostClass(1.0, 0.5),
+    "audio": CostClass(2.0, 3.0),
+    "archive": CostClass(0.5, 2.0),
+}
+DEFAULT_COST_CLASS = "office"
+
+EXTENSION_CLASSES: Dict[str, str] = {
+    **{ext: "text" for ext in ("txt", "md", "html", "htm", "xml", "json", "csv", "py", "js")},
+    **{ext: "spreadsheet" for ext in ("xlsx", "xls")},
+    **{ext: "office" for ext in ("docx", "pptx", "msg")},
+    "pdf": "pdf",
+    **{ext: "image" for ext in ("jpg", "jpeg", "png", "gif", "bmp", "tiff", "webp")},
+    **{ext: "audio" for ext in ("wav", "mp3", "m4a", "mp4")},
+    "zip": "archive",
+}
+
+
+def cost_class(extension: str) -> str:
+    return EXTENSION_CLASSES.get(extension.lower(), DEFAULT_COST_CLASS)
+
+
+class AdmissionController:
+    """Admits work while the estimated queueing delay stays under a target."""
+
+    def __init__(self, capacity: float, target_delay: float = ADMISSION_TARGET_DELAY_SECONDS,
+                 max_retry_after: int = ADMISSION_MAX_RETRY_AFTER, smoothing: float = 0.1):
+        self.capacity = max(capacity, 1.0)
+        self.target_delay = target_delay
+        self.max_retry_after = max_retry_after
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.in_flight_cost = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        # Observed / estimated duration per class, learned from completed requests
+        self.correction: Dict[str, float] = {name: 1.0 for name in COST_CLASSES}
+
+    def estimate(self, extension: str, size: int) -> Tuple[str, float]:
+        """(class, estimated worker-seconds) for a file of this type and size."""
+        name = cost_class(extension)
+        cls = COST_CLASSES[name]
+        return name, (cls.base + cls.per_mb * size / (1024 * 1024)) * self.correction[name]
+
+    def queue_delay(self) -> float:
+        """Seconds a request admitted now would wait for the backlog ahead of it."""
+        return self.in_flight_cost / self.capacity
+
+    def try_admit(self, cost: float) -> Optional[int]:
+        """
+        Admit work of ``cost`` worker-seconds. Returns None when admitted,
+        otherwise the Retry-After seconds to send with the rejection.
+
+        An idle server admits anything, however expensive.
+        """
+        delay = self.queue_delay()
+        if self.in_flight and delay > self.target_delay:
+            self.rejected += 1
+            metrics.increment("admission_rejected")
+            # Time until enough of the backlog has drained for the delay to fit the target
+            retry_after = math.ceil(delay - self.target_delay)
+            return min(max(retry_after, 1), self.max_retry_after)
+        self.in_flight += 1
+        self.in_flight_cost += cost
+        self.admitted += 1
+        metrics.set_gauge("admission_queue_delay_seconds", round(self.queue_delay(), 3))
+        return None
+
+    def reestimate(self, old_cost: float, new_cost: float) -> None:
+        """Replace the estimate of admitted work once more is known about it."""
+        self.in_flight_cost = max(self.in_flight_cost + new_cost - old_cost, 0.0)
+        metrics.set_gauge("admission_queue_delay_seconds", round(self.queue_delay(), 3))
+
+    def release(self, cost: float, name: Optional[str] = None, elapsed: Optional[float] = None) -> None:
+        """Finish admitted work; with ``elapsed``, refine the estimates for its class."""
+        self.in_flight -= 1
+        self.in_flight_cost = max(self.in_flight_cost - cost, 0.0) if self.in_flight else 0.0
+        metrics.set_gauge("admission_queue_delay_seconds", round(self.queue_delay(), 3))
+        if name is None or elapsed is None or cost <= 0:
+            return
+        # Requests wait for each other, so elapsed time overstates the work; only
+        # requests that ran (nearly) alone say how long the work itself takes
+        ratio = min(max(elapsed / (cost / self.correction[name]), 0.1), 10.0)
+        self.correction[name] += self.smoothing * (ratio - self.correction[name])
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "target_delay_seconds": self.target_delay,
+            "in_flight": self.in_flight,
+            "in_flight_cost_seconds": round(self.in_flight_cost, 2),
+            "queue_delay_seconds": round(self.queue_delay(), 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "cost_correction": {name: round(value, 2) for name, value in self.correction.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware putting the given POST paths behind an AdmissionController.
+
+    Requests are admitted on an estimate from Content-Length (capped at
+    ``max_size``, so a claimed size the upload limits will refuse cannot hold
+    capacity) and the default file class. When the application reads the
+    first body chunk, the filenames in its multipart part headers refine the
+    estimate. Nothing of the body is read before the decision.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, paths: Iterable[str],
+                 max_size: Optional[int] = None):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        size = int(content_length) if content_length.isdigit() else 0
+        if self.max_size is not None:
+            size = min(size, self.max_size)
+        name, cost = self.controller.estimate("", size)
+
+        retry_after = self.controller.try_admit(cost)
+        if retry_after is not None:
+            logger.info("Shed %s request (%.1f worker-seconds by size): queue delay %.1fs, retry after %ds",
+                        scope["path"], cost, self.controller.queue_delay(), retry_after)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy converting other files, please retry later"},
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        inspected = False
+
+        async def inspecting_receive() -> Message:
+            nonlocal inspected, name, cost
+            message = await receive()
+            if not inspected:
+                inspected = True
+                new_name, new_cost = self._estimate(message, size)
+                self.controller.reestimate(cost, new_cost)
+                name, cost = new_name, new_cost
+            return message
+
+        status = 0
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        alone = self.controller.in_flight == 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, inspecting_receive, tracking_send)
+        finally:
+            elapsed = time.perf_counter() - start if alone and status == 200 else None
+            self.controller.release(cost, name, elapsed)
+
+    def _estimate(self, first: Message, size: int) -> Tuple[str, float]:
+        """Most expensive estimate over the filenames visible in the first chunk."""
+        body = first.get("body", b"") if first["type"] == "http.request" else b""
+        extensions = [
+            filename.rsplit(b".", 1)[-1].decode("ascii", errors="ignore")
+            for filename in _FILENAME.findall(body) if b"." in filename
+        ]
+        estimates = [self.controller.estimate(extension, size) for extension in extensions or [""]]
+        return max(estimates, key=lambda estimate: estimate[1])
+
+
+# Global controller; in thread mode (CONVERSION_WORKERS=0) conversions share the default executor
+admission_controller = AdmissionController(ADMISSION_CAPACITY or conversion_pool.workers or os.cpu_count() or 1)
@@ -0,0 +1,149 @@
+"""
+ZIP archive conversion with decompression-bomb limits.
+
+The central directory is checked against entry-count, total uncompressed size
+and compression-ratio budgets before any member is decompressed. Members are
+then read under the same budgets (declared sizes are not trusted), converted
+in parallel and assembled into one markdown document in archive order.
+"""
+import io
+import os
+import asyncio
+import logging
+import zipfile
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ZIP_MAX_ENTRIES = int(os.getenv("ZIP_MAX_ENTRIES", "1000"))
+ZIP_MAX_TOTAL_UNCOMPRESSED = int(float(os.getenv("ZIP_MAX_TOTAL_UNCOMPRESSED_MB", "200")) * 1024 * 1024)
+ZIP_MAX_MEMBER_SIZE = int(float(os.getenv("ZIP_MAX_MEMBER_MB", "50")) * 1024 * 1024)
+ZIP_MAX_COMPRESSION_RATIO = float(os.getenv("ZIP_MAX_COMPRESSION_RATIO", "100"))
+ZIP_MAX_PARALLEL = int(os.getenv("ZIP_MAX_PARALLEL", "8"))
+
+_READ_CHUNK = 1024 * 1024
+
+
+class ArchiveLimitExceeded(ValueError):
+    """The archive breaks one of the decompression budgets."""
+
+
+def _member_extension(name: str) -> str:
+    base = name.rsplit('/', 1)[-1]
+    return base.rsplit('.', 1)[-1].lower() if '.' in base else ''
+
+
+def check_central_directory(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """
+    Validate the central directory and return the file entries in archive order.
+
+    Raises:
+        ArchiveLimitExceeded: if the archive exceeds the entry or size budgets
+    """
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if len(members) > ZIP_MAX_ENTRIES:
+        raise ArchiveLimitExceeded(f"Archive has {len(members)} entries (max {ZIP_MAX_ENTRIES})")
+
+    declared_total = sum(info.file_size for info in members)
+    if declared_total > ZIP_MAX_TOTAL_UNCOMPRESSED:
+        raise ArchiveLimitExceeded(
+            f"Archive expands to {declared_total / (1024 * 1024):.0f}MB "
+            f"(max {ZIP_MAX_TOTAL_UNCOMPRESSED / (1024 * 1024):.0f}MB)"
+        )
+
+    for info in members:
+        if info.compress_size and info.file_size / info.compress_size > ZIP_MAX_COMPRESSION_RATIO:
+            raise ArchiveLimitExceeded(
+                f"Member {info.filename} has a suspicious compression ratio "
+                f"({info.file_size / info.compress_size:.0f}:1)"
+            )
+    return members
+
+
+class _Budget:
+    """Uncompressed bytes left for the whole archive."""
+
+    def __init__(self, total: int):
+        self.remaining = total
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, budget: _Budget) -> bytes:
+    """Decompress one member, enforcing its declared size and the archive budget."""
+    limit = min(info.file_size, ZIP_MAX_MEMBER_SIZE, budget.remaining)
+    chunks = []
+    size = 0
+    with archive.open(info) as member:
+        while True:
+            chunk = member.read(_READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise ArchiveLimitExceeded(f"Member {info.filename} expands beyond its allowed size")
+            chunks.append(chunk)
+    budget.remaining -= size
+    return b"".join(chunks)
+
+
+async def convert_archive(
+    content: bytes,
+    convert_member: Callable[[bytes, str], Awaitable[str]],
+    member_extensions: Optional[Iterable[str]] = None,
+    max_parallel: int = ZIP_MAX_PARALLEL,
+) -> str:
+    """
+    Convert every supported member of a ZIP archive.
+
+    Args:
+        content: Archive bytes
+        convert_member: Coroutine converting (member bytes, extension) to markdown
+        member_extensions: Extensions to convert (others are listed as skipped)
+        max_parallel: Members decompressed and converted at the same time
+
+    Returns:
+        Markdown with one section per member, in archive order
+
+    Raises:
+        ArchiveLimitExceeded: if the archive breaks the decompression budgets
+        zipfile.BadZipFile: if the content is not a valid archive
+    """
+    allowed = set(member_extensions) - {'zip'} if member_extensions is not None else None
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    members = check_central_directory(archive)
+    budget = _Budget(ZIP_MAX_TOTAL_UNCOMPRESSED)
+    semaphore = asyncio.Semaphore(max(max_parallel, 1))
+    read_lock = asyncio.Lock()
+
+    async def convert_one(info: zipfile.ZipInfo) -> str:
+        extension = _member_extension(info.filename)
+        if extension == 'zip':
+            return "*Skipped: nested archives are not expanded.*"
+        if not extension or (allowed is not None and extension not in allowed):
+            return f"*Skipped: unsupported file type {extension or '(none)'}.*"
+
+        async with semaphore:
+            # Members are decompressed one at a time; conversions run in parallel
+            async with read_lock:
+                data = await asyncio.to_thread(_read_member, archive, info, budget)
+            if not data:
+                return "*Empty file.*"
+            try:
+                return await convert_member(data, extension)
+            except Exception as e:
+                logger.warning("Failed to convert archive member %s: %s", info.filename, e)
+                return f"*Conversion error: {e}*"
+
+    tasks = [asyncio.create_task(convert_one(info)) for info in members]
+    try:
+        sections = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        archive.close()
+
+    parts = [f"Archive with {len(members)} files."]
+    for info, markdown in zip(members, sections):
+        parts.append(f"## File: {info.filename}\n\n{markdown.strip()}")
+    return "\n\n".join(parts) + "\n"
@@ -0,0 +1,245 @@
+"""
+Audio preprocessing before Cloudflare AI transcription.
+
+Whisper works on 16 kHz mono, so uploads are decoded and downmixed to that
+(WAV with the wave module, everything else with ffmpeg when it is installed).
+Leading, trailing and long internal silences are cut with a frame-energy
+detector, and the result is re-encoded compactly (MP3 through ffmpeg, 16-bit
+WAV otherwise). An OffsetMap records where each kept span came from, so
+segment timestamps returned by the model can be mapped back to the original
+recording.
+
+numpy is required for decoding and silence detection; without it, or when the
+audio cannot be decoded, the original bytes are sent unchanged.
+"""
+import io
+import os
+import math
+import time
+import wave
+import bisect
+import shutil
+import logging
+import tempfile
+import subprocess
+from typing import List, NamedTuple, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AUDIO_AI_SAMPLE_RATE = 16000
+AUDIO_AI_BITRATE = os.getenv("AUDIO_AI_BITRATE", "32k")
+# Frames quieter than both the absolute floor and (peak - relative) dB count as silence
+AUDIO_SILENCE_FLOOR_DB = float(os.getenv("AUDIO_SILENCE_FLOOR_DB", "-45"))
+AUDIO_SILENCE_RELATIVE_DB = float(os.getenv("AUDIO_SILENCE_RELATIVE_DB", "35"))
+# Only silences at least this long are cut; this much is kept around speech
+AUDIO_MIN_SILENCE_MS = int(os.getenv("AUDIO_MIN_SILENCE_MS", "800"))
+AUDIO_KEEP_SILENCE_MS = int(os.getenv("AUDIO_KEEP_SILENCE_MS", "200"))
+AUDIO_FFMPEG_TIMEOUT = float(os.getenv("AUDIO_FFMPEG_TIMEOUT", "60"))
+
+_FRAME_MS = 30
+
+
+class OffsetMap:
+    """
+    Maps times in the trimmed audio back to the original recording.
+
+    Each span is (output_start, source_start) in seconds; a span runs until the
+    next one starts.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float]], removed_seconds: float = 0.0):
+        self.spans = spans or [(0.0, 0.0)]
+        self.removed_seconds = removed_seconds
+        self._starts = [output for output, _ in self.spans]
+
+    def to_source(self, seconds: float) -> float:
+        index = max(bisect.bisect_right(self._starts, seconds) - 1, 0)
+        output_start, source_start = self.spans[index]
+        return source_start + (seconds - output_start)
+
+
+class PreparedAudio(NamedTuple):
+    """Result of preprocessing; picklable so it can cross the worker pool."""
+    data: bytes
+    original_size: int
+    duration: Optional[float] = None
+    offsets: Optional[OffsetMap] = None
+    skip_reason: Optional[str] = None
+
+
+def _decode_wav(content: bytes):
+    """PCM WAV to (float32 mono samples in [-1, 1], sample rate)."""
+    import numpy as np
+
+    with wave.open(io.BytesIO(content)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        values = bytes3[:, 0].astype(np.int32) | (bytes3[:, 1].astype(np.int32) << 8) | (bytes3[:, 2].astype(np.int32) << 16)
+        samples = (np.where(values >= 1 << 23, values - (1 << 24), values)).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def _decode_ffmpeg(content: bytes, extension: str):
+    """Any format ffmpeg reads to (float32 mono samples at 16 kHz, 16000)."""
+    import numpy as np
+
+    # A file rather than a pipe: MP4/M4A often keep their index at the end
+    with tempfile.NamedTemporaryFile(suffix=f".{extension}") as source:
+        source.write(content)
+        source.flush()
+        completed = subprocess.run(
+            ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-i", source.name,
+             "-vn", "-ac", "1", "-ar", str(AUDIO_AI_SAMPLE_RATE), "-f", "s16le", "-"],
+            capture_output=True, timeout=AUDIO_FFMPEG_TIMEOUT, check=True,
+        )
+    return np.frombuffer(completed.stdout, dtype='<i2').astype(np.float32) / 32768, AUDIO_AI_SAMPLE_RATE
+
+
+def _resample(samples, rate: int, target: int = AUDIO_AI_SAMPLE_RATE):
+    """Linear resampling with a box pre-filter when downsampling; plenty for speech."""
+    import numpy as np
+
+    if rate == target or len(samples) == 0:
+        return samples
+    if rate > target:
+        width = int(math.ceil(rate / target))
+        if width > 1:
+            samples = np.convolve(samples, np.full(width, 1.0 / width, dtype=np.float32), mode='same')
+    count = int(len(samples) * target / rate)
+    positions = np.arange(count, dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def detect_speech(samples, rate: int) -> List[Tuple[int, int]]:
+    """
+    Sample ranges to keep: voiced frames merged across short pauses and padded
+    by AUDIO_KEEP_SILENCE_MS. Returns [] when the whole clip is silent.
+    """
+    import numpy as np
+
+    frame = max(int(rate * _FRAME_MS / 1000), 1)
+    count = len(samples) // frame
+    if count == 0:
+        return [(0, len(samples))]
+
+    frames = samples[:count * frame].reshape(count, frame)
+    db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+    threshold = max(AUDIO_SILENCE_FLOOR_DB, db.max() - AUDIO_SILENCE_RELATIVE_DB)
+    voiced = np.flatnonzero(db > threshold)
+    if len(voiced) == 0:
+        return []
+
+    min_gap = max(int(math.ceil(AUDIO_MIN_SILENCE_MS / _FRAME_MS)), 1)
+    pad = int(AUDIO_KEEP_SILENCE_MS / _FRAME_MS)
+    breaks = np.flatnonzero(np.diff(voiced) - 1 >= min_gap)
+    starts = [voiced[0]] + [voiced[i + 1] for i in breaks]
+    ends = [voiced[i] + 1 for i in breaks] + [voiced[-1] + 1]
+
+    ranges: List[Tuple[int, int]] = []
+    for start, end in zip(starts, ends):
+        first = max(int(start) - pad, 0) * frame
+        last = len(samples) if int(end) + pad >= count else (int(end) + pad) * frame
+        if ranges and first <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], last)
+        else:
+            ranges.append((first, last))
+    return ranges
+
+
+def _encode(samples, rate: int) -> bytes:
+    """MP3 through ffmpeg when available, 16-bit mono WAV otherwise."""
+    import numpy as np
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    if shutil.which("ffmpeg"):
+        try:
+            completed = subprocess.run(
+                ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(rate),
+                 "-ac", "1", "-i", "-", "-c:a", "libmp3lame", "-b:a", AUDIO_AI_BITRATE, "-f", "mp3", "-"],
+                input=pcm, capture_output=True, timeout=AUDIO_FFMPEG_TIMEOUT, check=True,
+            )
+            if completed.stdout:
+                return completed.stdout
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning("ffmpeg MP3 encoding failed, sending WAV: %s", e)
+
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return output.getvalue()
+
+
+def prepare_audio_for_ai(content: bytes, extension: str) -> PreparedAudio:
+    """
+    Decode to 16 kHz mono, cut silences and re-encode for transcription.
+
+    Returns the original bytes when numpy is missing or the audio cannot be
+    decoded, and flags clips that are entirely silent for skipping.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return PreparedAudio(content, len(content))
+
+    start = time.perf_counter()
+    try:
+        if extension == 'wav':
+            try:
+                samples, rate = _decode_wav(content)
+            except (wave.Error, EOFError, ValueError):
+                # Compressed WAV variants (ADPCM, float) go through ffmpeg
+                if not shutil.which("ffmpeg"):
+                    raise
+                samples, rate = _decode_ffmpeg(content, extension)
+        elif shutil.which("ffmpeg"):
+            samples, rate = _decode_ffmpeg(content, extension)
+        else:
+            return PreparedAudio(content, len(content))
+        samples = _resample(samples, rate)
+    except Exception as e:
+        logger.warning("Audio decoding failed, sending the original: %s", e)
+        metrics.increment("audio_preprocess_failures")
+        return PreparedAudio(content, len(content))
+
+    rate = AUDIO_AI_SAMPLE_RATE
+    duration = len(samples) / rate
+    ranges = detect_speech(samples, rate)
+    if not ranges:
+        metrics.increment("audio_ai_skipped", reason="silent")
+        return PreparedAudio(content, len(content), duration, skip_reason="no speech detected")
+
+    spans = []
+    output_start = 0
+    for first, last in ranges:
+        spans.append((output_start / rate, first / rate))
+        output_start += last - first
+    trimmed = np.concatenate([samples[first:last] for first, last in ranges]) if len(ranges) > 1 \
+        else samples[ranges[0][0]:ranges[0][1]]
+    removed = duration - len(trimmed) / rate
+
+    data = _encode(trimmed, rate)
+    metrics.observe("audio_preprocess_seconds", time.perf_counter() - start)
+    metrics.increment("audio_silence_removed_seconds", round(removed, 3))
+    if removed < 0.001 and len(data) >= len(content):
+        return PreparedAudio(content, len(content), duration)
+    metrics.increment("audio_preprocess_bytes_saved", max(len(content) - len(data), 0))
+    return PreparedAudio(data, len(content), duration, OffsetMap(spans, removed))
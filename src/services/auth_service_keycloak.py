@@ -47,11 +47,11 @@ class KeycloakAuthService:
                     roles=user_data.get('realm_access', {}).get('roles', [])
                 )
             else:
-                logger.warning(f"Token validation failed: {response.status_code}")
+                logger.warning("Token validation failed: %s", response.status_code)
                 return None
                 
         except Exception as e:
-            logger.error(f"Error validating token: {str(e)}")
+            logger.error("Error validating token: %s", e)
             return None
     
     async def get_user_info(self, token: str) -> Optional[Dict[str, Any]]:
@@ -66,11 +66,11 @@ class KeycloakAuthService:
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.warning(f"Failed to get user info: {response.status_code}")
+                logger.warning("Failed to get user info: %s", response.status_code)
                 return None
                 
         except Exception as e:
-            logger.error(f"Error getting user info: {str(e)}")
+            logger.error("Error getting user info: %s", e)
             return None
 
     async def introspect_token(self, token: str) -> Dict[str, Any]:
@@ -89,11 +89,11 @@ class KeycloakAuthService:
                 result = response.json()
                 return result
             else:
-                logger.warning(f"Token introspection failed: {response.status_code}")
+                logger.warning("Token introspection failed: %s", response.status_code)
                 return {"active": False}
                 
         except Exception as e:
-            logger.error(f"Error introspecting token: {str(e)}")
+            logger.error("Error introspecting token: %s", e)
             return {"active": False}
     
     def get_admin_token(self) -> Optional[str]:
@@ -111,11 +111,11 @@ class KeycloakAuthService:
                 token_data = response.json()
                 return token_data['access_token']
             else:
-                logger.error(f"Failed to get admin token: {response.status_code} - {response.text}")
+                logger.error("Failed to get admin token: %s - %s", response.status_code, response.text)
                 return None
                 
         except Exception as e:
-            logger.error(f"Error getting admin token: {str(e)}")
+            logger.error("Error getting admin token: %s", e)
             return None
 
     async def get_current_user(self, token: str) -> Optional[User]:
@@ -0,0 +1,254 @@
+"""
+Per-client rate limiting of the conversion routes.
+
+Each caller gets a token bucket keyed by user id, or by client IP for
+anonymous callers, sized by plan (RATE_LIMIT_PER_MINUTE, e.g.
+``anonymous=10,basic=30,premium=120,unlimited=600``; the per-minute figure
+is also the burst). The check runs in ASGI middleware, before the body is
+parsed and before any database or identity-provider call:
+
+- a bearer token is mapped to its user only if it was already verified by
+  the auth dependency on an earlier request (``remember_token``); an unknown
+  token is limited by IP until then, so forged tokens buy nothing;
+- the client IP is taken from ``X-Forwarded-For`` only when the connection
+  comes from RATE_LIMIT_TRUSTED_PROXIES (the nginx upstream).
+
+The limiter is off unless RATE_LIMIT_ENABLED is set: behind a proxy that is
+not in RATE_LIMIT_TRUSTED_PROXIES every caller would share the proxy's
+bucket, so it is only switched on together with the proxy addresses.
+
+Buckets live in process memory by default. With RATE_LIMIT_REDIS_URL set
+(and the ``redis`` package installed) they are kept in Redis, so limits hold
+across replicas; if Redis is unreachable the local buckets take over.
+
+Responses carry ``RateLimit-Limit``, ``RateLimit-Remaining``,
+``RateLimit-Reset`` and ``RateLimit-Policy``; refusals are 429 with
+``Retry-After``.
+"""
+import os
+import math
+import time
+import hashlib
+import ipaddress
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import metrics
+from .rate_limit import TokenBucket
+from .scheduler import DEFAULT_LANE as ANONYMOUS_PLAN, parse_lane_values
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+RATE_LIMIT_PER_MINUTE = os.getenv("RATE_LIMIT_PER_MINUTE", "anonymous=10,basic=30,premium=120,unlimited=600")
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# How long a verified token keeps mapping to its user (and plan)
+RATE_LIMIT_TOKEN_TTL_SECONDS = float(os.getenv("RATE_LIMIT_TOKEN_TTL_SECONDS", "900"))
+
+# Atomic refill-and-take on a Redis hash {tokens, ts}; returns {allowed, tokens}
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(spec: str) -> List[Network]:
+    networks = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid trusted proxy %r", part)
+    return networks
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RateLimitDecision:
+    """Outcome of one check, with the values for the RateLimit-* headers."""
+
+    def __init__(self, allowed: bool, limit: int, remaining: float, rate: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = max(int(remaining), 0)
+        # Full again after this long; when refused, a token is back after retry_after
+        self.reset = math.ceil(max(limit - remaining, 0) / rate) if rate > 0 else 0
+        self.retry_after = max(math.ceil((1 - remaining) / rate), 1) if rate > 0 and not allowed else 0
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (b"ratelimit-limit", str(self.limit).encode()),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(self.reset).encode()),
+            (b"ratelimit-policy", f"{self.limit};w=60".encode()),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(self.retry_after).encode()))
+        return headers
+
+
+class ClientRateLimiter:
+    """Per-client token buckets by plan, in memory or in Redis."""
+
+    def __init__(self, per_minute: Dict[str, float], trusted_proxies: Iterable[Network] = (),
+                 redis_url: str = "", max_keys: int = RATE_LIMIT_MAX_KEYS,
+                 token_ttl: float = RATE_LIMIT_TOKEN_TTL_SECONDS):
+        self.per_minute = per_minute
+        self.trusted_proxies = list(trusted_proxies)
+        self.max_keys = max_keys
+        self.token_ttl = token_ttl
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._tokens: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._redis = None
+        self._script = None
+        self.redis_errors = 0
+        self.rejected = 0
+        if redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(redis_url)
+                self._script = self._redis.register_script(_REDIS_TAKE)
+            except ImportError:
+                logger.warning("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; "
+                               "rate limits are per process")
+
+    def remember_token(self, token: str, user_id: str, plan: Optional[str]) -> None:
+        """Record that ``token`` was verified as ``user_id``; later requests with it are keyed by user."""
+        key = _hash_token(token)
+        self._tokens[key] = (user_id, plan or "basic", time.monotonic() + self.token_ttl)
+        self._tokens.move_to_end(key)
+        while len(self._tokens) > self.max_keys:
+            self._tokens.popitem(last=False)
+
+    def client_ip(self, scope: Scope, headers: Headers) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if not self._trusted(peer):
+            return peer
+        # Walk the chain right to left: the first hop our proxies did not add is the client
+        hops = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def identify(self, scope: Scope) -> Tuple[str, str]:
+        """(bucket key, plan) of the caller, without any I/O."""
+        headers = Headers(scope=scope)
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            known = self._tokens.get(_hash_token(token.strip()))
+            if known is not None and known[2] > time.monotonic():
+                return f"user:{known[0]}", known[1]
+        return f"ip:{self.client_ip(scope, headers)}", ANONYMOUS_PLAN
+
+    async def check(self, key: str, plan: str) -> RateLimitDecision:
+        limit = self.per_minute.get(plan, self.per_minute.get(ANONYMOUS_PLAN, 10))
+        rate = limit / 60
+        if self._script is not None:
+            try:
+                allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[rate, limit, time.time()])
+                return RateLimitDecision(bool(allowed), int(limit), float(tokens), rate)
+            except Exception as e:
+                self.redis_errors += 1
+                metrics.increment("rate_limit_backend_errors")
+                logger.warning("Rate limit backend unavailable, using local buckets: %s", e)
+        return self._check_local(key, limit, rate)
+
+    def _check_local(self, key: str, limit: float, rate: float) -> RateLimitDecision:
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.capacity != limit:
+            bucket = self._buckets[key] = TokenBucket(rate, limit)
+            while len(self._buckets) > self.max_keys:
+                # Least recently seen clients first; their buckets have mostly refilled
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        allowed, _ = bucket.try_acquire()
+        return RateLimitDecision(allowed, int(limit), bucket.tokens, rate)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self._script is not None else "memory",
+            "per_minute": self.per_minute,
+            "tracked_clients": len(self._buckets),
+            "known_tokens": len(self._tokens),
+            "rejected": self.rejected,
+            "backend_errors": self.redis_errors,
+        }
+
+
+class ClientRateLimitMiddleware:
+    """ASGI middleware applying a ClientRateLimiter to the given POST paths."""
+
+    def __init__(self, app: ASGIApp, limiter: ClientRateLimiter, paths: Iterable[str]):
+        self.app = app
+        self.limiter = limiter
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key, plan = self.limiter.identify(scope)
+        decision = await self.limiter.check(key, plan)
+        if not decision.allowed:
+            self.limiter.rejected += 1
+            metrics.increment("rate_limited", plan=plan)
+            logger.info("Rate limited %s on %s (%s plan)", key.split(":", 1)[0], scope["path"], plan)
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": f"Too many requests, retry in {decision.retry_after}s"},
+            )
+            response.raw_headers.extend(decision.headers())
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *decision.headers()]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+# Global limiter instance
+client_rate_limiter = ClientRateLimiter(
+    parse_lane_values(RATE_LIMIT_PER_MINUTE),
+    parse_networks(RATE_LIMIT_TRUSTED_PROXIES),
+    RATE_LIMIT_REDIS_URL,
+)
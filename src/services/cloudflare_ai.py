@@ -2,14 +2,57 @@
 Cloudflare AI Service for image analysis and audio transcription.
 """
 import os
+import time
 import base64
+import asyncio
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Tuple
 import logging
 
+from .image_cache import image_analysis_cache
+from .metrics import metrics
+from .outbound import RETRYABLE_STATUS, Deadline, Hedger, RetryPolicy, parse_retry_after
+from .rate_limit import TokenBucket
+from .resilience import AdaptiveLimiter, CircuitBreaker
+from .tracing import current_traceparent, span
+
 logger = logging.getLogger(__name__)
 
 
+def _format_timestamp(seconds: float) -> str:
+    minutes, secs = divmod(max(seconds, 0.0), 60)
+    hours, minutes = divmod(int(minutes), 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:04.1f}"
+    return f"{minutes:02d}:{secs:04.1f}"
+
+
+def format_segments(segments: List[Dict[str, Any]], offsets=None) -> str:
+    """
+    Timestamped segment list. ``offsets`` (an audio_preprocessing.OffsetMap)
+    maps times in trimmed audio back to the original recording.
+    """
+    lines = []
+    for segment in segments:
+        text = str(segment.get("text", "")).strip()
+        if not text or "start" not in segment:
+            continue
+        start, end = float(segment["start"]), float(segment.get("end", segment["start"]))
+        if offsets is not None:
+            start, end = offsets.to_source(start), offsets.to_source(end)
+        lines.append(f"- [{_format_timestamp(start)} - {_format_timestamp(end)}] {text}")
+    return "\n".join(lines)
+
+
+IMAGE_MODEL = "@cf/microsoft/resnet-50"
+AUDIO_MODEL = "@cf/openai/whisper-large-v3-turbo"
+
+# Total time budget per analysis, shared by queueing, retries and backoff
+AI_IMAGE_DEADLINE_SECONDS = float(os.getenv("AI_IMAGE_DEADLINE_SECONDS", "30"))
+AI_AUDIO_DEADLINE_SECONDS = float(os.getenv("AI_AUDIO_DEADLINE_SECONDS", "60"))
+AI_HEDGE_IMAGES = os.getenv("AI_HEDGE_IMAGES", "false").lower() in ("1", "true", "yes")
+
+
 class CloudflareAIService:
     """Service class for Cloudflare AI API interactions."""
     
@@ -21,6 +64,42 @@ class CloudflareAIService:
             "https://api.cloudflare.com/client/v4/accounts"
         )
         
+        # Fail fast while Workers AI is unhealthy instead of waiting out timeouts
+        self.breaker = CircuitBreaker(
+            "cloudflare_ai",
+            failure_threshold=int(os.getenv("AI_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("AI_BREAKER_RESET_SECONDS", "30")),
+        )
+        # One adaptive concurrency limit per model: their latencies differ by an order of magnitude
+        self.limiters = {
+            kind: AdaptiveLimiter(
+                kind,
+                initial=int(os.getenv("AI_CONCURRENCY_INITIAL", "8")),
+                maximum=int(os.getenv("AI_CONCURRENCY_MAX", "64")),
+                max_wait=float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", "10")),
+            )
+            for kind in ("image", "audio")
+        }
+        # Account-wide request quota shared by all models, so retries cannot exceed it either
+        self.bucket = TokenBucket(
+            rate=float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "300")) / 60.0,
+            capacity=float(os.getenv("AI_RATE_LIMIT_BURST", "20")),
+        )
+        self.retry_policy = RetryPolicy(
+            max_retries=int(os.getenv("AI_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("AI_RETRY_BASE_SECONDS", "0.5")),
+            max_delay=float(os.getenv("AI_RETRY_MAX_SECONDS", "8")),
+        )
+        self.retries: Dict[str, int] = {}
+        # Backup ResNet-50 calls for the slowest few percent of image analyses
+        self.image_hedger = Hedger(
+            "image",
+            budget=float(os.getenv("AI_HEDGE_BUDGET", "0.05")),
+            percentile=float(os.getenv("AI_HEDGE_PERCENTILE", "0.95")),
+            min_samples=int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20")),
+        ) if AI_HEDGE_IMAGES else None
+        self._client: Optional[httpx.AsyncClient] = None
+        
         if not self.account_id or not self.api_token:
             logger.warning("Cloudflare AI credentials not configured. Image analysis and audio transcription will be limited.")
             self.enabled = False
@@ -30,153 +109,305 @@ class CloudflareAIService:
     
     def _get_headers(self) -> Dict[str, str]:
         """Get HTTP headers for Cloudflare API requests."""
-        return {
+        headers = {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json"
         }
+        traceparent = current_traceparent()
+        if traceparent is not None:
+            headers["traceparent"] = traceparent
+        return headers
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, so calls reuse pooled TLS connections."""
+        if self._client is None:
+            max_connections = max(limiter.maximum for limiter in self.limiters.values())
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        return self._client
+    
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    async def analyze_image(self, image_data: bytes, prompt: str = None) -> Optional[str]:
+    async def _run_model(self, kind: str, model: str, build_payload: Callable[[], Dict[str, Any]],
+                         deadline_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        POST to a Workers AI model through the shared outbound scheduler.
+        
+        Each attempt waits for the account rate limit and a concurrency slot,
+        then goes through the circuit breaker. Rate limits, 5xx responses and
+        timeouts are retried with jittered exponential backoff (or after the
+        upstream's Retry-After) while the deadline budget allows.
+        
+        Returns:
+            Parsed JSON response, or None if the call failed or was rejected
+        """
+        with span("ai", kind=kind, model=model) as ai_span:
+            result = await self._run_with_retries(kind, model, build_payload, deadline_seconds)
+            if ai_span is not None:
+                ai_span.set_attribute("success", result is not None)
+            return result
+    
+    async def _run_with_retries(self, kind: str, model: str, build_payload: Callable[[], Dict[str, Any]],
+                                deadline_seconds: float) -> Optional[Dict[str, Any]]:
+        url = f"{self.base_url}/{self.account_id}/ai/run/{model}"
+        deadline = Deadline(deadline_seconds)
+        attempt = 0
+        while True:
+            with span("ai.attempt", attempt=attempt) as attempt_span:
+                outcome, result, retry_after = await self._attempt(kind, url, build_payload, deadline)
+                if attempt_span is not None:
+                    attempt_span.set_attribute("outcome", outcome)
+            if outcome == "ok":
+                return result
+            if outcome not in ("rate_limited", "server_error", "timeout"):
+                return None
+            if attempt >= self.retry_policy.max_retries:
+                logger.error("Cloudflare %s request failed after %d attempts (%s)", kind, attempt + 1, outcome)
+                return None
+            delay = self.retry_policy.delay(attempt, retry_after)
+            if delay >= deadline.remaining():
+                metrics.increment("ai_deadline_exceeded", kind=kind)
+                logger.error("Cloudflare %s request out of time budget after %d attempts (%s)", kind, attempt + 1, outcome)
+                return None
+            attempt += 1
+            self.retries[outcome] = self.retries.get(outcome, 0) + 1
+            metrics.increment("ai_retries", kind=kind, reason=outcome)
+            logger.warning("Retrying Cloudflare %s request in %.2fs (%s, retry %d)", kind, delay, outcome, attempt)
+            await asyncio.sleep(delay)
+    
+    async def _attempt(self, kind: str, url: str, build_payload: Callable[[], Dict[str, Any]],
+                       deadline: Deadline) -> Tuple[str, Optional[Dict[str, Any]], Optional[float]]:
+        """
+        One request. Returns (outcome, parsed JSON, Retry-After seconds).
+        
+        The payload is built only once the request may be sent, so queued and
+        backing-off requests do not hold base64 copies of their uploads.
+        """
+        # Fail fast while the circuit is open: no rate token, no queueing
+        if not self.breaker.allow():
+            logger.warning("Cloudflare AI circuit open, skipping %s request", kind)
+            return "circuit_open", None, None
+        limiter = self.limiters[kind]
+        try:
+            if not await self.bucket.acquire(timeout=deadline.remaining()):
+                self.breaker.record_ignored()
+                metrics.increment("ai_deadline_exceeded", kind=kind)
+                logger.warning("Cloudflare AI rate limit: no %s request slot within the time budget", kind)
+                return "queue_timeout", None, None
+            if not await limiter.acquire(timeout=deadline.remaining()):
+                self.breaker.record_ignored()
+                logger.warning("Cloudflare AI %s concurrency queue wait exceeded", kind)
+                return "queue_timeout", None, None
+        except asyncio.CancelledError:
+            # A cancelled half-open probe must not keep the breaker waiting for it
+            self.breaker.record_ignored()
+            raise
+        
+        latency = None
+        overloaded = False
+        start = time.perf_counter()
+        try:
+            payload = build_payload()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sending %s request to Cloudflare AI, base64 size: %d characters",
+                             kind, sum(len(v) for v in payload.values() if isinstance(v, str)))
+            
+            with span("ai.http", bytes=sum(len(v) for v in payload.values() if isinstance(v, str))) as http_span:
+                response = await self._get_client().post(
+                    url,
+                    headers=self._get_headers(),
+                    json=payload,
+                    timeout=max(deadline.remaining(), 0.001)
+                )
+                if http_span is not None:
+                    http_span.set_attribute("status_code", response.status_code)
+            del payload
+            latency = time.perf_counter() - start
+            metrics.observe("ai_request_seconds", latency, kind=kind, status=response.status_code)
+            logger.debug("Cloudflare %s response status: %d", kind, response.status_code)
+            
+            if response.status_code == 200:
+                self.breaker.record_success()
+                result = response.json()
+                # Model output can be large: only its size, and only at DEBUG
+                logger.debug("Cloudflare %s response: %d bytes", kind, len(response.content))
+                return "ok", result, None
+            
+            logger.error("Cloudflare %s request failed: %d - %.500s", kind, response.status_code, response.text)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                # Rate limited: back off concurrency and hold every caller back, but
+                # the upstream itself is healthy
+                overloaded = True
+                self.breaker.record_ignored()
+                self.bucket.pause(retry_after if retry_after is not None else self.retry_policy.base_delay)
+                return "rate_limited", None, retry_after
+            if response.status_code >= 500:
+                overloaded = True
+                self.breaker.record_failure()
+                outcome = "server_error" if response.status_code in RETRYABLE_STATUS else "failed"
+                return outcome, None, retry_after
+            self.breaker.record_ignored()
+            return "failed", None, None
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            overloaded = True
+            self.breaker.record_failure()
+            metrics.increment("ai_request_errors", kind=kind, error=type(e).__name__)
+            logger.error("Cloudflare %s request error: %s: %s", kind, type(e).__name__, e)
+            return "timeout", None, None
+        except BaseException:
+            self.breaker.record_ignored()
+            raise
+        finally:
+            limiter.release(latency, overloaded)
+    
+    async def analyze_image(self, image_data: bytes, prompt: str = None, image_hash: Optional[int] = None) -> Optional[str]:
         """
         Analyze an image using Cloudflare's ResNet-50 model.
         
         Args:
             image_data: Raw image bytes
             prompt: Optional prompt for analysis
+            image_hash: Perceptual hash of the image; near-duplicates of an
+                earlier image reuse its analysis
             
         Returns:
             Analysis result as string, or None if failed
         """
-        logger.info(f"Starting image analysis - enabled: {self.enabled}, data size: {len(image_data)} bytes")
+        logger.debug("Starting image analysis - enabled: %s, data size: %d bytes", self.enabled, len(image_data))
         
         if not self.enabled:
             logger.warning("Cloudflare AI not enabled")
             return None
+        
+        if image_hash is not None:
+            cached = image_analysis_cache.get(image_hash)
+            if cached is not None:
+                logger.debug("Image analysis served from cache for hash %016x", image_hash)
+                return cached
             
         try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Prepare the request using the correct AI run endpoint
-            url = f"{self.base_url}/{self.account_id}/ai/run/@cf/microsoft/resnet-50"
-            logger.info(f"Using Cloudflare AI URL: {url}")
-            
             # ResNet-50 expects JSON payload with base64 encoded image
-            payload = {
-                "image": image_base64
-            }
+            run = lambda: self._run_model(
+                "image", IMAGE_MODEL,
+                lambda: {"image": base64.b64encode(image_data).decode('utf-8')},
+                deadline_seconds=AI_IMAGE_DEADLINE_SECONDS
+            )
+            result = await (self.image_hedger.run(run) if self.image_hedger is not None else run())
+            if result is None:
+                return None
             
-            logger.info(f"Sending JSON request to Cloudflare AI with base64 image size: {len(image_base64)} characters")
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    headers=self._get_headers(),
-                    json=payload
-                )
+            # Extract classification results
+            if "result" in result:
+                classifications = result["result"]
                 
-                logger.info(f"Cloudflare response status: {response.status_code}")
+                # Format the top classifications
+                analysis_parts = ["## Image Analysis"]
+                for i, classification in enumerate(classifications[:5]):  # Top 5
+                    label = classification.get("label", "Unknown")
+                    score = classification.get("score", 0)
+                    analysis_parts.append(f"{i+1}. {label} (confidence: {score:.2%})")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Cloudflare response: {result}")
-                    
-                    # Extract classification results
-                    if "result" in result:
-                        classifications = result["result"]
-                        
-                        # Format the top classifications
-                        analysis_parts = ["## Image Analysis"]
-                        for i, classification in enumerate(classifications[:5]):  # Top 5
-                            label = classification.get("label", "Unknown")
-                            score = classification.get("score", 0)
-                            analysis_parts.append(f"{i+1}. {label} (confidence: {score:.2%})")
-                        
-                        logger.info(f"Image analysis successful: {len(classifications)} classifications")
-                        return "\n".join(analysis_parts)
-                    
-                    logger.warning("No 'result' key in response")
-                    return "Image analyzed but no classifications returned"
-                else:
-                    logger.error(f"Cloudflare image analysis failed: {response.status_code} - {response.text}")
-                    return None
+                logger.debug("Image analysis successful: %d classifications", len(classifications))
+                analysis = "\n".join(analysis_parts)
+                if image_hash is not None and len(analysis_parts) > 1:
+                    await image_analysis_cache.put(image_hash, analysis)
+                return analysis
+            
+            logger.warning("No 'result' key in response")
+            return "Image analyzed but no classifications returned"
                     
         except Exception as e:
-            logger.error(f"Error analyzing image with Cloudflare AI: {e}")
+            logger.error("Error analyzing image with Cloudflare AI: %s", e)
             return None
     
-    async def transcribe_audio(self, audio_data: bytes, language: str = "en") -> Optional[str]:
+    async def transcribe_audio(self, audio_data: bytes, language: str = "en", offsets=None) -> Optional[str]:
         """
         Transcribe audio using Cloudflare's Whisper model.
         
         Args:
             audio_data: Raw audio bytes
             language: Language code (default: "en")
+            offsets: OffsetMap from audio preprocessing, to report segment
+                times relative to the original recording
             
         Returns:
             Transcription text, or None if failed
         """
-        logger.info(f"Starting audio transcription - enabled: {self.enabled}, data size: {len(audio_data)} bytes")
+        logger.debug("Starting audio transcription - enabled: %s, data size: %d bytes", self.enabled, len(audio_data))
         
         if not self.enabled:
             logger.warning("Cloudflare AI not enabled")
             return None
             
         try:
-            # Prepare the request using the correct AI run endpoint
-            url = f"{self.base_url}/{self.account_id}/ai/run/@cf/openai/whisper-large-v3-turbo"
-            logger.info(f"Using Cloudflare AI URL: {url}")
-            
-            # Encode audio to base64 for Whisper
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-            
             # Whisper expects JSON payload with base64 encoded audio
-            payload = {
-                "file": audio_base64
-            }
-            
-            logger.info(f"Sending JSON request to Cloudflare AI with base64 audio size: {len(audio_base64)} characters")
+            result = await self._run_model(
+                "audio", AUDIO_MODEL,
+                lambda: {"file": base64.b64encode(audio_data).decode('utf-8')},
+                deadline_seconds=AI_AUDIO_DEADLINE_SECONDS  # Longer budget for audio
+            )
+            if result is None:
+                return None
             
-            async with httpx.AsyncClient(timeout=60.0) as client:  # Longer timeout for audio
-                response = await client.post(
-                    url,
-                    headers=self._get_headers(),
-                    json=payload
-                )
+            # Extract transcription
+            if "result" in result:
+                transcription_result = result["result"]
                 
-                logger.info(f"Cloudflare response status: {response.status_code}")
+                # Handle different response formats
+                segments = []
+                if isinstance(transcription_result, dict):
+                    transcription = transcription_result.get("text", "").strip()
+                    segments = transcription_result.get("segments") or []
+                elif isinstance(transcription_result, str):
+                    transcription = transcription_result.strip()
+                else:
+                    transcription = str(transcription_result).strip()
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Cloudflare response: {result}")
-                    
-                    # Extract transcription
-                    if "result" in result:
-                        transcription_result = result["result"]
-                        
-                        # Handle different response formats
-                        if isinstance(transcription_result, dict):
-                            transcription = transcription_result.get("text", "").strip()
-                        elif isinstance(transcription_result, str):
-                            transcription = transcription_result.strip()
-                        else:
-                            transcription = str(transcription_result).strip()
-                        
-                        if transcription:
-                            logger.info(f"Transcription successful: {transcription[:100]}...")
-                            return f"## Audio Transcription\n{transcription}"
-                        else:
-                            logger.warning("No transcription text found in result")
-                            return "## Audio Transcription\n[No speech detected]"
-                    
-                    logger.warning("No 'result' key in response")
-                    return "Audio processed but no transcription returned"
+                if transcription:
+                    logger.debug("Transcription successful: %d characters", len(transcription))
+                    timeline = format_segments(segments, offsets) if isinstance(segments, list) else ""
+                    if timeline:
+                        return f"## Audio Transcription\n{transcription}\n\n### Segments\n{timeline}"
+                    return f"## Audio Transcription\n{transcription}"
                 else:
-                    logger.error(f"Cloudflare audio transcription failed: {response.status_code} - {response.text}")
-                    return None
+                    logger.warning("No transcription text found in result")
+                    return "## Audio Transcription\n[No speech detected]"
+            
+            logger.warning("No 'result' key in response")
+            return "Audio processed but no transcription returned"
                     
         except Exception as e:
-            logger.error(f"Error transcribing audio with Cloudflare AI: {e}")
+            logger.error("Error transcribing audio with Cloudflare AI: %s", e)
             return None
+    
+    def queue_depth(self) -> Dict[str, int]:
+        """Requests waiting for the rate limit and for a concurrency slot."""
+        depth = {"rate_limit": self.bucket.waiting}
+        depth.update({kind: limiter.waiting for kind, limiter in self.limiters.items()})
+        return depth
+    
+    def status(self) -> Dict[str, Any]:
+        """Circuit breaker state, rate limit, queue depth and retry counts."""
+        depth = self.queue_depth()
+        for stage, waiting in depth.items():
+            metrics.set_gauge("ai_queue_depth", waiting, stage=stage)
+        return {
+            "circuit_breaker": self.breaker.status(),
+            "concurrency": {kind: limiter.status() for kind, limiter in self.limiters.items()},
+            "rate_limit": {
+                "per_minute": round(self.bucket.rate * 60, 1),
+                "burst": self.bucket.capacity,
+                "available": self.bucket.remaining,
+            },
+            "queue_depth": depth,
+            "retries": dict(self.retries),
+            "image_hedging": self.image_hedger.status() if self.image_hedger is not None else {"enabled": False},
+        }
 
 
 # Global service instance
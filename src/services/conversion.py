@@ -0,0 +1,160 @@
+"""
+Async document conversion service.
+
+Routes each conversion to the worker pool (or to the archive pipeline for ZIP
+files) so request handlers never run CPU-bound converters on the event loop.
+Long PDFs are split into page ranges converted in parallel, and identical
+concurrent conversions share one computation.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .archive_converter import convert_archive
+from .conversion_cache import ConversionCache, content_hash, conversion_cache
+from .conversion_pool import ConversionPool, conversion_pool, deadline_seconds
+from .converters import convert_document
+from .flight_recorder import FlightRecorder, convert_document_watched, flight_recorder
+from .metrics import metrics
+from .pdf_converter import format_page_spec, inspect_pdf, parse_page_spec, plan_chunks
+from .scheduler import current_lane
+from .single_flight import SingleFlight, flight_key
+from .tracing import current_stages
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionService:
+    """Converts uploaded file content to markdown off the event loop."""
+
+    def __init__(self, pool: ConversionPool, cache: ConversionCache, recorder: Optional[FlightRecorder] = None):
+        self.pool = pool
+        self.cache = cache
+        self.recorder = recorder
+        self.supported_extensions: Optional[Set[str]] = None
+        self.flights = SingleFlight("convert")
+
+    def start(self, supported_extensions: Optional[Iterable[str]] = None) -> None:
+        """Start the worker pool. Archive members are limited to supported_extensions."""
+        if supported_extensions is not None:
+            self.supported_extensions = set(supported_extensions)
+        self.pool.start(self.supported_extensions)
+
+    def stop(self) -> None:
+        self.pool.shutdown()
+
+    async def convert(self, content: bytes, extension: str, **options: Any) -> str:
+        """
+        Convert file content to markdown. Identical concurrent calls from
+        requests with the same flight scope share one conversion.
+
+        Args:
+            content: File content as bytes
+            extension: File extension (without dot)
+            **options: Converter-specific options
+
+        Returns:
+            Markdown text
+        """
+        key = flight_key("convert", content, extension, options) + self.flight_scope()
+        return await self.flights.do(key, lambda: self._convert(content, extension, options))
+
+    def flight_scope(self) -> Tuple[Hashable, ...]:
+        """
+        What callers must have in common, besides the input, to share a conversion.
+
+        The shared task runs in the context of the caller that started it, so
+        a caller only joins when that context is one it could have had
+        itself: the same priority lane, the same flight recorder permission
+        and the same requested deadline. The shared deadline then expires
+        before the joiner's own only by as much as the joiner arrived later;
+        a conversion of its own would have had no more time for the work.
+        """
+        recordable = self.recorder.allowed() if self.recorder is not None and self.recorder.enabled else None
+        return current_lane(), deadline_seconds(), recordable
+
+    async def _convert(self, content: bytes, extension: str, options: Dict[str, Any]) -> str:
+        with metrics.timer("conversion_seconds", extension=extension):
+            if extension == 'zip':
+                # Members are converted (and recorded) one by one
+                return await convert_archive(content, self.convert_cached, self.supported_extensions)
+            if self.recorder is None or not self.recorder.enabled:
+                return await self._convert_document(content, extension, options, None)
+
+            reports: List[Dict[str, Any]] = []
+            error = None
+            start = time.perf_counter()
+            try:
+                return await self._convert_document(content, extension, options, reports)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.recorder.observe(content, extension, options, time.perf_counter() - start,
+                                      reports, current_stages(), error)
+
+    async def _convert_document(self, content: bytes, extension: str, options: Dict[str, Any],
+                                reports: Optional[List[Dict[str, Any]]]) -> str:
+        if extension == 'pdf':
+            return await self._convert_pdf(content, options, reports)
+        return await self._run_converter(content, extension, options, reports)
+
+    async def _run_converter(self, content: bytes, extension: str, options: Dict[str, Any],
+                             reports: Optional[List[Dict[str, Any]]]) -> str:
+        """One worker conversion; with ``reports``, watched by the flight recorder."""
+        if reports is None:
+            return await self.pool.run(convert_document, content, extension, options)
+        markdown, report = await self.pool.run(convert_document_watched, content, extension, options)
+        reports.append(report)
+        return markdown
+
+    async def _convert_pdf(self, content: bytes, options: Dict[str, Any],
+                           reports: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Convert page ranges in parallel workers and merge them in page order."""
+        start = time.perf_counter()
+        # The engine is chosen once per document and passed to every chunk
+        page_count, engine = await self.pool.run(inspect_pdf, content, options.get("engine"))
+        options = {**options, "engine": engine}
+        spec = options.get("pages")
+        pages = parse_page_spec(spec, page_count) if spec else list(range(page_count))
+        chunks = plan_chunks(pages, self.pool.workers)
+        if len(chunks) == 1:
+            markdown = await self._run_converter(content, 'pdf', options, reports)
+            metrics.observe("pdf_conversion_seconds", time.perf_counter() - start, engine=engine)
+            return markdown
+
+        tasks = [
+            asyncio.ensure_future(
+                self._run_converter(content, 'pdf', {**options, "pages": format_page_spec(chunk)}, reports)
+            )
+            for chunk in chunks
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        metrics.observe("pdf_conversion_seconds", time.perf_counter() - start, engine=engine)
+        logger.debug("Converted %d PDF pages in %d parallel chunks with %s", len(pages), len(chunks), engine)
+        return "".join(parts)
+
+    async def convert_cached(self, content: bytes, extension: str, **options: Any) -> str:
+        """Convert, reusing an earlier result for identical content."""
+        key = self.cache.key(content_hash(content), extension, options)
+        markdown = self.cache.get(key)
+        if markdown is None:
+            markdown = await self.convert(content, extension, **options)
+            self.cache.put(key, markdown)
+        return markdown
+
+    def status(self) -> Dict[str, Any]:
+        status = {"pool": self.pool.status(), "cache": self.cache.status(), "single_flight": self.flights.status()}
+        if self.recorder is not None:
+            status["flight_recorder"] = self.recorder.status()
+        return status
+
+
+# Global service instance
+conversion_service = ConversionService(conversion_pool, conversion_cache, flight_recorder)
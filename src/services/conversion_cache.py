@@ -0,0 +1,71 @@
+"""
+Content-addressed cache of conversion results.
+
+Keyed by the SHA-256 of the input bytes, the extension and any conversion
+options, bounded by total cached markdown size (LRU eviction).
+"""
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, Tuple]
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class ConversionCache:
+    """LRU cache of markdown results bounded by total size in characters."""
+
+    def __init__(self, max_chars: Optional[int] = None):
+        if max_chars is None:
+            max_chars = int(float(os.getenv("CONVERSION_CACHE_MAX_MB", "64")) * 1024 * 1024)
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(digest: str, extension: str, options: Optional[Dict[str, Any]] = None) -> CacheKey:
+        return digest, extension, tuple(sorted((options or {}).items()))
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        markdown = self._entries.get(key)
+        if markdown is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return markdown
+
+    def put(self, key: CacheKey, markdown: str) -> None:
+        if self.max_chars <= 0 or len(markdown) > self.max_chars:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = markdown
+        self._size += len(markdown)
+        while self._size > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def status(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_chars": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global cache instance
+conversion_cache = ConversionCache()
@@ -0,0 +1,394 @@
+"""
+Worker pool for CPU-bound document conversion.
+
+Conversions run in separate processes so they neither block the event loop
+nor serialize on the GIL. With CONVERSION_WORKERS=0 they run in threads
+instead (handy for development and debugging).
+
+Every task runs under a hard deadline: CONVERSION_TIMEOUT_SECONDS, or less
+if the request set a shorter one with ``set_deadline``. A task that overruns
+it, or whose caller went away, is interrupted inside its own worker: the
+worker reports its pid when it picks the task up, and SIGUSR1 makes it raise
+in that task only, so the other workers and their tasks carry on. A task
+still running CONVERSION_INTERRUPT_GRACE_SECONDS later (stuck in native code
+that never returns to the interpreter), or any stuck task where signals are
+unavailable, gets the workers killed instead. A dead worker breaks the whole
+process pool, so that last resort replaces the pool at once and tasks that
+only died as collateral are run again. Worker address space is capped at
+CONVERSION_WORKER_MEMORY_MB, so runaway documents fail with MemoryError
+instead of exhausting the host. Thread mode cannot stop a running task; the
+caller just stops waiting.
+
+Tasks reach a worker through per-plan priority lanes (see ``scheduler``), so
+paid plans are not stuck behind a burst of anonymous conversions.
+"""
+import os
+import time
+import signal
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .metrics import metrics
+from .profiling import SamplingProfiler
+from .scheduler import CONVERSION_LANE_CAPS, CONVERSION_LANE_WEIGHTS, FairScheduler, current_lane, parse_lane_values
+from .tracing import add_spans, current_traceparent, run_traced, span
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_TIMEOUT_SECONDS = float(os.getenv("CONVERSION_TIMEOUT_SECONDS", "120"))
+CONVERSION_WORKER_MEMORY_MB = int(os.getenv("CONVERSION_WORKER_MEMORY_MB", "2048"))
+CONVERSION_INTERRUPT_GRACE_SECONDS = float(os.getenv("CONVERSION_INTERRUPT_GRACE_SECONDS", "5"))
+
+# Monotonic time by which the current request's conversions must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("conversion_deadline", default=None)
+# The seconds it was set from (requests sharing a conversion must have asked for the same)
+_deadline_seconds: ContextVar[Optional[float]] = ContextVar("conversion_deadline_seconds", default=None)
+
+# Recently interrupted task ids, shared with the workers
+_INTERRUPT_SLOTS = 64
+_INTERRUPT_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+# Worker process state: where to report task pickups, and the task running now
+_started: Any = None
+_interrupts: Any = None
+_current_task: Optional[int] = None
+
+
+class ConversionTimeout(Exception):
+    """The conversion did not finish within its deadline and was stopped."""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Conversion timed out after {seconds:.1f}s")
+        self.seconds = seconds
+
+
+class WorkerCrashed(Exception):
+    """The worker process died while converting (crash or killed by the OS)."""
+
+
+class TaskInterrupted(Exception):
+    """Raised inside a worker when the parent interrupts the task it is running."""
+
+
+def set_deadline(seconds: float) -> None:
+    """Limit conversions started from the current request (context) to ``seconds`` from now."""
+    _deadline.set(time.monotonic() + seconds)
+    _deadline_seconds.set(seconds)
+
+
+def deadline_seconds() -> Optional[float]:
+    """The seconds the current request's deadline was set to (None: the server cap)."""
+    return _deadline_seconds.get()
+
+
+def time_budget() -> float:
+    """Seconds the next task may run: the hard cap, or less if the request deadline is nearer."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return CONVERSION_TIMEOUT_SECONDS
+    return min(CONVERSION_TIMEOUT_SECONDS, deadline - time.monotonic())
+
+
+def _limit_memory(memory_mb: int) -> None:
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        # Windows has no resource module; some containers forbid lowering limits
+        logger.warning("Could not cap conversion worker memory at %dMB: %s", memory_mb, e)
+
+
+def _init_worker(supported_extensions: Optional[List[str]] = None):
+    """Process initializer: preload converters listed in CONVERTER_PRELOAD."""
+    from .converters import converter_registry
+    converter_registry.preload_from_env(supported_extensions)
+
+
+def _on_interrupt(signum, frame) -> None:
+    # The signal may arrive just after the task finished; only the task it was meant for raises
+    if _current_task is not None and _current_task in _interrupts[:]:
+        raise TaskInterrupted()
+
+
+def _init_process_worker(supported_extensions: Optional[List[str]] = None, memory_mb: int = 0,
+                         started: Any = None, interrupts: Any = None):
+    global _started, _interrupts
+    _limit_memory(memory_mb)
+    metrics.buffer_events()
+    _started, _interrupts = started, interrupts
+    if _INTERRUPT_SIGNAL is not None and interrupts is not None:
+        signal.signal(_INTERRUPT_SIGNAL, _on_interrupt)
+    _init_worker(supported_extensions)
+
+
+def _call_with_metrics(task_id: int, traceparent: Optional[str], profile_interval: Optional[float],
+                       fn: Callable[..., Any], *args: Any):
+    """
+    Run fn in a worker as part of the caller's trace and return its result with
+    the metric events and spans it recorded, and its stack samples if the
+    parent has a profiling session running (``profile_interval``).
+    """
+    global _current_task
+    if _started is not None:
+        _started.put((task_id, os.getpid()))
+    profiler = None
+    if profile_interval:
+        profiler = SamplingProfiler(profile_interval, threading.get_ident(), f"worker-{os.getpid()}")
+        profiler.start()
+    try:
+        # Interruptible only once reported; a signal before that is ignored
+        _current_task = task_id
+        try:
+            result, spans = run_traced(traceparent, fn, *args)
+        finally:
+            _current_task = None
+            if profiler is not None:
+                profiler.stop()
+        return result, metrics.drain(), spans, dict(profiler.stacks) if profiler is not None else None
+    except BaseException:
+        metrics.drain()
+        raise
+
+
+class ConversionPool:
+    """Runs conversion functions in a process pool from async code."""
+
+    def __init__(self, workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None,
+                 memory_mb: int = CONVERSION_WORKER_MEMORY_MB):
+        if workers is None:
+            workers = int(os.getenv("CONVERSION_WORKERS", str(os.cpu_count() or 1)))
+        if max_tasks_per_child is None:
+            max_tasks_per_child = int(os.getenv("CONVERSION_WORKER_MAX_TASKS", "0")) or None
+        self.workers = max(workers, 0)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_mb = memory_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._supported: Optional[List[str]] = None
+        # Bumped each time the executor is replaced; generations whose workers we killed
+        self._generation = 0
+        self._killed: Set[int] = set()
+        # Task pickups reported by the workers of the current generation: task id -> worker pid
+        self._task_ids = itertools.count(1)
+        self._started: Any = None
+        self._interrupts: Any = None
+        self._interrupt_slot = 0
+        self._pids: Dict[int, int] = {}
+        self.restarts = 0
+        self.timeouts = 0
+        self.interrupts = 0
+        # Tasks are handed to the executor only when a worker is free, in fair lane order
+        self.scheduler = FairScheduler(
+            self.workers or os.cpu_count() or 1,
+            parse_lane_values(CONVERSION_LANE_WEIGHTS),
+            parse_lane_values(CONVERSION_LANE_CAPS),
+        )
+
+    def start(self, supported_extensions: Optional[Iterable[str]] = None) -> None:
+        """Start the worker processes, preloading converters from CONVERTER_PRELOAD."""
+        if self._executor is not None:
+            return
+        if supported_extensions is not None:
+            self._supported = list(supported_extensions)
+        if self.workers == 0:
+            _init_worker(self._supported)
+            return
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        # Fresh channels per generation: a killed worker may have died holding the queue's lock
+        self._started = context.SimpleQueue()
+        self._interrupts = context.Array("q", _INTERRUPT_SLOTS, lock=False)
+        self._pids.clear()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_process_worker,
+            initargs=(self._supported, self.memory_mb, self._started, self._interrupts),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+        logger.info("Conversion pool started with %d worker processes", self.workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Conversion pool stopped")
+
+    def _replace(self, generation: int) -> None:
+        """Swap in a fresh executor, once per broken generation."""
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self.restarts += 1
+        self.shutdown()
+        self.start()
+
+    def _collect_pids(self) -> None:
+        # Only this thread reads the queue, so get() cannot block once empty() said no
+        while self._started is not None and not self._started.empty():
+            task_id, pid = self._started.get()
+            self._pids[task_id] = pid
+
+    def _forget(self, task_id: int) -> None:
+        # Collecting on every completion also keeps the workers' pipe from filling up
+        self._collect_pids()
+        self._pids.pop(task_id, None)
+
+    def _interrupt(self, task_id: int, generation: int, reason: str) -> bool:
+        """Make the worker running ``task_id`` abandon it. False if it cannot be signalled."""
+        if generation != self._generation or _INTERRUPT_SIGNAL is None:
+            return False
+        self._collect_pids()
+        pid = self._pids.get(task_id)
+        if pid is None:
+            return False
+        self._interrupts[self._interrupt_slot % _INTERRUPT_SLOTS] = task_id
+        self._interrupt_slot += 1
+        try:
+            os.kill(pid, _INTERRUPT_SIGNAL)
+        except ProcessLookupError:
+            return False
+        self.interrupts += 1
+        logger.warning("Interrupting conversion task in worker %d (%s)", pid, reason)
+        metrics.increment("conversion_interrupts", reason=reason)
+        return True
+
+    def _kill_if_running(self, task_id: int, future: Future, generation: int, reason: str) -> None:
+        if not future.done():
+            self._kill_workers(generation, reason)
+        self._forget(task_id)
+
+    async def _stop(self, task_id: int, future: Future, generation: int) -> None:
+        """Stop a task that overran its deadline, killing the workers only if it will not stop."""
+        if self._interrupt(task_id, generation, "timeout"):
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(future), CONVERSION_INTERRUPT_GRACE_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                # TaskInterrupted as intended, or whatever the task raised on its way out
+                return
+        self._kill_workers(generation, "timeout")
+
+    def _kill_workers(self, generation: int, reason: str) -> None:
+        """
+        Kill the workers of ``generation``: the last resort for a task that
+        ignored its interrupt. The executor cannot outlive one killed worker,
+        so all of them go and the pool is replaced.
+        """
+        if generation != self._generation or self._executor is None:
+            return
+        self._killed.add(generation)
+        logger.error("Killing conversion workers (%s); the pool will be replaced", reason)
+        metrics.increment("conversion_worker_kills", reason=reason)
+        # ProcessPoolExecutor has no public handle on its processes
+        for process in list(getattr(self._executor, "_processes", {}).values()):
+            process.kill()
+        self._replace(generation)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a picklable module-level function in the pool and await its result.
+
+        The task first waits for a worker slot in the current request's
+        priority lane; that wait counts against its deadline.
+        """
+        name = getattr(fn, "__name__", "task")
+        with span("pool", task=name):
+            budget = time_budget()
+            if budget <= 0:
+                raise ConversionTimeout(0)
+            lane = current_lane()
+            try:
+                waited = await asyncio.wait_for(self.scheduler.acquire(lane), budget)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                metrics.increment("conversion_timeouts", task=name)
+                raise ConversionTimeout(budget) from None
+            try:
+                return await self._execute(name, fn, args, budget - waited)
+            finally:
+                self.scheduler.release(lane)
+
+    async def _execute(self, name: str, fn: Callable[..., Any], args: tuple, budget: float) -> Any:
+        if self.workers == 0:
+            # to_thread copies the context, so spans inside fn join the trace directly
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(fn, *args), budget)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise ConversionTimeout(budget) from None
+
+        for attempt in range(2):
+            self.start()
+            generation = self._generation
+            task_id = next(self._task_ids)
+            # Conversions run out of the profiler's sight: have the worker sample them
+            profiler = SamplingProfiler.active
+            future = self._executor.submit(
+                _call_with_metrics, task_id, current_traceparent(),
+                profiler.interval if profiler is not None else None, fn, *args,
+            )
+            try:
+                result, events, spans, stacks = await asyncio.wait_for(asyncio.wrap_future(future), budget)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                metrics.increment("conversion_timeouts", task=name)
+                # A task still waiting for a worker was simply cancelled
+                if not future.cancelled():
+                    await self._stop(task_id, future, generation)
+                raise ConversionTimeout(budget) from None
+            except asyncio.CancelledError:
+                # The caller is gone: free the worker, but give the interrupt time to land first
+                if not future.done():
+                    self._interrupt(task_id, generation, "cancelled")
+                    asyncio.get_running_loop().call_later(
+                        CONVERSION_INTERRUPT_GRACE_SECONDS, self._kill_if_running,
+                        task_id, future, generation, "cancelled",
+                    )
+                raise
+            except BrokenProcessPool:
+                collateral = generation in self._killed
+                self._replace(generation)
+                budget = time_budget()
+                if collateral and attempt == 0 and budget > 0:
+                    # Another task's worker was killed: run this one again on the new pool
+                    metrics.increment("conversion_retries", task=name)
+                    continue
+                logger.error("Conversion worker died while running %s; pool replaced", name)
+                metrics.increment("conversion_worker_crashes", task=name)
+                raise WorkerCrashed("The conversion worker process died") from None
+            finally:
+                self._forget(task_id)
+            metrics.merge(events)
+            add_spans(spans)
+            if stacks and profiler is not None:
+                profiler.merge(stacks)
+            return result
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "mode": "threads" if self.workers == 0 else "processes",
+            "started": self.workers == 0 or self._executor is not None,
+            "timeout_seconds": CONVERSION_TIMEOUT_SECONDS,
+            "worker_memory_mb": self.memory_mb,
+            "timeouts": self.timeouts,
+            "interrupts": self.interrupts,
+            "restarts": self.restarts,
+            "scheduler": self.scheduler.status(),
+        }
+
+
+# Global pool instance
+conversion_pool = ConversionPool()
@@ -0,0 +1,177 @@
+"""
+Document converter registry with lazy, per-extension loading.
+
+Nothing heavy is imported when this module is imported: each extension's
+converter is built on first use (or at startup for extensions listed in
+CONVERTER_PRELOAD), so a worker that only ever sees PDFs never pays for the
+other converter stacks.
+"""
+import os
+import time
+import tempfile
+import threading
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
+from .text_converters import TEXT_EXTENSIONS, convert_text
+from .structured_converters import STRUCTURED_EXTENSIONS, convert_structured
+
+logger = logging.getLogger(__name__)
+
+# A converter takes the uploaded bytes and extension (without dot) and returns markdown
+Converter = Callable[..., str]
+ConverterLoader = Callable[[], Converter]
+
+
+class InvalidConversionOptions(ValueError):
+    """Conversion options that do not fit the uploaded document (reported as a 400)."""
+
+
+_markitdown_instance = None
+_markitdown_lock = threading.Lock()
+
+
+def get_markitdown():
+    """Return the shared MarkItDown instance, importing and building it on first use."""
+    global _markitdown_instance
+    if _markitdown_instance is None:
+        with _markitdown_lock:
+            if _markitdown_instance is None:
+                start = time.perf_counter()
+                from markitdown import MarkItDown
+                _markitdown_instance = MarkItDown()
+                logger.info("MarkItDown loaded in %.0fms", (time.perf_counter() - start) * 1000)
+    return _markitdown_instance
+
+
+def convert_with_markitdown(content: bytes, extension: str, **options) -> str:
+    """Convert through MarkItDown using a temporary file."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}") as tmp_file:
+        tmp_file.write(content)
+        tmp_path = tmp_file.name
+
+    try:
+        result = get_markitdown().convert(tmp_path)
+        return result.text_content if hasattr(result, 'text_content') else str(result)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def _markitdown_loader() -> Converter:
+    # MarkItDown imports all of its converter dependencies when the package is
+    # imported, so every MarkItDown-backed extension shares one instance.
+    get_markitdown()
+    return convert_with_markitdown
+
+
+def _native_loader(module: str, load_converter: ConverterLoader) -> ConverterLoader:
+    """Native converter that needs ``module``, or MarkItDown when it is not installed."""
+    def load() -> Converter:
+        try:
+            __import__(module)
+        except ImportError:
+            logger.warning("%s is not installed; falling back to MarkItDown", module)
+            return _markitdown_loader()
+        return load_converter()
+    return load
+
+
+def _spreadsheet_converter() -> Converter:
+    from .spreadsheet_converters import convert_spreadsheet
+    return convert_spreadsheet
+
+
+def _pdf_converter() -> Converter:
+    from .pdf_converter import convert_pdf
+    return convert_pdf
+
+
+class ConverterRegistry:
+    """Maps file extensions to converters that are loaded on first use."""
+
+    def __init__(self, default_loader: ConverterLoader = _markitdown_loader):
+        self._default_loader = default_loader
+        self._loaders: Dict[str, ConverterLoader] = {}
+        self._converters: Dict[str, Converter] = {}
+        self._load_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, extensions: Iterable[str], loader: ConverterLoader) -> None:
+        """Register a loader for one or more extensions (without dot)."""
+        with self._lock:
+            for extension in extensions:
+                self._loaders[extension] = loader
+                self._converters.pop(extension, None)
+
+    def get(self, extension: str) -> Converter:
+        """Return the converter for an extension, loading it if needed."""
+        converter = self._converters.get(extension)
+        if converter is not None:
+            return converter
+
+        with self._lock:
+            converter = self._converters.get(extension)
+            if converter is None:
+                loader = self._loaders.get(extension, self._default_loader)
+                start = time.perf_counter()
+                converter = loader()
+                self._load_times[extension] = time.perf_counter() - start
+                self._converters[extension] = converter
+                logger.info("Loaded converter for .%s in %.0fms", extension, self._load_times[extension] * 1000)
+        return converter
+
+    def convert(self, content: bytes, extension: str, **options) -> str:
+        """Convert file content to markdown with the converter for its extension."""
+        return self.get(extension)(content, extension, **options)
+
+    def preload(self, extensions: Iterable[str]) -> Dict[str, float]:
+        """Load converters ahead of time. Returns load time in seconds per extension."""
+        timings = {}
+        for extension in extensions:
+            try:
+                self.get(extension)
+                timings[extension] = self._load_times.get(extension, 0.0)
+            except Exception as e:
+                logger.error("Failed to preload converter for .%s: %s", extension, e)
+        return timings
+
+    def preload_from_env(self, supported: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Preload the extensions listed in CONVERTER_PRELOAD (comma separated,
+        or "all" for every supported extension).
+        """
+        value = os.getenv("CONVERTER_PRELOAD", "").strip().lower()
+        if not value:
+            return {}
+        if value == "all":
+            extensions = list(supported) if supported is not None else list(self._loaders)
+        else:
+            extensions = [ext.strip().lstrip('.') for ext in value.split(',') if ext.strip()]
+        timings = self.preload(extensions)
+        logger.info("Preloaded converters: %s", ', '.join(f'{ext}={t * 1000:.0f}ms' for ext, t in timings.items()))
+        return timings
+
+    def status(self) -> Dict[str, float]:
+        """Loaded extensions with their load time in milliseconds."""
+        return {ext: round(t * 1000, 1) for ext, t in self._load_times.items()}
+
+
+# Global registry instance
+converter_registry = ConverterRegistry()
+
+
+def convert_document(content: bytes, extension: str, options: Optional[Dict] = None) -> str:
+    """Module-level entry point for worker processes (must stay picklable)."""
+    return converter_registry.convert(content, extension, **(options or {}))
+
+
+# Plain-text formats are converted in-process, straight from the uploaded bytes
+converter_registry.register(TEXT_EXTENSIONS, lambda: convert_text)
+# CSV, JSON and XML are rendered as tables by streaming converters
+converter_registry.register(STRUCTURED_EXTENSIONS, lambda: convert_structured)
+# Spreadsheets are streamed read-only, one selected sheet and range at a time
+converter_registry.register(['xlsx'], _native_loader('openpyxl', _spreadsheet_converter))
+converter_registry.register(['xls'], _native_loader('xlrd', _spreadsheet_converter))
+# PDFs use pdfminer directly so page ranges can be extracted on their own
+converter_registry.register(['pdf'], _native_loader('pdfminer', _pdf_converter))
@@ -8,6 +8,7 @@ import json
 import uuid
 
 from ..models.auth import User, UserCreate, ConversionRecord, UsageStats
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +35,7 @@ class DatabaseService:
             logger.info("Database pool initialized successfully")
             await self.create_tables()
         except Exception as e:
-            logger.error(f"Failed to initialize database pool: {e}")
+            logger.error("Failed to initialize database pool: %s", e)
             self.pool = None
 
     async def close_pool(self):
@@ -90,11 +91,17 @@ class DatabaseService:
             file_size INTEGER NOT NULL,
             status TEXT NOT NULL CHECK (status IN ('completed', 'failed', 'processing')),
             error_message TEXT,
+            error_category TEXT,
             created_at TIMESTAMP DEFAULT NOW(),
             completed_at TIMESTAMP
         );
         """
         
+        # Tables created before failures were categorized
+        migrate_conversions_table = """
+        ALTER TABLE conversions ADD COLUMN IF NOT EXISTS error_category TEXT;
+        """
+        
         create_indexes = """
         CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
         CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_id ON refresh_tokens(user_id);
@@ -107,6 +114,7 @@ class DatabaseService:
             await conn.execute(create_users_table)
             await conn.execute(create_refresh_tokens_table)
             await conn.execute(create_conversions_table)
+            await conn.execute(migrate_conversions_table)
             await conn.execute(create_indexes)
             logger.info("Database tables created successfully")
 
@@ -226,22 +234,25 @@ class DatabaseService:
             await conn.execute(query)
 
     # Conversion Tracking
+    @traced("db.record_conversion")
     async def record_conversion(self, user_id: str, filename: str, file_type: str, 
-                              file_size: int, status: str, error_message: Optional[str] = None) -> str:
-        """Record a file conversion"""
+                              file_size: int, status: str, error_message: Optional[str] = None,
+                              error_category: Optional[str] = None) -> str:
+        """Record a file conversion (failures with a category such as 'timeout' or 'memory_limit')"""
         conversion_id = str(uuid.uuid4())
         completed_at = datetime.utcnow() if status == 'completed' else None
         
         query = """
-        INSERT INTO conversions (id, user_id, filename, file_type, file_size, status, error_message, completed_at)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        INSERT INTO conversions (id, user_id, filename, file_type, file_size, status, error_message,
+                                 error_category, completed_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
         RETURNING id
         """
         
         async with self.get_connection() as conn:
             await conn.fetchval(
                 query, conversion_id, user_id, filename, file_type, 
-                file_size, status, error_message, completed_at
+                file_size, status, error_message, error_category, completed_at
             )
             
         # Update user's monthly usage if conversion was successful
@@ -263,6 +274,7 @@ class DatabaseService:
             rows = await conn.fetch(query, user_id, limit, offset)
             return [self._row_to_conversion(row) for row in rows]
 
+    @traced("db.get_usage_stats")
     async def get_usage_stats(self, user_id: str) -> UsageStats:
         """Get user's usage statistics"""
         now = datetime.utcnow()
@@ -328,7 +340,8 @@ class DatabaseService:
             status=row['status'],
             createdAt=row['created_at'],
             completedAt=row['completed_at'],
-            errorMessage=row['error_message']
+            errorMessage=row['error_message'],
+            errorCategory=row.get('error_category')
         )
 
 
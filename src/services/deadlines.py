@@ -0,0 +1,97 @@
+"""
+Per-request conversion deadlines, client disconnects and failure categories.
+
+A client may ask for a shorter deadline with the ``X-Request-Timeout`` header
+(seconds); it is capped at CONVERSION_TIMEOUT_SECONDS and only ever shortens
+the server's own limit. ``run_until_disconnect`` stops a conversion whose
+client has gone away, which lets the pool reclaim a long-running worker.
+``error_category`` maps conversion failures to the categories stored with
+failed conversions.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+from .converters import InvalidConversionOptions
+from .conversion_pool import CONVERSION_TIMEOUT_SECONDS, ConversionTimeout, WorkerCrashed, set_deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLIENT_DEADLINE_HEADER = "x-request-timeout"
+# How often a running conversion checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its conversion finished."""
+
+
+def apply_client_deadline(header: Optional[str]) -> float:
+    """
+    Set the conversion deadline of the current request and return it.
+
+    A missing or unparsable header gets the server default; values are
+    clamped to (0, CONVERSION_TIMEOUT_SECONDS].
+    """
+    seconds = CONVERSION_TIMEOUT_SECONDS
+    if header:
+        try:
+            requested = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid X-Request-Timeout: {header!r} (seconds expected)")
+        if requested <= 0:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be positive")
+        seconds = min(requested, CONVERSION_TIMEOUT_SECONDS)
+    set_deadline(seconds)
+    return seconds
+
+
+async def run_until_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await ``work``, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected during conversion of %s; cancelling", request.url.path)
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+
+def error_category(error: BaseException) -> str:
+    """Category recorded with a failed conversion."""
+    if isinstance(error, ConversionTimeout):
+        return "timeout"
+    if isinstance(error, MemoryError):
+        return "memory_limit"
+    if isinstance(error, WorkerCrashed):
+        return "worker_crashed"
+    if isinstance(error, ClientDisconnected):
+        return "cancelled"
+    if isinstance(error, InvalidConversionOptions):
+        return "invalid_options"
+    return "conversion_error"
+
+
+def error_status(error: BaseException) -> int:
+    """HTTP status for a failed conversion."""
+    return {
+        "timeout": 504,
+        "memory_limit": 422,
+        "invalid_options": 400,
+        # Nobody is listening; 499 is what proxies log for it
+        "cancelled": 499,
+    }.get(error_category(error), 500)
@@ -0,0 +1,337 @@
+"""
+Flight recorder for pathological conversions.
+
+When FLIGHT_RECORDER_DIR is set, every conversion runs under a light watch in
+its worker: a thread samples the process RSS and the converting thread's
+stack every FLIGHT_RECORDER_SAMPLE_MS. If the conversion takes longer than
+FLIGHT_RECORDER_WALL_SECONDS, its worker's RSS grows by FLIGHT_RECORDER_RSS_MB
+while it runs, or the worker dies, the input is kept in the quarantine directory with its
+hash, extension, options, stage timings (from the request's trace) and the
+collapsed stack samples, so it can be replayed later
+(scripts/benchmarks/replay_quarantine.py, or the admin replay endpoint).
+
+The quarantine is bounded by entry count, total size and age. Inputs from
+users listed in FLIGHT_RECORDER_OPT_OUT (user ids or ``@domain`` email
+suffixes), and from anonymous users unless FLIGHT_RECORDER_ANONYMOUS is
+enabled, are never kept.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .conversion_cache import content_hash
+from .converters import convert_document
+from .metrics import metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_RECORDER_DIR = os.getenv("FLIGHT_RECORDER_DIR", "")
+FLIGHT_RECORDER_WALL_SECONDS = float(os.getenv("FLIGHT_RECORDER_WALL_SECONDS", "10"))
+FLIGHT_RECORDER_RSS_MB = float(os.getenv("FLIGHT_RECORDER_RSS_MB", "1024"))
+FLIGHT_RECORDER_SAMPLE_MS = float(os.getenv("FLIGHT_RECORDER_SAMPLE_MS", "100"))
+FLIGHT_RECORDER_MAX_ENTRIES = int(os.getenv("FLIGHT_RECORDER_MAX_ENTRIES", "50"))
+FLIGHT_RECORDER_MAX_MB = float(os.getenv("FLIGHT_RECORDER_MAX_MB", "500"))
+FLIGHT_RECORDER_RETENTION_DAYS = float(os.getenv("FLIGHT_RECORDER_RETENTION_DAYS", "7"))
+FLIGHT_RECORDER_OPT_OUT = os.getenv("FLIGHT_RECORDER_OPT_OUT", "")
+FLIGHT_RECORDER_ANONYMOUS = os.getenv("FLIGHT_RECORDER_ANONYMOUS", "false").lower() in ("1", "true", "yes")
+
+META_FILE = "meta.json"
+
+# Who the current conversion is for: (user id, email), or None for anonymous users
+_subject: ContextVar[Optional[Tuple[str, str]]] = ContextVar("flight_recorder_subject", default=None)
+
+
+def worker_seconds(reports: List[Dict[str, Any]]) -> float:
+    """Time workers spent converting, from their watch reports."""
+    return sum(report["wall_seconds"] for report in reports)
+
+
+def set_subject(user_id: Optional[str], email: Optional[str] = None) -> None:
+    """Tag conversions started from the current request with their user (for opt-outs)."""
+    _subject.set((str(user_id), email or "") if user_id is not None else None)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+class _Watch:
+    """Samples RSS and one thread's stack in the background while a block runs."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.target = threading.get_ident()
+        # Pool workers are long-lived: only growth during the block is this conversion's
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="flight-recorder", daemon=True)
+
+    def __enter__(self) -> "_Watch":
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.wall_seconds = time.perf_counter() - self.started
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+            frame = sys._current_frames().get(self.target)
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "peak_rss_bytes": self.peak_rss,
+            "rss_growth_bytes": max(self.peak_rss - self.start_rss, 0),
+            "stacks": "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common(200)),
+        }
+
+
+def convert_document_watched(content: bytes, extension: str, options: Optional[Dict] = None,
+                             interval: float = FLIGHT_RECORDER_SAMPLE_MS / 1000) -> Tuple[str, Dict[str, Any]]:
+    """convert_document plus a report of its wall time, RSS and stack samples (worker entry point)."""
+    with _Watch(interval) as watch:
+        markdown = convert_document(content, extension, options)
+    return markdown, watch.report()
+
+
+def _parse_opt_out(spec: str) -> Tuple[Set[str], Set[str]]:
+    user_ids, domains = set(), set()
+    for item in (part.strip().lower() for part in spec.split(",")):
+        if item.startswith("@"):
+            domains.add(item)
+        elif item:
+            user_ids.add(item)
+    return user_ids, domains
+
+
+class FlightRecorder:
+    """Bounded quarantine of slow or memory-hungry conversion inputs."""
+
+    def __init__(self, directory: str = FLIGHT_RECORDER_DIR,
+                 wall_seconds: float = FLIGHT_RECORDER_WALL_SECONDS,
+                 rss_bytes: float = FLIGHT_RECORDER_RSS_MB * 1024 * 1024,
+                 max_entries: int = FLIGHT_RECORDER_MAX_ENTRIES,
+                 max_bytes: float = FLIGHT_RECORDER_MAX_MB * 1024 * 1024,
+                 retention_seconds: float = FLIGHT_RECORDER_RETENTION_DAYS * 86400,
+                 opt_out: str = FLIGHT_RECORDER_OPT_OUT,
+                 record_anonymous: bool = FLIGHT_RECORDER_ANONYMOUS):
+        self.directory = directory
+        self.wall_seconds = wall_seconds
+        self.rss_bytes = rss_bytes
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_seconds
+        self.opt_out_users, self.opt_out_domains = _parse_opt_out(opt_out)
+        self.record_anonymous = record_anonymous
+        self.captured = 0
+        self.skipped_opt_out = 0
+        self._lock = threading.Lock()
+        self._pending: Set["asyncio.Task"] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def allowed(self) -> bool:
+        """Whether the current request's user lets us keep their input."""
+        subject = _subject.get()
+        if subject is None:
+            return self.record_anonymous
+        user_id, email = subject
+        if user_id.lower() in self.opt_out_users:
+            return False
+        email = email.lower()
+        return not any(email.endswith(domain) for domain in self.opt_out_domains)
+
+    def triggers(self, reports: List[Dict[str, Any]], error: Optional[BaseException]) -> List[str]:
+        """
+        Which thresholds this conversion crossed (empty: nothing to record).
+
+        Wall time is what the workers spent converting (summed over PDF
+        chunks), not how long the request waited for them, so a queue under
+        load does not make ordinary documents look pathological. Likewise
+        memory is the RSS growth during the conversion, not the worker's
+        total, which earlier conversions may already have pushed up.
+        """
+        reasons = []
+        if reports and worker_seconds(reports) >= self.wall_seconds:
+            reasons.append("wall_time")
+        if any(report["rss_growth_bytes"] >= self.rss_bytes for report in reports):
+            reasons.append("rss")
+        error_reason = {
+            "WorkerCrashed": "worker_died",
+            "BrokenProcessPool": "worker_died",
+            "MemoryError": "memory_error",
+            "ConversionTimeout": "timeout",
+        }.get(type(error).__name__) if error is not None else None
+        if error_reason:
+            reasons.append(error_reason)
+        return reasons
+
+    def observe(self, content: bytes, extension: str, options: Dict[str, Any], elapsed_seconds: float,
+                reports: List[Dict[str, Any]], stages: List[Dict[str, Any]],
+                error: Optional[BaseException] = None) -> None:
+        """
+        Quarantine the input in the background if the conversion crossed a
+        threshold. ``elapsed_seconds`` (including queueing) is only recorded.
+        """
+        reasons = self.triggers(reports, error)
+        if not reasons:
+            return
+        if not self.allowed():
+            self.skipped_opt_out += 1
+            metrics.increment("flight_recorder_skipped", reason="opt_out")
+            return
+        meta = {
+            "sha256": content_hash(content),
+            "extension": extension,
+            "options": options,
+            "size_bytes": len(content),
+            "reasons": reasons,
+            "wall_seconds": round(worker_seconds(reports), 3),
+            "elapsed_seconds": round(elapsed_seconds, 3),
+            "peak_rss_bytes": max((report["peak_rss_bytes"] for report in reports), default=None),
+            "rss_growth_bytes": max((report["rss_growth_bytes"] for report in reports), default=None),
+            "stages": stages,
+            "worker_runs": [{k: v for k, v in report.items() if k != "stacks"} for report in reports],
+            "stacks": "\n".join(report["stacks"] for report in reports if report["stacks"]),
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        task = asyncio.ensure_future(asyncio.to_thread(self._write, content, meta))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _write(self, content: bytes, meta: Dict[str, Any]) -> None:
+        entry_id = f"{int(time.time())}-{meta['sha256'][:16]}"
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                if any(name.endswith(meta["sha256"][:16]) for name in os.listdir(self.directory)):
+                    return  # Same input already quarantined
+                path = os.path.join(self.directory, entry_id)
+                os.makedirs(path)
+                with open(os.path.join(path, f"input.{meta['extension'] or 'bin'}"), "wb") as f:
+                    f.write(content)
+                with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"id": entry_id, **meta}, f, indent=2, default=str)
+                self._enforce_limits()
+            self.captured += 1
+            metrics.increment("flight_recorder_captured", reason=meta["reasons"][0])
+            logger.warning("Flight recorder kept .%s input %s (%s)", meta["extension"], entry_id, ", ".join(meta["reasons"]))
+        except OSError as e:
+            logger.error("Flight recorder could not write %s: %s", entry_id, e)
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        """(entry id, mtime, size in bytes), oldest first."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((name, os.path.getmtime(path), size))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def _enforce_limits(self) -> None:
+        entries = self._entries()
+        cutoff = time.time() - self.retention_seconds
+        total = sum(size for _, _, size in entries)
+        while entries and (entries[0][1] < cutoff or len(entries) > self.max_entries or total > self.max_bytes):
+            name, _, size = entries.pop(0)
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            total -= size
+
+    def _path(self, entry_id: str) -> Optional[str]:
+        if not self.enabled or os.sep in entry_id or entry_id.startswith("."):
+            return None
+        path = os.path.join(self.directory, entry_id)
+        return path if os.path.isfile(os.path.join(path, META_FILE)) else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._enforce_limits()
+            entries = self._entries()
+        listing = []
+        for name, _, _ in reversed(entries):
+            meta = self.get(name)
+            if meta is not None:
+                listing.append({k: v for k, v in meta.items() if k not in ("stacks", "stages", "worker_runs")})
+        return listing
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(entry_id)
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def input_path(self, entry_id: str) -> Optional[str]:
+        meta = self.get(entry_id)
+        if meta is None:
+            return None
+        return os.path.join(self.directory, entry_id, f"input.{meta['extension'] or 'bin'}")
+
+    def delete(self, entry_id: str) -> bool:
+        path = self._path(entry_id)
+        if path is None:
+            return False
+        with self._lock:
+            shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "wall_seconds": self.wall_seconds,
+            "rss_mb": round(self.rss_bytes / (1024 * 1024)),
+            "captured": self.captured,
+            "skipped_opt_out": self.skipped_opt_out,
+        }
+
+
+# Global recorder instance
+flight_recorder = FlightRecorder()
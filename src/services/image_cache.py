@@ -0,0 +1,192 @@
+"""
+Near-duplicate cache for Cloudflare AI image analysis results.
+
+Entries are keyed by the 64-bit dHash of the image. Lookups search a BK-tree
+for the closest stored hash within IMAGE_CACHE_MAX_DISTANCE bits, so resized
+or recompressed re-uploads reuse the stored classification instead of calling
+ResNet-50 again. With IMAGE_CACHE_PATH set, entries are also kept in SQLite
+and reloaded on startup.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "10000"))
+IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "")
+
+_SIGN_BIT = 1 << 63
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over Hamming distance; a node's children are keyed by distance to it."""
+
+    def __init__(self):
+        self._root: Optional[Tuple[int, Dict[int, Any]]] = None
+        self.size = 0
+
+    def add(self, value: int) -> None:
+        if self._root is None:
+            self._root = (value, {})
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (value, {})
+                self.size += 1
+                return
+            node = child
+
+    def nearest(self, value: int, max_distance: int) -> Optional[Tuple[int, int]]:
+        """Closest stored value within max_distance, as (value, distance)."""
+        if self._root is None:
+            return None
+        best: Optional[Tuple[int, int]] = None
+        stack = [self._root]
+        while stack:
+            node_value, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (node_value, distance)
+                if distance == 0:
+                    break
+            # Triangle inequality: only subtrees within the search radius can match
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+        return best
+
+
+class ImageAnalysisCache:
+    """Analysis markdown by perceptual hash, with near-duplicate lookups."""
+
+    def __init__(self, max_distance: int = IMAGE_CACHE_MAX_DISTANCE,
+                 max_entries: int = IMAGE_CACHE_MAX_ENTRIES, path: str = IMAGE_CACHE_PATH):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        # Rows in the SQLite store (counts replaced rows too, so trims may come early)
+        self._stored_rows = 0
+        if path:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS image_analysis ("
+                "phash INTEGER PRIMARY KEY, markdown TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            rows = self._db.execute(
+                "SELECT phash, markdown FROM image_analysis ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+            for phash, markdown in reversed(rows):
+                self._insert(phash % (1 << 64), markdown)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_image_analysis_created ON image_analysis(created_at)")
+            self._trim_store()
+            logger.info("Image analysis cache loaded %d entries from %s", len(rows), path)
+        except sqlite3.Error as e:
+            logger.error("Image analysis cache store unavailable (%s): %s", path, e)
+            self._db = None
+
+    def _trim_store(self) -> None:
+        """Keep the store bounded like the in-memory index: only the newest max_entries rows."""
+        with self._db:
+            self._db.execute(
+                "DELETE FROM image_analysis WHERE phash NOT IN "
+                "(SELECT phash FROM image_analysis ORDER BY created_at DESC LIMIT ?)", (self.max_entries,)
+            )
+        self._stored_rows = self._db.execute("SELECT COUNT(*) FROM image_analysis").fetchone()[0]
+
+    def _insert(self, phash: int, markdown: str) -> None:
+        self._entries[phash] = markdown
+        self._entries.move_to_end(phash)
+        self._tree.add(phash)
+        if len(self._entries) > self.max_entries:
+            # BK-trees do not support deletion: drop the oldest tenth and rebuild
+            for _ in range(max(self.max_entries // 10, 1)):
+                self._entries.popitem(last=False)
+            self._tree = BKTree()
+            for value in self._entries:
+                self._tree.add(value)
+
+    def get(self, phash: int) -> Optional[str]:
+        """Stored analysis for the closest hash within max_distance, if any."""
+        with self._lock:
+            self.lookups += 1
+            match = self._tree.nearest(phash, self.max_distance)
+            if match is None:
+                metrics.increment("image_cache_lookups", result="miss")
+                return None
+            value, distance = match
+            if distance == 0:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self._entries.move_to_end(value)
+            metrics.increment("image_cache_lookups", result="hit" if distance == 0 else "near_hit")
+            return self._entries[value]
+
+    async def put(self, phash: int, markdown: str) -> None:
+        with self._lock:
+            self._insert(phash, markdown)
+        if self._db is not None:
+            await asyncio.to_thread(self._persist, phash, markdown)
+
+    def _persist(self, phash: int, markdown: str) -> None:
+        signed = phash - (1 << 64) if phash & _SIGN_BIT else phash
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO image_analysis (phash, markdown, created_at) VALUES (?, ?, ?)",
+                    (signed, markdown, time.time()),
+                )
+                self._stored_rows += 1
+                # Trim in batches (like the in-memory index) rather than on every insert
+                if self._stored_rows > self.max_entries + max(self.max_entries // 10, 1):
+                    self._trim_store()
+        except sqlite3.Error as e:
+            logger.warning("Failed to persist image analysis: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.near_hits
+        return {
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "persistent": self._db is not None,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "cloudflare_calls_saved": hits,
+        }
+
+
+# Global cache instance
+image_analysis_cache = ImageAnalysisCache()
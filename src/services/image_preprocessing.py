@@ -0,0 +1,113 @@
+"""
+Image preprocessing before Cloudflare AI image classification.
+
+ResNet-50 looks at a 224x224 input, so sending multi-megabyte PNG/TIFF/BMP
+uploads is wasted transfer. Images are decoded, downscaled so the shorter side
+is IMAGE_AI_TARGET_SIDE and re-encoded as JPEG. Tiny images (icons, spacers)
+are not worth a model call and are flagged for skipping. A 64-bit difference
+hash (dHash) of the decoded image is returned for the analysis cache.
+
+Pillow is optional: without it the original bytes are sent unchanged.
+"""
+import io
+import os
+import math
+import time
+import logging
+from typing import NamedTuple, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_AI_TARGET_SIDE = int(os.getenv("IMAGE_AI_TARGET_SIDE", "256"))
+IMAGE_AI_JPEG_QUALITY = int(os.getenv("IMAGE_AI_JPEG_QUALITY", "85"))
+# Images whose shorter side is below this are not sent for analysis
+IMAGE_AI_MIN_SIDE = int(os.getenv("IMAGE_AI_MIN_SIDE", "32"))
+# Refuse to decode anything larger (decompression bombs)
+IMAGE_AI_MAX_PIXELS = int(os.getenv("IMAGE_AI_MAX_PIXELS", str(50_000_000)))
+
+
+class PreparedImage(NamedTuple):
+    """Result of preprocessing; picklable so it can cross the worker pool."""
+    data: bytes
+    original_size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    skip_reason: Optional[str] = None
+    phash: Optional[int] = None
+
+
+def dhash(image) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail."""
+    from PIL import Image
+
+    pixels = list(image.convert('L').resize((9, 8), Image.Resampling.BOX).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _flatten(image):
+    """RGB image, with any transparency composited over white."""
+    from PIL import Image
+
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def prepare_image_for_ai(content: bytes, target_side: int = IMAGE_AI_TARGET_SIDE) -> PreparedImage:
+    """
+    Decode, downscale and re-encode an image for classification.
+
+    Returns the original bytes when Pillow is missing, the image cannot be
+    decoded or the re-encoded JPEG would not be smaller.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return PreparedImage(content, len(content))
+
+    start = time.perf_counter()
+    try:
+        Image.MAX_IMAGE_PIXELS = IMAGE_AI_MAX_PIXELS
+        with Image.open(io.BytesIO(content)) as image:
+            width, height = image.size
+            if min(width, height) < IMAGE_AI_MIN_SIDE:
+                metrics.increment("image_ai_skipped", reason="tiny")
+                return PreparedImage(content, len(content), width, height, f"image too small ({width}x{height})")
+
+            scale = target_side / min(width, height)
+            if scale < 1:
+                # JPEG can decode at a reduced scale directly, skipping most of the work
+                image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+            image = _flatten(ImageOps.exif_transpose(image))
+
+            # Sizes again after draft decoding and EXIF rotation
+            scale = target_side / min(image.size)
+            if scale < 1:
+                size = (max(round(image.width * scale), 1), max(round(image.height * scale), 1))
+                image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            phash = dhash(image)
+
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=IMAGE_AI_JPEG_QUALITY, optimize=True)
+            data = output.getvalue()
+    except Exception as e:
+        logger.warning("Image preprocessing failed, sending the original: %s", e)
+        metrics.increment("image_preprocess_failures")
+        return PreparedImage(content, len(content))
+
+    metrics.observe("image_preprocess_seconds", time.perf_counter() - start)
+    if len(data) >= len(content):
+        return PreparedImage(content, len(content), width, height, phash=phash)
+    metrics.increment("image_preprocess_bytes_saved", len(content) - len(data))
+    return PreparedImage(data, len(content), width, height, phash=phash)
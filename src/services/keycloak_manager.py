@@ -42,7 +42,7 @@ class KeycloakUserManager:
         }
         
         try:
-            logger.info(f"Tentando obter token admin: {url}")
+            logger.info("Tentando obter token admin: %s", url)
             response = requests.post(url, data=data, timeout=10)
             
             if response.status_code == 200:
@@ -109,7 +109,7 @@ class KeycloakUserManager:
         }
         
         try:
-            logger.info(f"Criando usuário: {user_data['username']}")
+            logger.info("Criando usuário: %s", user_data['username'])
             response = requests.post(url, json=keycloak_user, headers=headers, timeout=10)
             
             if response.status_code == 201:
@@ -126,7 +126,7 @@ class KeycloakUserManager:
                     for role in user_data['roles']:
                         self.assign_role_to_user(user_id, role)
                 
-                logger.info(f"Usuário criado com sucesso: {user_id}")
+                logger.info("Usuário criado com sucesso: %s", user_id)
                 return {'success': True, 'user_id': user_id}
             else:
                 error_msg = f"Erro ao criar usuário: {response.status_code} - {response.text}"
@@ -162,7 +162,7 @@ class KeycloakUserManager:
             response = requests.put(url, json=password_data, headers=headers, timeout=10)
             
             if response.status_code == 204:
-                logger.info(f"Senha definida para usuário: {user_id}")
+                logger.info("Senha definida para usuário: %s", user_id)
                 return {'success': True}
             else:
                 error_msg = f"Erro ao definir senha: {response.status_code} - {response.text}"
@@ -202,7 +202,7 @@ class KeycloakUserManager:
             response = requests.put(url, json=existing_user, headers=headers, timeout=10)
             
             if response.status_code == 204:
-                logger.info(f"Usuário atualizado com sucesso: {user_id}")
+                logger.info("Usuário atualizado com sucesso: %s", user_id)
                 return {'success': True, 'user_id': user_id}
             else:
                 error_msg = f"Erro ao atualizar usuário: {response.status_code} - {response.text}"
@@ -235,10 +235,10 @@ class KeycloakUserManager:
                 users = response.json()
                 return users[0] if users else None
             else:
-                logger.warning(f"Erro ao buscar usuário por username: {response.status_code}")
+                logger.warning("Erro ao buscar usuário por username: %s", response.status_code)
                 return None
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao buscar usuário: {str(e)}")
+            logger.error("Erro de conexão ao buscar usuário: %s", e)
             return None
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
@@ -263,10 +263,10 @@ class KeycloakUserManager:
                 users = response.json()
                 return users[0] if users else None
             else:
-                logger.warning(f"Erro ao buscar usuário por email: {response.status_code}")
+                logger.warning("Erro ao buscar usuário por email: %s", response.status_code)
                 return None
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao buscar usuário: {str(e)}")
+            logger.error("Erro de conexão ao buscar usuário: %s", e)
             return None
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -288,10 +288,10 @@ class KeycloakUserManager:
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.warning(f"Erro ao buscar usuário por ID: {response.status_code}")
+                logger.warning("Erro ao buscar usuário por ID: %s", response.status_code)
                 return None
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao buscar usuário: {str(e)}")
+            logger.error("Erro de conexão ao buscar usuário: %s", e)
             return None
     
     def delete_user(self, user_id: str) -> Dict[str, Any]:
@@ -311,7 +311,7 @@ class KeycloakUserManager:
             response = requests.delete(url, headers=headers, timeout=10)
             
             if response.status_code == 204:
-                logger.info(f"Usuário removido com sucesso: {user_id}")
+                logger.info("Usuário removido com sucesso: %s", user_id)
                 return {'success': True}
             else:
                 error_msg = f"Erro ao remover usuário: {response.status_code} - {response.text}"
@@ -346,10 +346,10 @@ class KeycloakUserManager:
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.warning(f"Erro ao listar usuários: {response.status_code}")
+                logger.warning("Erro ao listar usuários: %s", response.status_code)
                 return []
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao listar usuários: {str(e)}")
+            logger.error("Erro de conexão ao listar usuários: %s", e)
             return []
     
     def get_available_roles(self) -> List[Dict[str, Any]]:
@@ -371,10 +371,10 @@ class KeycloakUserManager:
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.warning(f"Erro ao obter roles: {response.status_code}")
+                logger.warning("Erro ao obter roles: %s", response.status_code)
                 return []
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao obter roles: {str(e)}")
+            logger.error("Erro de conexão ao obter roles: %s", e)
             return []
     
     def get_user_roles(self, user_id: str) -> List[Dict[str, Any]]:
@@ -396,10 +396,10 @@ class KeycloakUserManager:
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.warning(f"Erro ao obter roles do usuário: {response.status_code}")
+                logger.warning("Erro ao obter roles do usuário: %s", response.status_code)
                 return []
         except requests.RequestException as e:
-            logger.error(f"Erro de conexão ao obter roles do usuário: {str(e)}")
+            logger.error("Erro de conexão ao obter roles do usuário: %s", e)
             return []
     
     def assign_role_to_user(self, user_id: str, role_name: str) -> Dict[str, Any]:
@@ -441,7 +441,7 @@ class KeycloakUserManager:
             )
             
             if assign_response.status_code == 204:
-                logger.info(f"Role {role_name} atribuída ao usuário {user_id}")
+                logger.info("Role %s atribuída ao usuário %s", role_name, user_id)
                 return {'success': True}
             else:
                 error_msg = f"Erro ao atribuir role: {assign_response.status_code} - {assign_response.text}"
@@ -492,7 +492,7 @@ class KeycloakUserManager:
             )
             
             if remove_response.status_code == 204:
-                logger.info(f"Role {role_name} removida do usuário {user_id}")
+                logger.info("Role %s removida do usuário %s", role_name, user_id)
                 return {'success': True}
             else:
                 error_msg = f"Erro ao remover role: {remove_response.status_code} - {remove_response.text}"
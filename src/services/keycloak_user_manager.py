@@ -37,7 +37,7 @@ class KeycloakUserManager:
         }
         
         try:
-            logger.info(f"Tentando obter token admin: {url}")
+            logger.info("Tentando obter token admin: %s", url)
             response = requests.post(url, data=data, timeout=10)
             
             if response.status_code == 200:
@@ -103,7 +103,7 @@ class KeycloakUserManager:
         }
         
         try:
-            logger.info(f"Criando usuário: {user_data['username']}")
+            logger.info("Criando usuário: %s", user_data['username'])
             response = requests.post(url, json=keycloak_user, headers=headers, timeout=10)
             
             if response.status_code == 201:
@@ -115,7 +115,7 @@ class KeycloakUserManager:
                 if 'password' in user_data and user_id:
                     self.set_user_password(user_id, user_data['password'])
                 
-                logger.info(f"Usuário criado com sucesso: {user_id}")
+                logger.info("Usuário criado com sucesso: %s", user_id)
                 return {'success': True, 'user_id': user_id}
             else:
                 error_msg = f"Erro ao criar usuário: {response.status_code} - {response.text}"
@@ -151,7 +151,7 @@ class KeycloakUserManager:
             response = requests.put(url, json=password_data, headers=headers, timeout=10)
             
             if response.status_code == 204:
-                logger.info(f"Senha definida para usuário: {user_id}")
+                logger.info("Senha definida para usuário: %s", user_id)
                 return {'success': True}
             else:
                 error_msg = f"Erro ao definir senha: {response.status_code} - {response.text}"
@@ -0,0 +1,191 @@
+"""
+Application logging: non-blocking, sampled and structured.
+
+``configure_logging`` replaces the root handlers with a QueueHandler, so a
+log call only filters the record and puts it on an in-memory queue; a
+QueueListener thread formats it and does the I/O. Records are rendered as one
+JSON object per line (LOG_FORMAT=json, the default) or as plain text.
+
+Two filters run before a record is queued, so dropped records are never
+formatted:
+
+- sampling (LOG_SAMPLING, e.g. ``src.services.cloudflare_ai=0.1``) keeps a
+  fraction of a logger's records below WARNING;
+- rate limiting (LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST) caps how
+  often the same message template is emitted per logger; the next record that
+  gets through reports how many were suppressed.
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .rate_limit import TokenBucket
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_RATE_LIMIT_PER_SECOND = float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", "10"))
+LOG_RATE_LIMIT_BURST = float(os.getenv("LOG_RATE_LIMIT_BURST", "50"))
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """``name=rate,name=rate`` into a dict; invalid entries are ignored."""
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.strip().partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of records below WARNING, per logger prefix."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so the most specific logger setting wins
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (logger, message template); counts what it drops."""
+
+    MAX_KEYS = 4096
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._suppressed: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.CRITICAL:
+            return True
+        with self._lock:
+            return self._admit(record)
+
+    def _admit(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_KEYS:
+                self._buckets.clear()
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        allowed, _ = bucket.try_acquire()
+        if not allowed:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Resolves the message before queueing (args may change later), keeping the traceback separate."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_plain = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text, noting suppressed repeats."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} [{suppressed} similar suppressed]" if suppressed else text
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Route all logging through a queue to a background writer thread. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    enqueue = _QueueHandler(log_queue)
+    enqueue.addFilter(SamplingFilter(parse_sampling(LOG_SAMPLING)))
+    enqueue.addFilter(RateLimitFilter(LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(enqueue)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,140 @@
+"""
+In-process metrics: counters, gauges and timing summaries.
+
+Metrics are keyed by name plus optional labels and exposed as JSON on
+/metrics. Conversion worker processes buffer their events instead of
+aggregating them; the pool ships each task's events back with its result and
+replays them into the parent's registry, so worker-side timings show up too.
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+# (kind, name, labels, value) with kind in "count", "gauge", "time"
+MetricEvent = Tuple[str, str, Tuple[Tuple[str, str], ...], float]
+
+SAMPLE_WINDOW = 1024
+
+
+def _key(name: str, labels: Dict[str, Any]) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_key(key: MetricKey) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+class TimingSummary:
+    """Count, total and extremes, plus a window of recent samples for percentiles."""
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 2),
+            "p95_ms": round(self.percentile(0.95) * 1000, 2),
+            "p99_ms": round(self.percentile(0.99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timing summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKey, float] = {}
+        self._gauges: Dict[MetricKey, float] = {}
+        self._timings: Dict[MetricKey, TimingSummary] = {}
+        self._buffer: Optional[List[MetricEvent]] = None
+        self.started = time.time()
+
+    def _record(self, kind: str, key: MetricKey, value: float) -> None:
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append((kind, key[0], key[1], value))
+            elif kind == "count":
+                self._counters[key] = self._counters.get(key, 0) + value
+            elif kind == "gauge":
+                self._gauges[key] = value
+            else:
+                summary = self._timings.get(key)
+                if summary is None:
+                    summary = self._timings[key] = TimingSummary()
+                summary.add(value)
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        self._record("count", _key(name, labels), value)
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        self._record("gauge", _key(name, labels), value)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        self._record("time", _key(name, labels), seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the wall time of the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def buffer_events(self) -> None:
+        """Buffer events for drain() instead of aggregating (worker processes)."""
+        with self._lock:
+            if self._buffer is None:
+                self._buffer = []
+
+    def drain(self) -> List[MetricEvent]:
+        with self._lock:
+            if not self._buffer:
+                return []
+            events, self._buffer = self._buffer, []
+            return events
+
+    def merge(self, events: List[MetricEvent]) -> None:
+        """Replay events drained from another process."""
+        for kind, name, labels, value in events:
+            self._record(kind, (name, labels), value)
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "counters": {_format_key(k): v for k, v in sorted(self._counters.items())},
+                "gauges": {_format_key(k): v for k, v in sorted(self._gauges.items())},
+                "timings": {_format_key(k): s.snapshot() for k, s in sorted(self._timings.items())},
+            }
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,186 @@
+"""
+Retry, deadline and hedging helpers for outbound HTTP calls.
+
+Retries use exponential backoff with full jitter, so clients that failed
+together do not retry together, and honour the upstream's Retry-After. Every
+attempt and every wait is bounded by the request's overall deadline. Hedging
+trims the latency tail by racing a backup call against a slow one, within a
+small budget of extra calls.
+"""
+import time
+import random
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .metrics import TimingSummary, metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP date), or None if absent or invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped, honouring Retry-After."""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 10.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number ``attempt + 1``."""
+        if retry_after is not None:
+            # The upstream told us when; add a little jitter so waiters spread out
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class Deadline:
+    """Time budget for one logical request, shared by all its attempts."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class Hedger:
+    """
+    Hedged requests: if a call has not returned by the adaptive p95 of recent
+    latencies, issue one identical backup call; the first successful result
+    wins and the other is cancelled.
+
+    Hedges are paid from a budget that earns ``budget`` tokens per request
+    (0.05 = at most 5% extra calls), so a slow upstream cannot be flooded with
+    duplicates. A result of None counts as a failure, and the other call is
+    awaited instead.
+    """
+
+    def __init__(self, name: str, budget: float = 0.05, percentile: float = 0.95,
+                 min_samples: int = 20, min_delay: float = 0.05, max_tokens: float = 10.0):
+        self.name = name
+        self.budget = budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        # Latency of single calls (for cancelled losers, the time until then: a lower
+        # bound), which is also what callers would see without hedging
+        self.latencies = TimingSummary()
+        # Latency callers actually saw
+        self.effective = TimingSummary()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def threshold(self) -> Optional[float]:
+        """Delay before hedging, or None while there are too few samples."""
+        if len(self.latencies.recent) < self.min_samples:
+            return None
+        return max(self.latencies.percentile(self.percentile), self.min_delay)
+
+    async def run(self, call: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
+        self.requests += 1
+        self.tokens = min(self.tokens + self.budget, self.max_tokens)
+        start = time.perf_counter()
+        primary = self._timed(call)
+        tasks = [primary]
+        try:
+            delay = self.threshold()
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                result = primary.result()
+                self._finish(start)
+                return result
+
+            if self.tokens < 1.0:
+                self.budget_exhausted += 1
+                metrics.increment("ai_hedges", operation=self.name, outcome="budget_exhausted")
+                result = await primary
+                self._finish(start)
+                return result
+
+            self.tokens -= 1.0
+            self.hedged += 1
+            metrics.increment("ai_hedges", operation=self.name, outcome="issued")
+            hedge = self._timed(call)
+            tasks.append(hedge)
+            pending = set(tasks)
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.result() is not None), None)
+                if winner is not None:
+                    result = winner.result()
+                    if winner is hedge:
+                        self.hedge_wins += 1
+                        metrics.increment("ai_hedges", operation=self.name, outcome="won")
+                    break
+            self._finish(start)
+            return result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _timed(self, call: Callable[[], Awaitable[Optional[T]]]) -> "asyncio.Task":
+        async def timed() -> Optional[T]:
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self.latencies.add(time.perf_counter() - started)
+                raise
+            if result is not None:
+                self.latencies.add(time.perf_counter() - started)
+            return result
+        return asyncio.ensure_future(timed())
+
+    def _finish(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        self.effective.add(elapsed)
+        metrics.observe("ai_hedged_call_seconds", elapsed, operation=self.name)
+
+    def status(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        effective_p99 = self.effective.percentile(0.99)
+        single_p99 = self.latencies.percentile(0.99)
+        metrics.set_gauge("ai_hedge_p99_saved_ms", round((single_p99 - effective_p99) * 1000, 1), operation=self.name)
+        return {
+            "threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "p99_ms": round(effective_p99 * 1000, 1),
+            "p99_single_call_ms": round(single_p99 * 1000, 1),
+            "p99_saved_ms": round((single_p99 - effective_p99) * 1000, 1),
+        }
@@ -0,0 +1,287 @@
+"""
+On-demand profiling of the live process.
+
+Nothing here runs until an admin asks for it:
+
+- ``SamplingProfiler`` samples every thread's stack from a background thread
+  at a fixed interval and aggregates them as collapsed stacks (one
+  ``frame;frame;frame count`` line per distinct stack), ready for
+  flamegraph.pl, speedscope or inferno.
+- ``ProfileRequestMiddleware`` profiles a single request that carries a valid
+  signed ``X-Profile`` header (see ``sign_profile_token``) and keeps the
+  result for retrieval by id. Without PROFILING_SECRET it is not installed.
+- ``MemoryProfiler`` wraps tracemalloc: start/stop, top allocations and diffs
+  against a baseline snapshot.
+
+The sampler sees all threads, so a per-request profile also contains whatever
+else the process was doing at the time. Conversions run in pool worker
+processes, out of its sight: while a session is active each conversion task is
+sampled inside its worker and the stacks come back with the result, merged
+into the session under a ``worker-<pid>`` root. tracemalloc only covers the
+API process; worker memory shows up as RSS growth in the flight recorder.
+"""
+import os
+import sys
+import hmac
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+PROFILING_KEEP_RESULTS = int(os.getenv("PROFILING_KEEP_RESULTS", "20"))
+
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiling session is already running."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler over all threads (or just ``thread``, labelled
+    ``root``); one session at a time per process.
+    """
+
+    _session_lock = threading.Lock()
+    # The running session, if any (conversion workers sample for it)
+    active: Optional["SamplingProfiler"] = None
+
+    def __init__(self, interval: float = PROFILING_INTERVAL_MS / 1000,
+                 thread: Optional[int] = None, root: Optional[str] = None):
+        self.interval = interval
+        self.thread = thread
+        self.root = root
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self._session_lock.acquire(blocking=False):
+            raise ProfilerBusy("A profiling session is already running")
+        self.started_at = time.perf_counter()
+        SamplingProfiler.active = self
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self.started_at
+            SamplingProfiler.active = None
+            self._session_lock.release()
+        return self.collapsed()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread is not None and ident != self.thread):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(self.root or names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def merge(self, stacks: Dict[str, int]) -> None:
+        """Add stacks sampled elsewhere (in a conversion worker)."""
+        self.stacks.update(stacks)
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+async def profile_for(seconds: float, interval: Optional[float] = None) -> SamplingProfiler:
+    """Sample the process for ``seconds`` (capped at PROFILING_MAX_SECONDS)."""
+    profiler = SamplingProfiler(interval if interval is not None else PROFILING_INTERVAL_MS / 1000)
+    profiler.start()
+    try:
+        await asyncio.sleep(min(seconds, PROFILING_MAX_SECONDS))
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def sign_profile_token(expires_at: int, secret: str = PROFILING_SECRET) -> str:
+    """``X-Profile`` header value valid until ``expires_at`` (unix time)."""
+    signature = hmac.new(secret.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+
+def verify_profile_token(token: str, secret: str = PROFILING_SECRET) -> bool:
+    if not secret:
+        return False
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(token, sign_profile_token(int(expires), secret))
+
+
+class ProfileStore:
+    """The most recent per-request profiles, by id."""
+
+    def __init__(self, keep: int = PROFILING_KEEP_RESULTS):
+        self.keep = keep
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, path: str, profiler: SamplingProfiler, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex[:16]
+        self._results[profile_id] = {
+            "path": path,
+            "created_at": time.time(),
+            "duration_ms": round(profiler.duration * 1000, 1),
+            "samples": profiler.samples,
+            "collapsed": profiler.collapsed(),
+        }
+        while len(self._results) > self.keep:
+            self._results.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": profile_id, **{k: v for k, v in result.items() if k != "collapsed"}}
+            for profile_id, result in reversed(self._results.items())
+        ]
+
+
+profile_store = ProfileStore()
+
+
+class ProfileRequestMiddleware:
+    """
+    Profiles requests that carry a valid signed ``X-Profile`` header and adds
+    an ``X-Profile-Id`` response header to fetch the result with.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], secret: str = PROFILING_SECRET):
+        self.app = app
+        self.secret = secret
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]],
+                       send: Callable[..., Awaitable[None]]) -> None:
+        token = None
+        if scope["type"] == "http":
+            token = next((value.decode("latin-1") for name, value in scope.get("headers", [])
+                          if name.lower() == PROFILE_HEADER.encode()), None)
+        if token is None or not verify_profile_token(token, self.secret):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler()
+        try:
+            profiler.start()
+        except ProfilerBusy:
+            logger.warning("Profiling requested for %s but a session is already running", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            profile_store.add(scope["path"], profiler, profile_id)
+
+
+class MemoryProfiler:
+    """tracemalloc controls: top allocations and diffs against a baseline."""
+
+    _IGNORE = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self.baseline = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        return tracemalloc.take_snapshot().filter_traces(self._IGNORE)
+
+    def take_baseline(self) -> None:
+        self.baseline = self._snapshot()
+
+    def top(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        stats = self._snapshot().statistics(group_by)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": _trace_location(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in stats[:limit]
+            ],
+        }
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        if self.baseline is None:
+            raise RuntimeError("No baseline snapshot; take one first")
+        stats = self._snapshot().compare_to(self.baseline, group_by)
+        return {
+            "diff": [
+                {
+                    "location": _trace_location(stat.traceback),
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+
+def _trace_location(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,96 @@
+"""
+Token-bucket rate limiting.
+
+A bucket holds up to ``capacity`` tokens and refills at ``rate`` tokens per
+second; each request takes one. ``try_acquire`` answers immediately (and says
+how long until a token is available), ``acquire`` waits for one in FIFO order.
+
+Waiting callers reserve their tokens up front (the balance goes negative) and
+sleep until the refill covers them, so arrival order is kept without a lock
+and each caller's timeout bounds its whole wait.
+"""
+import time
+import asyncio
+from typing import Callable, Optional, Tuple
+
+
+class TokenBucket:
+    """Token bucket with an optional async FIFO wait."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self.updated = clock()
+        self.waiting = 0
+        # Set by pause(); reserved callers that wake before it wait on
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens if available. Returns (allowed, seconds until enough tokens)."""
+        self._refill(self._clock())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        if self.rate <= 0:
+            return False, float('inf')
+        return False, (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Wait for tokens in arrival order. Returns False if not granted within timeout."""
+        now = self._clock()
+        deadline = None if timeout is None else now + timeout
+        self._refill(now)
+        if self.tokens >= tokens and now >= self.paused_until:
+            self.tokens -= tokens
+            return True
+        if self.rate <= 0:
+            return False
+        # Callers ahead of us already took their share of the refill
+        ready_at = max(now + (tokens - self.tokens) / self.rate, self.paused_until)
+        if deadline is not None and ready_at > deadline:
+            return False
+        self.tokens -= tokens
+        self.waiting += 1
+        try:
+            while True:
+                wait = ready_at - self._clock()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if self._clock() >= self.paused_until:
+                    return True
+                # Paused (e.g. upstream 429) while we slept
+                ready_at = self.paused_until
+                if deadline is not None and ready_at > deadline:
+                    self.tokens += tokens
+                    return False
+        except asyncio.CancelledError:
+            self.tokens += tokens
+            raise
+        finally:
+            self.waiting -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all callers for ``seconds`` (e.g. after an upstream 429)."""
+        now = self._clock()
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    @property
+    def remaining(self) -> int:
+        self._refill(self._clock())
+        return max(int(self.tokens), 0)
+
+    def reset_after(self) -> float:
+        """Seconds until the bucket is full again."""
+        self._refill(self._clock())
+        if self.rate <= 0:
+            return 0.0
+        return max(self.capacity - self.tokens, 0.0) / self.rate
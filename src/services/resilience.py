@@ -0,0 +1,190 @@
+"""
+Resilience primitives for outbound calls: circuit breaker and adaptive
+concurrency limit.
+
+The circuit breaker opens after consecutive upstream failures and fails calls
+fast until a cool-down has passed, then lets a single probe through
+(half-open) to decide whether to close again.
+
+The adaptive limiter caps in-flight calls with an AIMD rule driven by
+latency: each call that completes near the long-run latency grows the limit
+additively (about +1 per round trip), while a failure, overload signal or a
+call much slower than usual shrinks it multiplicatively. Callers queue while
+the limit is reached, up to a maximum wait.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._clock = clock
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now. In half-open state only one probe may."""
+        if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        metrics.increment("circuit_rejected", breaker=self.name)
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+            if self.state != self.OPEN:
+                self._transition(self.OPEN)
+
+    def record_ignored(self) -> None:
+        """The call ended without telling anything about upstream health."""
+        self._probe_in_flight = False
+
+    def _transition(self, state: str) -> None:
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        metrics.increment("circuit_transitions", breaker=self.name, state=state)
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+        if self.state == self.OPEN:
+            status["retry_in_seconds"] = round(max(self.reset_timeout - (self._clock() - self.opened_at), 0), 1)
+        return status
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed latency."""
+
+    def __init__(self, name: str, initial: int = 10, minimum: int = 1, maximum: int = 100,
+                 backoff: float = 0.7, tolerance: float = 2.0, max_wait: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.long_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._clock = clock
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a slot (FIFO). Returns False if none freed up within max_wait,
+        or within ``timeout`` if that is shorter.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait if timeout is None else min(timeout, self.max_wait))
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self._give_back()
+            metrics.increment("limiter_timeouts", limiter=self.name)
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._give_back()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: Optional[float], overloaded: bool = False) -> None:
+        """
+        Free a slot and adapt the limit. ``latency`` is None for calls that
+        ended without a meaningful timing; ``overloaded`` signals a failure or
+        rate limit that should shrink the limit.
+        """
+        if overloaded:
+            self._decrease()
+        elif latency is not None:
+            self._observe(latency)
+        self._give_back()
+        metrics.set_gauge("limiter_limit", round(self.limit, 2), limiter=self.name)
+
+    def _give_back(self) -> None:
+        self.in_flight -= 1
+        # Hand freed slots straight to the oldest waiters
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _observe(self, latency: float) -> None:
+        if self.long_latency is None:
+            self.long_latency = latency
+            return
+        if latency > self.long_latency * self.tolerance:
+            self._decrease()
+        elif self.in_flight >= int(self.limit) // 2:
+            # Only grow while the current limit is actually being used
+            self.limit = min(self.limit + 1.0 / self.limit, float(self.maximum))
+        # Slow-moving baseline so a sustained slowdown is not learned as normal at once
+        self.long_latency += 0.05 * (latency - self.long_latency)
+
+    def _decrease(self) -> None:
+        # At most one decrease per baseline round trip, so one burst of slow calls counts once
+        now = self._clock()
+        if now - self._last_decrease < (self.long_latency or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * self.backoff, float(self.minimum))
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "baseline_latency_ms": round(self.long_latency * 1000, 1) if self.long_latency is not None else None,
+        }
@@ -0,0 +1,147 @@
+"""
+Plan-tier priority lanes for the conversion pool.
+
+Tasks wait in one lane per plan (plus ``anonymous``) until a worker slot is
+free. Slots are handed out by self-clocked weighted fair queuing: every task
+gets a virtual finish tag ``max(now, lane's last tag) + 1 / weight`` and the
+smallest tag among the lanes' head tasks runs next. A lane with weight 4
+therefore gets four times the slots of a weight-1 lane while both are busy,
+yet a busy lane never starves an idle one, and a lane alone gets every slot.
+A lane may also be capped at a share of the slots so that, for instance,
+anonymous traffic can never occupy all workers.
+
+The lane of the current request is set with ``set_lane``.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANE = "anonymous"
+CONVERSION_LANE_WEIGHTS = os.getenv("CONVERSION_LANE_WEIGHTS", "anonymous=1,basic=2,premium=4,unlimited=8")
+# Largest share of the worker slots a lane may hold at once
+CONVERSION_LANE_CAPS = os.getenv("CONVERSION_LANE_CAPS", "anonymous=0.5")
+
+_lane: ContextVar[str] = ContextVar("conversion_lane", default=DEFAULT_LANE)
+
+
+def set_lane(plan: Optional[str]) -> None:
+    """Queue the current request's conversions in the lane of this plan (None: anonymous)."""
+    _lane.set(plan or DEFAULT_LANE)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def parse_lane_values(spec: str) -> Dict[str, float]:
+    """``name=value,...`` pairs; malformed entries are skipped."""
+    values = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        try:
+            values[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return values
+
+
+class _Lane:
+    def __init__(self, name: str, weight: float, cap: int):
+        self.name = name
+        self.weight = weight
+        self.cap = cap
+        self.waiting: Deque[Tuple[float, float, asyncio.Future]] = deque()
+        self.in_flight = 0
+        self.last_tag = 0.0
+        self.dispatched = 0
+
+
+class FairScheduler:
+    """Weighted fair queuing of worker slots across lanes, with per-lane caps."""
+
+    def __init__(self, slots: int, weights: Dict[str, float], caps: Optional[Dict[str, float]] = None):
+        self.slots = max(slots, 1)
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self._caps = caps or {}
+        self._weights = weights
+        self._lanes: Dict[str, _Lane] = {}
+        for name in weights:
+            self._lane(name)
+
+    def _lane(self, name: str) -> _Lane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            if name not in self._weights:
+                # A plan missing from CONVERSION_LANE_WEIGHTS gets weight 1
+                logger.warning("No weight configured for conversion lane %r", name)
+            weight = max(self._weights.get(name, 1.0), 0.01)
+            share = self._caps.get(name, 1.0)
+            lane = self._lanes[name] = _Lane(name, weight, max(int(self.slots * share), 1))
+        return lane
+
+    async def acquire(self, lane_name: str) -> float:
+        """Wait for a worker slot in this lane; returns the seconds spent queued."""
+        lane = self._lane(lane_name)
+        tag = max(self.virtual_time, lane.last_tag) + 1 / lane.weight
+        lane.last_tag = tag
+        waiter = asyncio.get_running_loop().create_future()
+        queued = time.monotonic()
+        lane.waiting.append((tag, queued, waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we were cancelled: hand the slot on
+                self.release(lane_name)
+            else:
+                lane.waiting = deque(entry for entry in lane.waiting if entry[2] is not waiter)
+            raise
+        waited = time.monotonic() - queued
+        metrics.observe("conversion_queue_seconds", waited, lane=lane_name)
+        return waited
+
+    def release(self, lane_name: str) -> None:
+        lane = self._lanes[lane_name]
+        lane.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.slots:
+            candidates = [lane for lane in self._lanes.values() if lane.waiting and lane.in_flight < lane.cap]
+            if not candidates:
+                return
+            lane = min(candidates, key=lambda lane: lane.waiting[0][0])
+            tag, _, waiter = lane.waiting.popleft()
+            if waiter.done():
+                continue
+            self.virtual_time = tag
+            lane.in_flight += 1
+            lane.dispatched += 1
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        lanes = {}
+        for lane in self._lanes.values():
+            metrics.set_gauge("conversion_lane_queued", len(lane.waiting), lane=lane.name)
+            lanes[lane.name] = {
+                "weight": lane.weight,
+                "cap": lane.cap,
+                "in_flight": lane.in_flight,
+                "queued": len(lane.waiting),
+                "oldest_queued_seconds": round(now - lane.waiting[0][1], 3) if lane.waiting else 0.0,
+                "dispatched": lane.dispatched,
+            }
+        return {"slots": self.slots, "in_flight": self.in_flight, "lanes": lanes}
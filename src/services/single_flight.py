@@ -0,0 +1,76 @@
+"""
+Single-flight coalescing of identical concurrent work.
+
+When several requests need the same result at the same time (the same file
+uploaded by a whole team), the first caller starts the computation and the
+others await that one task. Every caller gets the result or the exception.
+A caller that is cancelled (client disconnect) only stops waiting; the shared
+task is cancelled once no caller is waiting for it any more.
+
+The shared task runs in the context (context variables) of the caller that
+started it, so keys must include whatever in that context affects the work.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from .conversion_cache import content_hash
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def flight_key(operation: str, content: bytes, extension: str,
+               options: Optional[Dict[str, Any]] = None) -> Tuple[Hashable, ...]:
+    """Key for work that depends only on the content, extension and options."""
+    return operation, content_hash(content), extension, tuple(sorted((options or {}).items()))
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time and shares its outcome."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn() for this key, joining an identical call already in flight."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            metrics.increment("single_flight_coalesced", operation=self.name)
+
+        flight.waiters += 1
+        try:
+            # shield: one caller being cancelled must not cancel the others' result
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Last one waiting: nobody needs the result any more
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def status(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
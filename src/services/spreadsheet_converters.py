@@ -0,0 +1,211 @@
+"""
+Streaming spreadsheet converter with sheet and cell-range selection.
+
+Workbooks are opened read-only (openpyxl for xlsx, on-demand xlrd for xls) and
+rows are iterated lazily, so memory stays flat for wide or long sheets. Only
+the selected sheets and range are read, and each sheet is rendered as a
+markdown table row by row within the row and size caps.
+"""
+import io
+import os
+import re
+import logging
+from datetime import date, datetime, time
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from .converters import InvalidConversionOptions
+from .structured_converters import MAX_OUTPUT_CHARS, format_cell, render_rows
+
+logger = logging.getLogger(__name__)
+
+SPREADSHEET_EXTENSIONS = {'xlsx', 'xls'}
+
+SPREADSHEET_MAX_ROWS = int(os.getenv("SPREADSHEET_MAX_ROWS", "10000"))
+
+_CELL_REF = re.compile(r'^([A-Z]{0,3})(\d*)$')
+
+# (min_col, min_row, max_col, max_row), 1-based and inclusive; None means open-ended
+CellRange = Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index
+
+
+def parse_cell_range(value: str) -> CellRange:
+    """
+    Parse an A1-style range such as ``B2:F100``, ``A:D``, ``3:50`` or ``C7``.
+
+    Raises:
+        InvalidConversionOptions: if the range is malformed
+    """
+    parts = value.strip().upper().replace('$', '').split(':')
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        raise InvalidConversionOptions(f"Invalid cell range: {value}")
+
+    bounds = []
+    for part in parts:
+        match = _CELL_REF.match(part)
+        if not match or not part:
+            raise InvalidConversionOptions(f"Invalid cell range: {value}")
+        letters, digits = match.groups()
+        bounds.append((_column_index(letters) if letters else None, int(digits) if digits else None))
+
+    (min_col, min_row), (max_col, max_row) = bounds
+    if (min_col and max_col and min_col > max_col) or (min_row and max_row and min_row > max_row):
+        raise InvalidConversionOptions(f"Invalid cell range: {value}")
+    return min_col, min_row, max_col, max_row
+
+
+def select_sheets(available: Sequence[str], selection: Optional[str]) -> List[str]:
+    """
+    Resolve a comma separated list of sheet names or 1-based indexes.
+
+    Raises:
+        InvalidConversionOptions: if a sheet does not exist
+    """
+    if not selection:
+        return list(available)
+    selected = []
+    for item in (part.strip() for part in selection.split(',')):
+        if not item:
+            continue
+        if item in available:
+            name = item
+        elif item.isdigit() and 1 <= int(item) <= len(available):
+            name = available[int(item) - 1]
+        else:
+            raise InvalidConversionOptions(f"Sheet not found: {item}. Available sheets: {list(available)}")
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+
+def _cell_text(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ') if value.time() != time(0) else value.date().isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return format_cell(value)
+
+
+def _render_sheet(name: str, rows_factory, max_rows: int, max_chars: int) -> str:
+    """
+    Render one sheet from a factory returning fresh row iterators. The first
+    non-empty row is the header; fully empty rows and trailing empty columns
+    are dropped.
+    """
+    def non_empty_rows() -> Iterator[List[str]]:
+        for row in rows_factory():
+            cells = [_cell_text(value) for value in row]
+            if any(cells):
+                yield cells
+
+    width = 0
+    header: Optional[List[str]] = None
+    for count, cells in enumerate(non_empty_rows()):
+        if count > max_rows:
+            break
+        if header is None:
+            header = cells
+        last = max(i for i, cell in enumerate(cells) if cell)
+        width = max(width, last + 1)
+    if header is None:
+        return f"## {name}\n\n*Empty sheet.*\n"
+
+    def body() -> Iterator[List[str]]:
+        rows = non_empty_rows()
+        next(rows, None)
+        for cells in rows:
+            yield cells[:width]
+
+    header = (header + [''] * width)[:width]
+    return f"## {name}\n\n{render_rows(header, body(), body(), max_rows, max_chars)}"
+
+
+def _xlsx_sheets(content: bytes, sheet: Optional[str], cell_range: Optional[CellRange]):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for name in select_sheets(workbook.sheetnames, sheet):
+            worksheet = workbook[name]
+            min_col, min_row, max_col, max_row = cell_range or (None, None, None, None)
+
+            def rows(worksheet=worksheet, min_col=min_col, min_row=min_row, max_col=max_col, max_row=max_row):
+                return worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col,
+                                           max_col=max_col, values_only=True)
+            yield name, rows
+    finally:
+        workbook.close()
+
+
+def _xls_sheets(content: bytes, sheet: Optional[str], cell_range: Optional[CellRange]):
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_contents=content, on_demand=True)
+    try:
+        for name in select_sheets(workbook.sheet_names(), sheet):
+            worksheet = workbook.sheet_by_name(name)
+            min_col, min_row, max_col, max_row = cell_range or (None, None, None, None)
+            first_row = (min_row or 1) - 1
+            last_row = min(max_row or worksheet.nrows, worksheet.nrows)
+            first_col = (min_col or 1) - 1
+            last_col = max_col or None
+
+            def rows(worksheet=worksheet, first_row=first_row, last_row=last_row,
+                     first_col=first_col, last_col=last_col):
+                for index in range(first_row, last_row):
+                    values = []
+                    for cell in worksheet.row_slice(index, first_col, last_col):
+                        if cell.ctype == xlrd.XL_CELL_DATE:
+                            values.append(xlrd.xldate_as_datetime(cell.value, workbook.datemode))
+                        elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                            values.append(None)
+                        else:
+                            values.append(cell.value)
+                    yield values
+            yield name, rows
+            workbook.unload_sheet(name)
+    finally:
+        workbook.release_resources()
+
+
+def convert_spreadsheet(content: bytes, extension: str, sheet: Optional[str] = None,
+                        cell_range: Optional[str] = None, max_rows: Optional[int] = None,
+                        max_chars: Optional[int] = None, **options) -> str:
+    """
+    Convert selected sheets of an xlsx/xls workbook to markdown tables.
+
+    Args:
+        content: Workbook bytes
+        extension: 'xlsx' or 'xls'
+        sheet: Comma separated sheet names or 1-based indexes (default: all sheets)
+        cell_range: A1-style range applied to every selected sheet, e.g. "A1:F200"
+        max_rows: Row cap per sheet (default SPREADSHEET_MAX_ROWS)
+        max_chars: Output cap in characters for the whole workbook
+
+    Returns:
+        Markdown with one section per sheet
+    """
+    parsed_range = parse_cell_range(cell_range) if cell_range else None
+    max_rows = SPREADSHEET_MAX_ROWS if max_rows is None else max_rows
+    remaining = MAX_OUTPUT_CHARS if max_chars is None else max_chars
+
+    sheets = _xls_sheets if extension == 'xls' else _xlsx_sheets
+    parts = []
+    for name, rows_factory in sheets(content, sheet, parsed_range):
+        if remaining <= 0:
+            parts.append(f"## {name}\n\n*Skipped: output size limit reached.*\n")
+            continue
+        markdown = _render_sheet(name, rows_factory, max_rows, remaining)
+        remaining -= len(markdown)
+        parts.append(markdown)
+    return "\n".join(parts)
@@ -0,0 +1,479 @@
+"""
+Streaming converters for structured data (CSV, JSON arrays, XML records).
+
+Each converter makes two passes over a seekable binary stream: the first reads
+up to ``max_rows`` rows to infer column widths and types, the second renders
+the markdown table row by row. Only the current row and the per-column
+profile are held in memory, so peak memory is O(row) rather than O(file);
+output stops at ``max_rows`` rows or ``max_chars`` characters with a notice.
+"""
+import io
+import os
+import re
+import csv
+import json
+import logging
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from xml.etree.ElementTree import ParseError
+
+try:
+    from defusedxml.ElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+
+from .text_converters import convert_text, detect_encoding
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_EXTENSIONS = {'csv', 'json', 'xml'}
+
+MAX_ROWS = int(os.getenv("STRUCTURED_MAX_ROWS", "10000"))
+MAX_OUTPUT_CHARS = int(os.getenv("STRUCTURED_MAX_OUTPUT_CHARS", str(2 * 1024 * 1024)))
+MAX_COLUMNS = int(os.getenv("STRUCTURED_MAX_COLUMNS", "100"))
+MAX_CELL_CHARS = int(os.getenv("STRUCTURED_MAX_CELL_CHARS", "200"))
+
+READ_CHUNK_SIZE = 64 * 1024
+SAMPLE_SIZE = 64 * 1024
+
+_INT = re.compile(r'^[+-]?\d+$')
+_FLOAT = re.compile(r'^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$')
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$')
+_BOOL = {'true', 'false', 'yes', 'no'}
+_NUMERIC_KINDS = {'int', 'float'}
+
+
+class NotTabular(Exception):
+    """The document has no table-like structure; use a fallback converter."""
+
+
+class ColumnProfile:
+    """Running width and type inference for one column."""
+
+    __slots__ = ("width", "kind")
+
+    def __init__(self, header: str):
+        self.width = max(3, len(header))
+        self.kind = 'empty'
+
+    def observe(self, cell: str) -> None:
+        if len(cell) > self.width:
+            self.width = len(cell)
+        if not cell or self.kind == 'text':
+            return
+        if self.kind == 'int' and cell.isdigit():
+            return
+        if _INT.match(cell):
+            kind = 'int'
+        elif _FLOAT.match(cell):
+            kind = 'float'
+        elif cell.lower() in _BOOL:
+            kind = 'bool'
+        elif _DATE.match(cell):
+            kind = 'date'
+        else:
+            kind = 'text'
+        if self.kind == 'empty' or self.kind == kind:
+            self.kind = kind
+        elif {self.kind, kind} == _NUMERIC_KINDS:
+            self.kind = 'float'
+        else:
+            self.kind = 'text'
+
+
+def format_cell(value: Any, max_chars: int = MAX_CELL_CHARS) -> str:
+    """Render one value as a single-line markdown table cell."""
+    if value.__class__ is str:
+        text = value.strip()
+    elif value is None:
+        return ''
+    elif isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = str(value).strip()
+    if '|' in text or '\n' in text or '\r' in text:
+        text = text.replace('\r\n', '\n').replace('|', '\\|').replace('\n', '<br>')
+    if len(text) > max_chars:
+        text = text[:max_chars - 1] + '…'
+    return text
+
+
+class TableRenderer:
+    """Renders a markdown table incrementally within row and size caps."""
+
+    def __init__(self, header: Sequence[str], profiles: Sequence[ColumnProfile],
+                 max_rows: int, max_chars: int):
+        self.profiles = profiles
+        self.max_rows = max_rows
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self.rows = 0
+        self.truncated = False
+        self._widths = [p.width for p in profiles]
+        self._right_aligned = [p.kind in _NUMERIC_KINDS for p in profiles]
+        self._write_row(header)
+        self._write(
+            '| ' + ' | '.join(
+                ('-' * (p.width - 1) + ':') if p.kind in _NUMERIC_KINDS else '-' * p.width
+                for p in profiles
+            ) + ' |\n'
+        )
+
+    def _write(self, line: str) -> None:
+        self.parts.append(line)
+        self.size += len(line)
+
+    def _write_row(self, cells: Sequence[str]) -> None:
+        self._write('| ' + ' | '.join([
+            cell.rjust(width) if right else cell.ljust(width)
+            for cell, width, right in zip(cells, self._widths, self._right_aligned)
+        ]) + ' |\n')
+
+    def add(self, cells: Sequence[str]) -> bool:
+        """Append a row. Returns False once a cap is reached and rendering should stop."""
+        if self.rows >= self.max_rows or self.size >= self.max_chars:
+            self.truncated = True
+            return False
+        self._write_row(cells)
+        self.rows += 1
+        return True
+
+    def render(self) -> str:
+        if self.truncated:
+            self._write(f"\n*Output truncated after {self.rows} rows.*\n")
+        return ''.join(self.parts)
+
+
+def _normalize(cells: Sequence[str], width: int) -> Sequence[str]:
+    if len(cells) == width:
+        return cells
+    cells = list(cells[:width])
+    if len(cells) < width:
+        cells.extend([''] * (width - len(cells)))
+    return cells
+
+
+def render_rows(header: Sequence[str], rows: Iterable[Sequence[str]], profile_rows: Iterable[Sequence[str]],
+                max_rows: int, max_chars: int) -> str:
+    """
+    Two-pass render: ``profile_rows`` is consumed first to size the columns,
+    then ``rows`` (a fresh iterator over the same data) is rendered.
+    """
+    width = len(header)
+    profiles = [ColumnProfile(h) for h in header]
+    for count, cells in enumerate(profile_rows):
+        if count >= max_rows:
+            break
+        for profile, cell in zip(profiles, _normalize(cells, width)):
+            profile.observe(cell)
+    if hasattr(profile_rows, 'close'):
+        profile_rows.close()
+
+    renderer = TableRenderer(header, profiles, max_rows, max_chars)
+    for cells in rows:
+        if not renderer.add(_normalize(cells, width)):
+            break
+    return renderer.render()
+
+
+def _stream_encoding(stream: BinaryIO) -> str:
+    """Detect the encoding from the start of a stream, then rewind it."""
+    sample = stream.read(SAMPLE_SIZE)
+    stream.seek(0)
+    try:
+        sample.decode('utf-8')
+        return 'utf-8-sig' if sample.startswith(b'\xef\xbb\xbf') else 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut by the sample boundary is still UTF-8
+        if e.start >= len(sample) - 3 and len(sample) == SAMPLE_SIZE:
+            return 'utf-8-sig' if sample.startswith(b'\xef\xbb\xbf') else 'utf-8'
+    encoding = detect_encoding(sample)
+    return 'utf-8-sig' if encoding == 'utf-8' and sample.startswith(b'\xef\xbb\xbf') else encoding
+
+
+def _text_stream(stream: BinaryIO, encoding: str) -> io.TextIOWrapper:
+    stream.seek(0)
+    return io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+
+
+# CSV
+
+def _csv_dialect(stream: BinaryIO, encoding: str):
+    sample = stream.read(8192).decode(encoding, errors='ignore')
+    stream.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        return csv.excel
+
+
+def csv_to_markdown(stream: BinaryIO, max_rows: int = MAX_ROWS, max_chars: int = MAX_OUTPUT_CHARS) -> str:
+    """Render a CSV stream as a markdown table. The first row is the header."""
+    encoding = _stream_encoding(stream)
+    dialect = _csv_dialect(stream, encoding)
+
+    def rows() -> Iterator[List[str]]:
+        text = _text_stream(stream, encoding)
+        try:
+            reader = csv.reader(text, dialect)
+            next(reader, None)  # header
+            for row in reader:
+                if row:
+                    yield [format_cell(cell) for cell in row]
+        finally:
+            text.detach()
+
+    text = _text_stream(stream, encoding)
+    header_row = next(csv.reader(text, dialect), None)
+    text.detach()
+    if not header_row:
+        return ''
+    header = [format_cell(cell) for cell in header_row[:MAX_COLUMNS]]
+    return render_rows(header, rows(), rows(), max_rows, max_chars)
+
+
+# JSON
+
+def iter_json_array(text: io.TextIOBase, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Raises:
+        NotTabular: if the document is not a JSON array
+        ValueError: if the array is malformed
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill(size: int) -> bool:
+        nonlocal buffer, position, eof
+        chunk = text.read(size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip_whitespace() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill(chunk_size):
+                return ''
+
+    first = skip_whitespace()
+    if first != '[':
+        raise NotTabular("JSON document is not an array")
+    position += 1
+
+    if skip_whitespace() == ']':
+        return
+    while True:
+        read_size = chunk_size
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # A number or literal ending exactly at the buffer edge may continue, and
+                # so may a number cut in its fraction or exponent ("1." or "1e" of "1.5e3")
+                if eof or (end < len(buffer) and buffer[end] not in '.eE'):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Malformed JSON array")
+            fill(read_size)
+            read_size *= 2
+        position = end
+        yield value
+
+        separator = skip_whitespace()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError("Malformed JSON array")
+        position += 1
+        skip_whitespace()
+
+
+def json_to_markdown(stream: BinaryIO, max_rows: int = MAX_ROWS, max_chars: int = MAX_OUTPUT_CHARS) -> str:
+    """
+    Render a top-level JSON array as a markdown table.
+
+    Objects become rows keyed by the union of their keys (from the profiled
+    rows), nested arrays become positional columns and scalars a single column.
+
+    Raises:
+        NotTabular: if the document is not an array of rows
+    """
+    encoding = _stream_encoding(stream)
+
+    def elements() -> Iterator[Any]:
+        text = _text_stream(stream, encoding)
+        try:
+            yield from iter_json_array(text)
+        finally:
+            text.detach()
+
+    columns: Dict[str, None] = {}
+    width = 0
+    kinds = set()
+    for count, element in enumerate(elements()):
+        if count >= max_rows:
+            break
+        if isinstance(element, dict):
+            kinds.add('object')
+            for key in element:
+                if len(columns) < MAX_COLUMNS:
+                    columns.setdefault(str(key), None)
+        elif isinstance(element, list):
+            kinds.add('array')
+            width = min(max(width, len(element)), MAX_COLUMNS)
+        else:
+            kinds.add('scalar')
+    if len(kinds) != 1:
+        raise NotTabular("JSON array is empty or mixes objects, arrays and scalars")
+
+    kind = kinds.pop()
+    if kind == 'object':
+        header = list(columns)
+
+        def to_cells(element):
+            return [format_cell(element.get(key)) for key in header]
+    elif kind == 'array':
+        header = [str(i + 1) for i in range(width)]
+
+        def to_cells(element):
+            return [format_cell(value) for value in element[:width]]
+    else:
+        header = ['value']
+
+        def to_cells(element):
+            return [format_cell(element)]
+
+    def rows() -> Iterator[List[str]]:
+        for element in elements():
+            yield to_cells(element)
+
+    return render_rows([format_cell(h) for h in header], rows(), rows(), max_rows, max_chars)
+
+
+# XML
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iter_xml_records(stream: BinaryIO) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Yield (tag, fields) for every child of the document root. Fields are the
+    record's attributes (as ``@name``), its child elements' text and, for
+    leaf records, its own text. Processed elements are cleared as parsing goes.
+    """
+    stream.seek(0)
+    depth = 0
+    root = None
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        fields: Dict[str, str] = {}
+        for name, value in element.attrib.items():
+            fields[f"@{_local_name(name)}"] = value
+        children = list(element)
+        for child in children:
+            name = _local_name(child.tag)
+            value = (child.text or '').strip()
+            if not value and len(child):
+                value = ' '.join(t.strip() for t in child.itertext() if t.strip())
+            fields.setdefault(name, value)
+        if not children and (element.text or '').strip():
+            fields['#text'] = element.text.strip()
+        yield _local_name(element.tag), fields
+        root.clear()
+
+
+def xml_to_markdown(stream: BinaryIO, max_rows: int = MAX_ROWS, max_chars: int = MAX_OUTPUT_CHARS) -> str:
+    """
+    Render repeated child elements of the XML root as a markdown table.
+
+    Raises:
+        NotTabular: for feeds and documents without repeated records
+    """
+    stream.seek(0)
+    for _, element in iterparse(stream, events=('start',)):
+        root_tag = _local_name(element.tag).lower()
+        break
+    else:
+        raise NotTabular("Empty XML document")
+    if root_tag in ('rss', 'feed', 'rdf'):
+        raise NotTabular("XML feed")
+
+    tag_counts: Dict[str, int] = {}
+    for count, (tag, _) in enumerate(_iter_xml_records(stream)):
+        if count >= max_rows:
+            break
+        tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    if not tag_counts or max(tag_counts.values()) < 2:
+        raise NotTabular("XML document has no repeated records")
+    record_tag = max(tag_counts, key=tag_counts.get)
+
+    columns: Dict[str, None] = {}
+    for count, (tag, fields) in enumerate(_iter_xml_records(stream)):
+        if count >= max_rows:
+            break
+        if tag == record_tag:
+            for name in fields:
+                if len(columns) < MAX_COLUMNS:
+                    columns.setdefault(name, None)
+    header = list(columns)
+    if not header:
+        raise NotTabular("XML records carry no data")
+
+    def rows() -> Iterator[List[str]]:
+        for tag, fields in _iter_xml_records(stream):
+            if tag == record_tag:
+                yield [format_cell(fields.get(name)) for name in header]
+
+    table = render_rows([format_cell(h) for h in header], rows(), rows(), max_rows, max_chars)
+    return f"## {record_tag}\n\n{table}"
+
+
+# Registry entry points
+
+def convert_structured(content: bytes, extension: str, max_rows: Optional[int] = None,
+                       max_chars: Optional[int] = None, **options) -> str:
+    """
+    Convert CSV, JSON or XML content to a markdown table.
+
+    JSON that is not an array of rows is returned as a fenced block; XML without
+    repeated records (and RSS/Atom feeds) goes through MarkItDown.
+    """
+    stream = io.BytesIO(content)
+    max_rows = MAX_ROWS if max_rows is None else max_rows
+    max_chars = MAX_OUTPUT_CHARS if max_chars is None else max_chars
+    try:
+        if extension == 'csv':
+            return csv_to_markdown(stream, max_rows, max_chars)
+        if extension == 'json':
+            return json_to_markdown(stream, max_rows, max_chars)
+        return xml_to_markdown(stream, max_rows, max_chars)
+    except (NotTabular, ValueError, ParseError, csv.Error) as e:
+        logger.info("Falling back for .%s: %s", extension, e)
+
+    if extension == 'xml':
+        from .converters import convert_with_markitdown
+        return convert_with_markitdown(content, extension)
+    return convert_text(content, extension, max_chars=max_chars)
@@ -0,0 +1,111 @@
+"""
+In-process converters for plain-text formats.
+
+txt, md, py, js and json uploads are already (almost) markdown, so they are
+decoded and returned directly from the uploaded bytes - no temporary file and
+no MarkItDown dispatch. Source code is fenced with its language.
+"""
+import os
+import re
+import codecs
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = {'txt', 'md', 'py', 'js', 'json'}
+
+# Extensions rendered as fenced code blocks, with their fence language
+CODE_LANGUAGES = {
+    'py': 'python',
+    'js': 'javascript',
+    'json': 'json',
+}
+
+# Output cap in characters (default 2M); longer inputs are truncated with a notice
+MAX_OUTPUT_CHARS = int(os.getenv("TEXT_MAX_OUTPUT_CHARS", str(2 * 1024 * 1024)))
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+_BACKTICK_RUN = re.compile(r'`{3,}')
+
+
+def detect_encoding(content: bytes) -> str:
+    """
+    Detect the charset of text content.
+
+    Checks for a byte order mark, then strict UTF-8 (by far the common case),
+    then charset-normalizer when installed, falling back to cp1252.
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(content).best()
+        if best is not None and best.encoding:
+            return best.encoding
+    except ImportError:
+        pass
+
+    return 'cp1252'
+
+
+def decode_text(content: bytes, encoding: Optional[str] = None) -> str:
+    """Decode bytes to text, never failing on undecodable bytes."""
+    return content.decode(encoding or detect_encoding(content), errors='replace')
+
+
+def fence(text: str, language: str = '') -> str:
+    """Wrap text in a code fence longer than any backtick run it contains."""
+    longest = max((len(run) for run in _BACKTICK_RUN.findall(text)), default=2)
+    marker = '`' * max(3, longest + 1)
+    if not text.endswith('\n'):
+        text += '\n'
+    return f"{marker}{language}\n{text}{marker}"
+
+
+def truncate(text: str, max_chars: int):
+    """Cut text at a line boundary near max_chars. Returns (text, characters dropped)."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text, 0
+    cut = text.rfind('\n', 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut], len(text) - cut
+
+
+def convert_text(content: bytes, extension: str, max_chars: Optional[int] = None, **options) -> str:
+    """
+    Convert a plain-text upload to markdown.
+
+    Args:
+        content: File content as bytes
+        extension: File extension (without dot)
+        max_chars: Output cap in characters (default TEXT_MAX_OUTPUT_CHARS)
+
+    Returns:
+        Markdown text
+    """
+    text = decode_text(content).lstrip('\ufeff').replace('\r\n', '\n')
+    text, dropped = truncate(text, MAX_OUTPUT_CHARS if max_chars is None else max_chars)
+
+    language = CODE_LANGUAGES.get(extension)
+    if language is not None:
+        text = fence(text, language)
+    if dropped:
+        text += f"\n\n[... truncated {dropped} characters ...]\n"
+    return text
@@ -0,0 +1,326 @@
+"""
+Lightweight request tracing.
+
+``TracingMiddleware`` opens a root span per HTTP request (continuing an
+incoming W3C ``traceparent``), and code inside the request opens child spans
+with ``span(name, **attributes)`` or the ``traced(name)`` decorator. The
+current span lives in a context variable, so it follows the request across
+awaits and into ``asyncio.to_thread``. Process-pool tasks and outbound HTTP
+calls carry it explicitly: ``current_traceparent()`` gives the header value,
+and worker spans are shipped back with the task result and added to the
+request's trace.
+
+Each response gets a ``Server-Timing`` header with the summed duration of the
+request's spans per stage. Finished traces are exported when TRACE_EXPORT is
+set: ``file`` appends one JSON span per line to TRACE_FILE, ``otlp`` posts
+OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT. Export runs on a background thread.
+"""
+import os
+import json
+import time
+import queue
+import random
+import logging
+import functools
+import threading
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()  # "", "file" or "otlp"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "convflow-markdown")
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+
+def _new_id(nbytes: int) -> str:
+    return f"{random.getrandbits(nbytes * 8):0{nbytes * 2}x}"
+
+
+class Trace:
+    """Spans finished so far within one request (or one pool task)."""
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Dict[str, Any]] = []
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def finish(self) -> None:
+        duration = time.perf_counter() - self._start
+        self.trace.spans.append({
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.start_ns + int(duration * 1e9),
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        })
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """W3C traceparent into trace id, parent span id and sampled flag."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return {"trace_id": parts[1], "parent_id": parts[2], "sampled": bool(flags & 1)}
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """Root span of a new trace, or a continuation of ``traceparent``."""
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace = Trace(parent["trace_id"], parent["sampled"])
+        parent_id = parent["parent_id"]
+    else:
+        trace = Trace(_new_id(16), random.random() < TRACE_SAMPLE_RATE)
+        parent_id = None
+    with _enter(Span(trace, name, parent_id, attributes)) as root:
+        yield root
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _enter(Span(parent.trace, name, parent.span_id, attributes)) as child:
+        yield child
+
+
+@contextmanager
+def _enter(new: Span) -> Iterator[Span]:
+    token = _current_span.set(new)
+    try:
+        yield new
+    except BaseException as e:
+        new.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        new.finish()
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorator running an async function in a span."""
+    def decorate(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_spans(spans: List[Dict[str, Any]]) -> None:
+    """Attach spans recorded elsewhere (a pool worker) to the current trace."""
+    parent = _current_span.get()
+    if parent is not None and spans:
+        parent.trace.spans.extend(spans)
+
+
+def current_stages() -> List[Dict[str, Any]]:
+    """Name and duration of the spans finished so far in the current trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return []
+    return [{"name": item["name"], "duration_ms": item["duration_ms"]} for item in parent.trace.spans]
+
+
+def run_traced(traceparent: Optional[str], fn: Callable[..., T], *args: Any):
+    """Run fn as a child of ``traceparent`` (in a worker). Returns (result, spans)."""
+    if traceparent is None:
+        return fn(*args), []
+    name = f"worker.{getattr(fn, '__name__', 'task')}"
+    # On failure the worker's spans are lost; the parent's pool span still covers the time
+    with start_trace(name, traceparent, pid=os.getpid()) as root:
+        result = fn(*args)
+    return result, root.trace.spans
+
+
+def server_timing(spans: List[Dict[str, Any]], total_ms: float) -> str:
+    """Server-Timing value: summed duration per span name, then the total."""
+    stages: Dict[str, float] = {}
+    for item in spans:
+        if item["parent_id"] is not None:
+            stages[item["name"]] = stages.get(item["name"], 0.0) + item["duration_ms"]
+    entries = [f"{name};dur={duration:.1f}" for name, duration in stages.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class TraceExporter:
+    """Ships finished traces from a background thread, dropping them if the queue is full."""
+
+    def __init__(self, mode: str, path: str = TRACE_FILE, endpoint: str = TRACE_OTLP_ENDPOINT):
+        self.mode = mode
+        self.path = path
+        self.endpoint = endpoint
+        self.exported = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 50:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [item for trace in batch for item in trace]
+            try:
+                if self.mode == "otlp":
+                    self._post_otlp(spans)
+                else:
+                    self._append_file(spans)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning("Trace export failed: %s", e)
+
+    def _append_file(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for item in spans:
+                f.write(json.dumps(item, default=str) + "\n")
+
+    def _post_otlp(self, spans: List[Dict[str, Any]]) -> None:
+        body = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "convflow"}, "spans": [_otlp_span(item) for item in spans]}],
+        }]}).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+    def status(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "exported_traces": self.exported, "dropped_traces": self.dropped,
+                "queued": self._queue.qsize()}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(item: Dict[str, Any]) -> Dict[str, Any]:
+    otlp = {
+        "traceId": item["trace_id"],
+        "spanId": item["span_id"],
+        "name": item["name"],
+        "kind": 2 if item["name"].startswith("http.") else 1,  # server / internal
+        "startTimeUnixNano": str(item["start_ns"]),
+        "endTimeUnixNano": str(item["end_ns"]),
+        "attributes": [_otlp_attribute(k, v) for k, v in item["attributes"].items()],
+        "status": {"code": 2, "message": item["error"]} if item["error"] else {"code": 1},
+    }
+    if item["parent_id"]:
+        otlp["parentSpanId"] = item["parent_id"]
+    return otlp
+
+
+exporter: Optional[TraceExporter] = TraceExporter(TRACE_EXPORT) if TRACE_EXPORT in ("file", "otlp") else None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: root span per HTTP request, Server-Timing header, export.
+
+    Plain ASGI without Starlette imports, since pool workers import this module.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], server_timing: bool = TRACE_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]],
+                       send: Callable[..., Awaitable[None]]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = next((value.decode("latin-1") for name, value in scope.get("headers", [])
+                            if name.lower() == b"traceparent"), None)
+        with start_trace("http.request", traceparent, method=scope["method"], path=scope["path"]) as root:
+
+            async def send_with_timing(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    root.set_attribute("status_code", message["status"])
+                    if self.server_timing:
+                        total_ms = (time.perf_counter() - root._start) * 1000
+                        value = server_timing(root.trace.spans, total_ms)
+                        message["headers"] = [*message.get("headers", []),
+                                              (b"server-timing", value.encode("latin-1"))]
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        if exporter is not None and root.trace.sampled:
+            exporter.export(root.trace.spans)
@@ -0,0 +1,222 @@
+"""
+Streaming upload size enforcement.
+
+Rejects oversized or unsupported uploads before their body is buffered:
+``UploadLimitMiddleware`` checks ``Content-Length`` up front and then counts the
+request body chunk by chunk, following multipart part headers so per-file limits
+and file extensions are enforced while the body is still streaming in. Routes
+that report per-file errors themselves (batch conversion) get only the total
+budget, so one bad file does not fail the whole request.
+``read_upload`` reads an already parsed ``UploadFile`` in bounded chunks.
+"""
+import logging
+from typing import Iterable, Optional, Set
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
+# Allowance for multipart boundaries and part headers on top of the payload budget
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f}MB"
+
+
+class UploadRejected(HTTPException):
+    """Upload refused before (or while) its body was read."""
+
+
+class UploadTooLarge(UploadRejected):
+    def __init__(self, size: int, limit: int, what: str = "File"):
+        super().__init__(
+            status_code=413,
+            detail=f"{what} too large: {format_mb(size)} (max {limit / (1024 * 1024):.0f}MB)"
+        )
+        self.size = size
+        self.limit = limit
+
+
+class UnsupportedUpload(UploadRejected):
+    def __init__(self, extension: str, supported: Iterable[str]):
+        super().__init__(
+            status_code=400,
+            detail=f"Unsupported file type: {extension}. Supported types: {sorted(supported)}"
+        )
+        self.extension = extension
+
+
+def file_extension(filename: str) -> str:
+    return filename.split('.')[-1].lower() if '.' in filename else ''
+
+
+async def read_upload(file: UploadFile, max_size: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytes:
+    """
+    Read an uploaded file in bounded chunks, stopping as soon as it exceeds max_size.
+
+    Raises:
+        UploadTooLarge: if the file is larger than max_size
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > max_size:
+        raise UploadTooLarge(size, max_size)
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            raise UploadTooLarge(total, max_size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class _MultipartInspector:
+    """
+    Follows multipart part headers and part sizes without keeping any part data.
+
+    Fed the same body chunks the application receives; raises UploadRejected from
+    inside ``write`` as soon as a file part breaks a limit.
+    """
+
+    def __init__(self, boundary: bytes, max_file_size: Optional[int], allowed_extensions: Optional[Set[str]]):
+        self.max_file_size = max_file_size
+        self.allowed_extensions = allowed_extensions
+        self._header_field = b""
+        self._header_value = b""
+        self._filename: Optional[str] = None
+        self._part_size = 0
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def write(self, data: bytes) -> None:
+        self._parser.write(data)
+
+    def _on_part_begin(self) -> None:
+        self._filename = None
+        self._part_size = 0
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            filename = options.get(b"filename")
+            if filename is not None:
+                self._filename = filename.decode("utf-8", errors="replace")
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        if self._filename is None or self.allowed_extensions is None:
+            return
+        extension = file_extension(self._filename)
+        if extension not in self.allowed_extensions:
+            raise UnsupportedUpload(extension, self.allowed_extensions)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._filename is None or self.max_file_size is None:
+            return
+        self._part_size += end - start
+        if self._part_size > self.max_file_size:
+            raise UploadTooLarge(self._part_size, self.max_file_size)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware enforcing upload budgets on the given POST paths.
+
+    Memory held for a rejected request is bounded by the server's receive chunk
+    size: the request is refused from its Content-Length header when possible,
+    otherwise as soon as the streamed body crosses the per-file or total budget
+    or a file part with an unsupported extension starts. Without
+    ``max_file_size`` and ``allowed_extensions`` only the total is enforced.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: Iterable[str],
+        max_total_size: int,
+        max_file_size: Optional[int] = None,
+        allowed_extensions: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
+        self.paths = set(paths)
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        self.max_body_size = max_total_size + MULTIPART_OVERHEAD
+        self.allowed_extensions = set(allowed_extensions) if allowed_extensions is not None else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            await self._reject(scope, receive, send, UploadTooLarge(int(content_length), self.max_total_size, "Upload"))
+            return
+
+        inspector = None
+        content_type, options = parse_options_header(headers.get("content-type", ""))
+        per_file = self.max_file_size is not None or self.allowed_extensions is not None
+        if per_file and content_type == b"multipart/form-data" and b"boundary" in options:
+            inspector = _MultipartInspector(options[b"boundary"], self.max_file_size, self.allowed_extensions)
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if received > self.max_body_size:
+                    raise UploadTooLarge(received, self.max_total_size, "Upload")
+                if inspector is not None and body:
+                    inspector.write(body)
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadRejected as exc:
+            if response_started:
+                raise
+            await self._reject(scope, receive, send, exc)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, exc: UploadRejected) -> None:
+        logger.info("Rejected upload to %s: %s", scope['path'], exc.detail)
+        response = JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        await response(scope, receive, send)
@@ -0,0 +1,31 @@
+"""Module-level tasks for the conversion pool tests (spawned workers import them by name)."""
+import os
+import time
+import signal
+
+
+def worker_pid() -> int:
+    return os.getpid()
+
+
+def nap(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def spin(seconds: float) -> int:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+    return os.getpid()
+
+
+def stuck(seconds: float) -> int:
+    # Like native code that never returns to the interpreter: the interrupt is never handled
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGUSR1])
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash() -> None:
+    os._exit(1)
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from src.services.admission import AdmissionController, AdmissionMiddleware, cost_class  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def test_cost_classes_by_extension():
+    assert cost_class("PDF") == "pdf"
+    assert cost_class("csv") == "text"
+    assert cost_class("unknown") == "office"
+
+
+def test_estimate_scales_with_size():
+    controller = AdmissionController(capacity=1)
+    assert controller.estimate("pdf", 5 * MB) == ("pdf", pytest.approx(0.5 + 2.5 * 5))
+    assert controller.estimate("txt", 0) == ("text", pytest.approx(0.05))
+
+
+def test_idle_server_admits_anything():
+    controller = AdmissionController(capacity=1, target_delay=10)
+    assert controller.try_admit(1000) is None
+
+
+def test_rejects_past_the_target_delay_with_a_bounded_retry_after():
+    controller = AdmissionController(capacity=2, target_delay=10, max_retry_after=60)
+    assert controller.try_admit(30) is None
+    # 15s of backlog: 5s over the target
+    assert controller.try_admit(1) == 5
+    assert controller.try_admit(1000) == 5
+    assert controller.rejected == 2
+
+    controller.in_flight_cost = 1000
+    assert controller.try_admit(1) == 60
+
+
+def test_release_frees_the_backlog():
+    controller = AdmissionController(capacity=1, target_delay=10)
+    controller.try_admit(30)
+    controller.release(30)
+    assert controller.in_flight == 0
+    assert controller.queue_delay() == 0
+    assert controller.try_admit(1) is None
+
+
+def test_release_learns_from_requests_that_ran_alone():
+    controller = AdmissionController(capacity=1, smoothing=0.1)
+    _, cost = controller.estimate("pdf", 2 * MB)
+    controller.try_admit(cost)
+    controller.release(cost, "pdf", elapsed=cost * 2)
+    assert controller.correction["pdf"] == pytest.approx(1.1)
+    assert controller.estimate("pdf", 2 * MB)[1] == pytest.approx(cost * 1.1)
+
+
+BODY = b'filename="notes.txt"\r\n...filename="scan.pdf"\r\n...'
+
+
+def call(middleware, content_length: int):
+    """Send one POST through the middleware; returns (response start message, body reads)."""
+    sent, reads = [], []
+
+    async def receive():
+        reads.append(True)
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/convert",
+        "headers": [(b"content-length", str(content_length).encode())],
+    }
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0], len(reads)
+
+
+def test_middleware_rejects_without_reading_the_body():
+    async def app(scope, receive, send):
+        raise AssertionError("a refused request must not reach the app")
+
+    controller = AdmissionController(capacity=1, target_delay=10)
+    # Hold a slot so the next request sees a backlog of one 20MB PDF
+    controller.try_admit(controller.estimate("pdf", 20 * MB)[1])
+    response, reads = call(AdmissionMiddleware(app, controller, ["/convert"]), 20 * MB)
+    assert response["status"] == 503
+    assert (b"retry-after", b"41") in response["headers"]
+    assert reads == 0
+
+
+def test_middleware_refines_the_estimate_from_the_first_chunk():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["before"] = controller.in_flight_cost
+        seen["message"] = await receive()
+        seen["after"] = controller.in_flight_cost
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController(capacity=1, target_delay=10)
+    by_size, as_pdf = controller.estimate("", 4 * MB)[1], controller.estimate("pdf", 4 * MB)[1]
+    response, reads = call(AdmissionMiddleware(app, controller, ["/convert"]), 4 * MB)
+    assert response["status"] == 200
+    assert reads == 1
+    # Admitted on size alone, then charged as the most expensive file in the upload
+    assert seen["before"] == pytest.approx(by_size)
+    assert seen["after"] == pytest.approx(as_pdf)
+    assert seen["message"]["body"] == BODY
+    assert controller.in_flight == 0
+    assert controller.in_flight_cost == 0
+
+
+def test_middleware_caps_the_claimed_size():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["cost"] = controller.in_flight_cost
+        await send({"type": "http.response.start", "status": 413, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController(capacity=1, target_delay=10)
+    capped = controller.estimate("", 20 * MB)[1]
+    call(AdmissionMiddleware(app, controller, ["/convert"], max_size=20 * MB), 10 * 1024 * MB)
+    assert seen["cost"] == pytest.approx(capped)
+    assert controller.in_flight_cost == 0
@@ -0,0 +1,29 @@
+import pickle
+
+import pytest
+
+from src.services.audio_preprocessing import OffsetMap
+
+
+def test_times_map_back_across_removed_silence():
+    # 0-5s kept, 3s of silence cut, then the rest from 8s in the original
+    offsets = OffsetMap([(0.0, 0.0), (5.0, 8.0)], removed_seconds=3.0)
+    assert offsets.to_source(2.0) == pytest.approx(2.0)
+    assert offsets.to_source(5.0) == pytest.approx(8.0)
+    assert offsets.to_source(6.5) == pytest.approx(9.5)
+
+
+def test_leading_silence_shifts_everything():
+    offsets = OffsetMap([(0.0, 1.5)], removed_seconds=1.5)
+    assert offsets.to_source(0.0) == pytest.approx(1.5)
+    assert offsets.to_source(10.0) == pytest.approx(11.5)
+
+
+def test_without_spans_times_are_unchanged():
+    assert OffsetMap([]).to_source(4.2) == pytest.approx(4.2)
+
+
+def test_offset_map_crosses_the_worker_pool():
+    offsets = pickle.loads(pickle.dumps(OffsetMap([(0.0, 0.0), (5.0, 8.0)], 3.0)))
+    assert offsets.to_source(6.0) == pytest.approx(9.0)
+    assert offsets.removed_seconds == 3.0
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from src.services.client_rate_limit import (  # noqa: E402
+    ClientRateLimiter, ClientRateLimitMiddleware, RateLimitDecision, parse_networks,
+)
+
+PROXIES = parse_networks("127.0.0.1,10.0.0.0/8")
+
+
+def scope(peer: str = "203.0.113.7", forwarded: str = "", token: str = "", path: str = "/convert") -> dict:
+    headers = []
+    if forwarded:
+        headers.append((b"x-forwarded-for", forwarded.encode()))
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {"type": "http", "method": "POST", "path": path, "client": (peer, 50000), "headers": headers}
+
+
+def limiter(**kwargs) -> ClientRateLimiter:
+    return ClientRateLimiter({"anonymous": 2, "premium": 120}, PROXIES, **kwargs)
+
+
+def test_parse_networks_skips_invalid_entries():
+    assert [str(network) for network in parse_networks("127.0.0.1, nonsense,10.0.0.0/8")] == [
+        "127.0.0.1/32", "10.0.0.0/8",
+    ]
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers():
+    assert limiter().identify(scope(forwarded="198.51.100.1")) == ("ip:203.0.113.7", "anonymous")
+
+
+def test_forwarded_for_is_walked_right_to_left_through_trusted_proxies():
+    # The leftmost entry is whatever the client claimed; the first untrusted hop is the client
+    request = scope(peer="127.0.0.1", forwarded="1.2.3.4, 198.51.100.1, 10.0.0.5")
+    assert limiter().identify(request)[0] == "ip:198.51.100.1"
+
+
+def test_forwarded_for_made_only_of_proxies_gives_the_leftmost_hop():
+    assert limiter().identify(scope(peer="127.0.0.1", forwarded="10.0.0.9, 10.0.0.5"))[0] == "ip:10.0.0.9"
+
+
+def test_trusted_peer_without_forwarded_for_is_the_client():
+    assert limiter().identify(scope(peer="127.0.0.1"))[0] == "ip:127.0.0.1"
+
+
+def test_unverified_token_is_limited_by_ip():
+    assert limiter().identify(scope(token="forged")) == ("ip:203.0.113.7", "anonymous")
+
+
+def test_verified_token_is_limited_by_user_and_plan():
+    rate_limiter = limiter()
+    rate_limiter.remember_token("secret", "42", "premium")
+    assert rate_limiter.identify(scope(token="secret")) == ("user:42", "premium")
+
+
+def test_verified_token_expires():
+    rate_limiter = limiter(token_ttl=-1)
+    rate_limiter.remember_token("secret", "42", "premium")
+    assert rate_limiter.identify(scope(token="secret"))[0] == "ip:203.0.113.7"
+
+
+def test_local_buckets_refuse_past_the_limit():
+    async def main():
+        rate_limiter = limiter()
+        decisions = [await rate_limiter.check("ip:203.0.113.7", "anonymous") for _ in range(3)]
+        other = await rate_limiter.check("ip:198.51.100.1", "anonymous")
+        return decisions, other
+
+    decisions, other = asyncio.run(main())
+    assert [decision.allowed for decision in decisions] == [True, True, False]
+    assert decisions[-1].retry_after == 30
+    assert other.allowed
+
+
+def test_tracked_clients_are_bounded():
+    async def main():
+        rate_limiter = limiter(max_keys=2)
+        for client in ("a", "b", "c"):
+            await rate_limiter.check(f"ip:{client}", "anonymous")
+        return rate_limiter.status()["tracked_clients"]
+
+    assert asyncio.run(main()) == 2
+
+
+def test_decision_headers():
+    allowed = dict(RateLimitDecision(True, 10, 9.5, 10 / 60).headers())
+    assert allowed[b"ratelimit-limit"] == b"10"
+    assert allowed[b"ratelimit-remaining"] == b"9"
+    assert allowed[b"ratelimit-reset"] == b"3"
+    assert allowed[b"ratelimit-policy"] == b"10;w=60"
+    assert b"retry-after" not in allowed
+
+    refused = dict(RateLimitDecision(False, 10, 0.5, 10 / 60).headers())
+    assert refused[b"ratelimit-remaining"] == b"0"
+    assert refused[b"retry-after"] == b"3"
+
+
+def test_middleware_refuses_with_429_and_passes_other_routes():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def request(middleware, path):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope(path=path), receive, send)
+        return sent[0]
+
+    async def main():
+        middleware = ClientRateLimitMiddleware(app, limiter(), ["/convert"])
+        return [await request(middleware, "/convert") for _ in range(3)] + [await request(middleware, "/health")]
+
+    first, second, refused, health = asyncio.run(main())
+    assert first["status"] == second["status"] == 200
+    assert (b"ratelimit-remaining", b"1") in first["headers"]
+    assert refused["status"] == 429
+    assert (b"retry-after", b"30") in refused["headers"]
+    assert health["status"] == 200
+    assert calls == ["/convert", "/convert", "/health"]
@@ -0,0 +1,120 @@
+import os
+import signal
+import asyncio
+
+import pytest
+
+import pool_tasks
+from src.services import conversion_pool as pool_module
+from src.services.conversion_pool import ConversionPool, ConversionTimeout, WorkerCrashed, set_deadline, time_budget
+from src.services.scheduler import set_lane
+
+needs_signals = pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="interrupts need SIGUSR1")
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(pool_module, "CONVERSION_INTERRUPT_GRACE_SECONDS", 0.5)
+    pool = ConversionPool(workers=2, memory_mb=0)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def run(coroutine):
+    async def main():
+        # Anonymous is capped at half the workers; these tests need both
+        set_lane("premium")
+        return await coroutine
+
+    return asyncio.run(main())
+
+
+def test_time_budget_follows_the_request_deadline():
+    async def main():
+        assert time_budget() == pool_module.CONVERSION_TIMEOUT_SECONDS
+        set_deadline(2)
+        assert 1.5 < time_budget() <= 2
+
+    asyncio.run(main())
+
+
+def test_expired_deadline_fails_before_queueing():
+    async def main():
+        set_deadline(-1)
+        with pytest.raises(ConversionTimeout):
+            await ConversionPool(workers=0).run(pool_tasks.nap, 0)
+
+    asyncio.run(main())
+
+
+def test_thread_mode_stops_waiting_at_the_deadline():
+    async def main():
+        set_deadline(0.2)
+        with pytest.raises(ConversionTimeout):
+            await ConversionPool(workers=0).run(pool_tasks.nap, 1)
+
+    asyncio.run(main())
+
+
+def test_runs_task_in_a_worker_process(pool):
+    assert run(pool.run(pool_tasks.worker_pid)) != os.getpid()
+
+
+@needs_signals
+def test_timeout_interrupts_only_the_overrunning_task(pool):
+    async def main():
+        await asyncio.gather(pool.run(pool_tasks.nap, 0.1), pool.run(pool_tasks.nap, 0.1))
+        neighbour = asyncio.create_task(pool.run(pool_tasks.nap, 1.5))
+        await asyncio.sleep(0.1)
+        set_deadline(0.5)
+        with pytest.raises(ConversionTimeout):
+            await pool.run(pool_tasks.spin, 30)
+        return await neighbour
+
+    assert run(main())
+    assert pool.interrupts == 1
+    assert pool.restarts == 0
+    # The interrupted worker is free again
+    assert run(pool.run(pool_tasks.nap, 0))
+
+
+@needs_signals
+def test_task_ignoring_its_interrupt_gets_the_pool_replaced(pool):
+    async def main():
+        await asyncio.gather(pool.run(pool_tasks.nap, 0.1), pool.run(pool_tasks.nap, 0.1))
+        collateral = asyncio.create_task(pool.run(pool_tasks.nap, 3))
+        await asyncio.sleep(0.1)
+        set_deadline(0.5)
+        with pytest.raises(ConversionTimeout):
+            await pool.run(pool_tasks.stuck, 30)
+        # Killed along with the stuck task's worker, then run again on the new pool
+        return await collateral
+
+    assert run(main())
+    assert pool.restarts == 1
+
+
+@needs_signals
+def test_cancel_interrupts_the_running_task(pool):
+    async def main():
+        task = asyncio.create_task(pool.run(pool_tasks.spin, 30))
+        await asyncio.sleep(1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert pool.scheduler.in_flight == 0
+        # The pool answers again well before the spin would have ended
+        return await asyncio.wait_for(
+            asyncio.gather(pool.run(pool_tasks.nap, 0.1), pool.run(pool_tasks.nap, 0.1)), 5
+        )
+
+    assert all(run(main()))
+    assert pool.interrupts == 1
+    assert pool.restarts == 0
+
+
+def test_crashed_worker_fails_the_task_and_pool_recovers(pool):
+    with pytest.raises(WorkerCrashed):
+        run(pool.run(pool_tasks.crash))
+    assert pool.restarts == 1
+    assert run(pool.run(pool_tasks.nap, 0))
@@ -0,0 +1,94 @@
+import json
+import asyncio
+
+import pytest
+
+from src.services import flight_recorder as recorder_module
+from src.services.flight_recorder import FlightRecorder, _Watch, set_subject
+
+MB = 1024 * 1024
+
+
+def report(wall_seconds: float = 0.1, peak_rss: int = 100 * MB, growth: int = 0) -> dict:
+    return {"wall_seconds": wall_seconds, "peak_rss_bytes": peak_rss, "rss_growth_bytes": growth, "stacks": ""}
+
+
+def fake_rss(monkeypatch, values):
+    readings = iter(values)
+    last = [values[0]]
+
+    def current_rss():
+        last[0] = next(readings, last[0])
+        return last[0]
+
+    monkeypatch.setattr(recorder_module, "current_rss", current_rss)
+
+
+def test_watch_reports_growth_over_a_high_baseline(monkeypatch):
+    # A long-lived worker already at 2GB that does not grow while converting
+    fake_rss(monkeypatch, [2048 * MB])
+    with _Watch(interval=0.01) as watch:
+        pass
+    assert watch.report()["peak_rss_bytes"] == 2048 * MB
+    assert watch.report()["rss_growth_bytes"] == 0
+
+    recorder = FlightRecorder(directory="unused", rss_bytes=1024 * MB)
+    assert recorder.triggers([watch.report()], None) == []
+
+
+def test_watch_reports_growth_during_the_block(monkeypatch):
+    fake_rss(monkeypatch, [2048 * MB, 3500 * MB])
+    with _Watch(interval=0.01) as watch:
+        pass
+    assert watch.report()["rss_growth_bytes"] == 1452 * MB
+
+    recorder = FlightRecorder(directory="unused", rss_bytes=1024 * MB)
+    assert recorder.triggers([watch.report()], None) == ["rss"]
+
+
+def test_wall_time_is_summed_over_worker_runs():
+    recorder = FlightRecorder(directory="unused", wall_seconds=10)
+    assert recorder.triggers([report(6), report(3)], None) == []
+    assert recorder.triggers([report(6), report(5)], None) == ["wall_time"]
+    # No reports (e.g. the worker died): only the error counts
+    assert recorder.triggers([], None) == []
+
+
+def test_worker_errors_trigger():
+    recorder = FlightRecorder(directory="unused")
+    assert recorder.triggers([], MemoryError()) == ["memory_error"]
+    assert recorder.triggers([], ValueError()) == []
+
+
+@pytest.mark.parametrize("subject, expected", [
+    (None, False),
+    (("7", "someone@example.com"), True),
+    (("42", "someone@example.com"), False),
+    (("7", "someone@private.example"), False),
+])
+def test_allowed_honours_opt_outs_and_anonymous(subject, expected):
+    recorder = FlightRecorder(directory="unused", opt_out="42,@private.example", record_anonymous=False)
+
+    async def main():
+        set_subject(*(subject or (None,)))
+        return recorder.allowed()
+
+    assert asyncio.run(main()) is expected
+
+
+def test_observe_quarantines_the_input(tmp_path):
+    recorder = FlightRecorder(directory=str(tmp_path), wall_seconds=1)
+
+    async def main():
+        set_subject("7", "someone@example.com")
+        recorder.observe(b"slow input", "txt", {}, 3.0, [report(2.5)], [])
+        await asyncio.gather(*recorder._pending)
+
+    asyncio.run(main())
+    [entry] = recorder.list()
+    assert entry["reasons"] == ["wall_time"]
+    with open(tmp_path / entry["id"] / "meta.json") as f:
+        meta = json.load(f)
+    assert meta["wall_seconds"] == 2.5
+    assert meta["elapsed_seconds"] == 3.0
+    assert meta["rss_growth_bytes"] == 0
@@ -0,0 +1,80 @@
+import asyncio
+
+from src.services.outbound import Hedger
+
+
+def make_hedger(budget: float = 1.0, min_samples: int = 2) -> Hedger:
+    # Hedge anything slower than the fastest recent call (10ms)
+    hedger = Hedger("test", budget=budget, percentile=0.0, min_samples=min_samples, min_delay=0.01)
+    for _ in range(min_samples):
+        hedger.latencies.add(0.01)
+    return hedger
+
+
+class Upstream:
+    """Answers each call after its scripted delay, recording cancelled calls."""
+
+    def __init__(self, *delays: float, results=None):
+        self.delays = list(delays)
+        self.results = list(results or [f"answer {i}" for i in range(len(delays))])
+        self.calls = 0
+        self.cancelled = []
+
+    async def __call__(self):
+        call = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[call])
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        return self.results[call]
+
+
+def test_fast_calls_are_not_hedged():
+    hedger, upstream = make_hedger(), Upstream(0)
+    assert asyncio.run(hedger.run(upstream)) == "answer 0"
+    assert upstream.calls == 1 and hedger.hedged == 0
+
+
+def test_no_hedging_before_enough_samples():
+    hedger = Hedger("test", budget=1.0, min_samples=5)
+    upstream = Upstream(0.05)
+    assert asyncio.run(hedger.run(upstream)) == "answer 0"
+    assert hedger.threshold() is None
+    assert upstream.calls == 1
+
+
+def test_backup_call_wins_and_the_slow_one_is_cancelled():
+    hedger, upstream = make_hedger(), Upstream(5, 0)
+
+    async def main():
+        result = await asyncio.wait_for(hedger.run(upstream), 1)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "answer 1"
+    assert upstream.cancelled == [0]
+    assert hedger.hedged == 1 and hedger.hedge_wins == 1
+
+
+def test_failed_backup_waits_for_the_primary():
+    hedger, upstream = make_hedger(), Upstream(0.05, 0, results=["primary", None])
+    assert asyncio.run(hedger.run(upstream)) == "primary"
+    assert upstream.cancelled == []
+    assert hedger.hedged == 1 and hedger.hedge_wins == 0
+
+
+def test_hedges_are_paid_from_the_budget():
+    hedger = make_hedger(budget=0.5)
+
+    async def main():
+        for _ in range(4):
+            await hedger.run(Upstream(0.03, 0.03))
+
+    asyncio.run(main())
+    # Half a token per request: every second slow call may hedge
+    assert hedger.requests == 4
+    assert hedger.hedged == 2
+    assert hedger.budget_exhausted == 2
+    assert hedger.status()["hedge_rate"] == 0.5
@@ -0,0 +1,75 @@
+import random
+import asyncio
+import sqlite3
+
+from src.services.image_cache import BKTree, ImageAnalysisCache, hamming
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(1 << 63, 0) == 1
+
+
+def test_nearest_prefers_exact_then_closest():
+    tree = BKTree()
+    for value in (0b0000, 0b0111, 0b1111, 0b0001):
+        tree.add(value)
+    assert tree.nearest(0b0111, 3) == (0b0111, 0)
+    assert tree.nearest(0b0011, 3) in ((0b0111, 1), (0b0001, 1))
+    assert tree.nearest(0b1111_0000, 2) is None
+
+
+def test_duplicates_are_stored_once():
+    tree = BKTree()
+    for _ in range(3):
+        tree.add(42)
+    assert tree.size == 1
+
+
+def test_empty_tree_finds_nothing():
+    assert BKTree().nearest(0, 64) is None
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Near-duplicates of some stored hashes, as re-encoded images produce
+    queries = [value ^ (1 << rng.randrange(64)) for value in values[:50]] + [rng.getrandbits(64) for _ in range(50)]
+    tree = BKTree()
+    for value in values:
+        tree.add(value)
+
+    for query in queries:
+        distance = min(hamming(query, value) for value in values)
+        found = tree.nearest(query, 10)
+        if distance > 10:
+            assert found is None
+        else:
+            assert found is not None and found[1] == distance
+            assert hamming(query, found[0]) == distance
+
+
+def test_near_duplicate_hits_the_cache():
+    cache = ImageAnalysisCache(max_distance=4, max_entries=10)
+    asyncio.run(cache.put(0xF0F0, "a cat"))
+    assert cache.get(0xF0F0 ^ 0b101) == "a cat"
+    assert cache.get(0x0F0F) is None
+    assert (cache.exact_hits, cache.near_hits) == (0, 1)
+
+
+def test_store_is_bounded_and_reloads_the_newest_entries(tmp_path):
+    path = str(tmp_path / "images.db")
+    cache = ImageAnalysisCache(max_entries=20, path=path)
+
+    async def fill():
+        for value in range(200):
+            await cache.put((value << 40) | (1 << 63), f"image {value}")
+
+    asyncio.run(fill())
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM image_analysis").fetchone()[0]
+    assert rows <= 20 + 2
+    assert len(cache._entries) <= 20
+
+    reloaded = ImageAnalysisCache(max_distance=0, max_entries=20, path=path)
+    assert reloaded.get((199 << 40) | (1 << 63)) == "image 199"
+    assert reloaded.get(1 << 63) is None
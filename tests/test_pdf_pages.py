@@ -0,0 +1,26 @@
+import pytest
+
+from src.services.converters import InvalidConversionOptions
+from src.services.pdf_converter import format_page_spec, parse_page_spec
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1-3,5", [0, 1, 2, 4]),
+    ("8-", [7, 8, 9]),
+    ("-2", [0, 1]),
+    ("3, 1,3", [0, 2]),
+    ("9-20", [8, 9]),
+])
+def test_parse_page_spec(spec, expected):
+    assert parse_page_spec(spec, 10) == expected
+
+
+@pytest.mark.parametrize("spec", ["", ",", "a", "2-x", "3-1", "0", "11", "11-12"])
+def test_parse_page_spec_rejects_bad_specs(spec):
+    with pytest.raises(InvalidConversionOptions):
+        parse_page_spec(spec, 10)
+
+
+def test_format_page_spec_is_the_inverse():
+    assert format_page_spec([0, 1, 2, 4, 7, 8]) == "1-3,5,8-9"
+    assert parse_page_spec(format_page_spec([0, 1, 2, 4, 7, 8]), 10) == [0, 1, 2, 4, 7, 8]
@@ -0,0 +1,56 @@
+import time
+import asyncio
+import threading
+
+import pool_tasks
+from src.services.conversion_pool import ConversionPool
+from src.services.profiling import SamplingProfiler, profile_for, sign_profile_token, verify_profile_token
+from src.services.scheduler import set_lane
+
+
+def busy(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_sampler_can_follow_one_thread():
+    worker = threading.Thread(target=busy, args=(0.3,), name="busy-thread")
+    profiler = SamplingProfiler(0.005, threading.get_ident(), "only-me")
+    worker.start()
+    profiler.start()
+    busy(0.2)
+    collapsed = profiler.stop()
+    worker.join()
+    assert profiler.samples > 0
+    assert all(line.startswith("only-me;") for line in collapsed.splitlines())
+    assert "busy-thread" not in collapsed
+    assert SamplingProfiler.active is None
+
+
+def test_profile_session_includes_conversions_in_pool_workers():
+    pool = ConversionPool(workers=1, memory_mb=0)
+    pool.start()
+
+    async def main():
+        set_lane("premium")
+        # Warm the worker up so the profiled window covers the conversion itself
+        await pool.run(pool_tasks.nap, 0)
+        profiler, _ = await asyncio.gather(profile_for(1.0, 0.005), pool.run(pool_tasks.spin, 0.5))
+        return profiler
+
+    try:
+        collapsed = asyncio.run(main()).collapsed()
+    finally:
+        pool.shutdown()
+    worker_stacks = [line for line in collapsed.splitlines() if line.startswith("worker-")]
+    assert worker_stacks
+    assert any("spin (pool_tasks.py" in line for line in worker_stacks)
+
+
+def test_profile_tokens_expire_and_need_the_secret():
+    token = sign_profile_token(int(time.time()) + 60, "secret")
+    assert verify_profile_token(token, "secret")
+    assert not verify_profile_token(token, "other")
+    assert not verify_profile_token(token, "")
+    assert not verify_profile_token(sign_profile_token(int(time.time()) - 1, "secret"), "secret")
@@ -0,0 +1,98 @@
+import time
+import asyncio
+
+import pytest
+
+from src.services.rate_limit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_try_acquire_drains_and_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (False, 1.0)
+
+    clock.now += 1
+    assert bucket.try_acquire() == (True, 0.0)
+
+    clock.now += 60
+    assert bucket.remaining == 2
+    assert bucket.reset_after() == 0.0
+
+
+def test_zero_rate_never_refills():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert bucket.try_acquire()[0]
+    assert bucket.try_acquire() == (False, float("inf"))
+    assert not asyncio.run(bucket.acquire(timeout=1))
+
+
+def test_acquire_serves_waiters_in_arrival_order():
+    async def main():
+        bucket = TokenBucket(rate=50, capacity=1)
+        order = []
+
+        async def caller(index):
+            await bucket.acquire()
+            order.append(index)
+
+        await asyncio.gather(*(caller(index) for index in range(5)))
+        return order
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+
+
+def test_acquire_timeout_bounds_the_whole_wait():
+    async def main():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        start = time.monotonic()
+        granted = await bucket.acquire(timeout=0.2)
+        return granted, time.monotonic() - start, bucket
+
+    granted, elapsed, bucket = asyncio.run(main())
+    assert not granted
+    # A wait that cannot fit the timeout is refused up front, without reserving
+    assert elapsed < 0.1
+    assert bucket.tokens >= 0
+    assert bucket.waiting == 0
+
+
+def test_cancelled_waiter_returns_its_reservation():
+    async def main():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0.05)
+        assert bucket.tokens < 0
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return bucket
+
+    bucket = asyncio.run(main())
+    assert bucket.tokens >= 0
+    assert bucket.waiting == 0
+
+
+def test_pause_holds_back_callers():
+    async def main():
+        bucket = TokenBucket(rate=100, capacity=10)
+        bucket.pause(0.3)
+        refused = await bucket.acquire(timeout=0.1)
+        start = time.monotonic()
+        granted = await bucket.acquire()
+        return refused, granted, time.monotonic() - start
+
+    refused, granted, waited = asyncio.run(main())
+    assert not refused
+    assert granted
+    assert waited == pytest.approx(0.3, abs=0.1)
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from src.services.resilience import AdaptiveLimiter, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    assert breaker.status()["retry_in_seconds"] == 30
+
+
+def test_breaker_half_open_probe_closes_it():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_failed_probe_reopens_it():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=30, clock=clock)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    # The cool-down starts over from the failed probe
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_breaker_ignored_probe_lets_another_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def _call(limiter: AdaptiveLimiter, latency: float, overloaded: bool = False) -> None:
+    assert asyncio.run(limiter.acquire())
+    limiter.release(latency, overloaded)
+
+
+def test_limit_grows_additively_while_used():
+    limiter = AdaptiveLimiter("test", initial=2, maximum=3, clock=FakeClock())
+    _call(limiter, 0.1)
+    assert limiter.long_latency == 0.1
+
+    # One slot of two is in use: enough to count as using the limit
+    _call(limiter, 0.1)
+    assert limiter.limit == 2.5
+    for _ in range(20):
+        _call(limiter, 0.1)
+    assert limiter.limit == 3
+
+
+def test_unused_limit_does_not_grow():
+    limiter = AdaptiveLimiter("test", initial=8, clock=FakeClock())
+    for _ in range(5):
+        _call(limiter, 0.1)
+    assert limiter.limit == 8
+
+
+@pytest.mark.parametrize("latency, overloaded", [(0.5, False), (None, True)])
+def test_limit_shrinks_multiplicatively_once_per_round_trip(latency, overloaded):
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("test", initial=10, minimum=2, backoff=0.5, tolerance=2.0, clock=clock)
+    _call(limiter, 0.1)
+
+    _call(limiter, latency, overloaded)
+    assert limiter.limit == 5
+    # Same burst: within one baseline latency of the last decrease
+    clock.now += 0.05
+    _call(limiter, latency, overloaded)
+    assert limiter.limit == 5
+
+    clock.now += 1
+    _call(limiter, latency, overloaded)
+    assert limiter.limit == 2.5
+    clock.now += 1
+    _call(limiter, latency, overloaded)
+    assert limiter.limit == 2
+
+
+def test_waiters_get_freed_slots_or_time_out():
+    async def main():
+        limiter = AdaptiveLimiter("test", initial=1, max_wait=5, clock=FakeClock())
+        assert await limiter.acquire()
+        assert not await limiter.acquire(timeout=0.01)
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        limiter.release(None)
+        assert await waiter
+        assert limiter.in_flight == 1 and limiter.waiting == 0
+
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import asyncio
+
+from src.services.scheduler import FairScheduler, parse_lane_values
+
+
+async def _settle() -> None:
+    # Let every ready task run up to its next await
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def _grant_order(scheduler: FairScheduler, lanes: list, blocker: str) -> list:
+    """Queue one task per entry of ``lanes`` behind a held slot and return the order they ran in."""
+    order = []
+
+    async def task(lane: str) -> None:
+        await scheduler.acquire(lane)
+        order.append(lane)
+        await asyncio.sleep(0)
+        scheduler.release(lane)
+
+    await scheduler.acquire(blocker)
+    tasks = [asyncio.create_task(task(lane)) for lane in lanes]
+    await _settle()
+    scheduler.release(blocker)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_parse_lane_values_skips_malformed_entries():
+    assert parse_lane_values("anonymous=1, premium=4,broken,bad=x") == {"anonymous": 1.0, "premium": 4.0}
+
+
+def test_lane_alone_gets_every_slot():
+    async def main():
+        scheduler = FairScheduler(4, {"anonymous": 1, "premium": 4})
+        for _ in range(4):
+            await asyncio.wait_for(scheduler.acquire("anonymous"), 1)
+        assert scheduler.in_flight == 4
+
+    asyncio.run(main())
+
+
+def test_busy_lanes_share_slots_by_weight():
+    async def main():
+        scheduler = FairScheduler(1, {"basic": 1, "premium": 4})
+        order = await _grant_order(scheduler, ["basic"] * 5 + ["premium"] * 5, blocker="basic")
+        assert order[:5].count("premium") == 4
+        assert sorted(order) == ["basic"] * 5 + ["premium"] * 5
+
+    asyncio.run(main())
+
+
+def test_busy_lane_does_not_starve_a_newcomer():
+    async def main():
+        scheduler = FairScheduler(1, {"anonymous": 1, "basic": 1})
+        order = await _grant_order(scheduler, ["basic"] * 8 + ["anonymous"], blocker="basic")
+        assert order.index("anonymous") <= 1
+
+    asyncio.run(main())
+
+
+def test_capped_lane_leaves_slots_to_others():
+    async def main():
+        scheduler = FairScheduler(4, {"anonymous": 1, "premium": 4}, {"anonymous": 0.5})
+        queued = [asyncio.create_task(scheduler.acquire("anonymous")) for _ in range(3)]
+        await _settle()
+        assert scheduler.status()["lanes"]["anonymous"]["in_flight"] == 2
+        assert scheduler.status()["lanes"]["anonymous"]["queued"] == 1
+
+        await asyncio.wait_for(scheduler.acquire("premium"), 1)
+        await asyncio.wait_for(scheduler.acquire("premium"), 1)
+        assert scheduler.in_flight == 4
+
+        scheduler.release("anonymous")
+        await asyncio.gather(*queued)
+        assert scheduler.status()["lanes"]["anonymous"]["in_flight"] == 2
+
+    asyncio.run(main())
+
+
+def test_unknown_lane_gets_weight_one():
+    async def main():
+        scheduler = FairScheduler(1, {"anonymous": 1})
+        await asyncio.wait_for(scheduler.acquire("enterprise"), 1)
+        assert scheduler.status()["lanes"]["enterprise"]["weight"] == 1.0
+
+    asyncio.run(main())
+
+
+def test_cancel_while_queued_drops_the_waiter():
+    async def main():
+        scheduler = FairScheduler(1, {"anonymous": 1})
+        await scheduler.acquire("anonymous")
+        waiter = asyncio.create_task(scheduler.acquire("anonymous"))
+        await _settle()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.status()["lanes"]["anonymous"]["queued"] == 0
+
+        scheduler.release("anonymous")
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_cancel_after_grant_hands_the_slot_on():
+    async def main():
+        scheduler = FairScheduler(1, {"anonymous": 1})
+        await scheduler.acquire("anonymous")
+        first = asyncio.create_task(scheduler.acquire("anonymous"))
+        second = asyncio.create_task(scheduler.acquire("anonymous"))
+        await _settle()
+
+        # The release grants the slot to first, which is cancelled before it resumes
+        scheduler.release("anonymous")
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+
+        await asyncio.wait_for(second, 1)
+        assert scheduler.in_flight == 1
+        assert scheduler.status()["lanes"]["anonymous"]["dispatched"] == 3
+
+    asyncio.run(main())
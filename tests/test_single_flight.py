@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from src.services.conversion import ConversionService
+from src.services.conversion_cache import ConversionCache
+from src.services.conversion_pool import set_deadline, time_budget
+from src.services.scheduler import current_lane, set_lane
+from src.services.single_flight import SingleFlight
+
+
+async def _settle() -> None:
+    # Let every ready task run up to its next await
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Work:
+    """A computation that runs until released, recording how it ended."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "result"
+
+
+def test_first_caller_cancelled_while_another_waits():
+    async def main():
+        flights, work = SingleFlight("test"), Work()
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await _settle()
+        first.cancel()
+        await _settle()
+        assert not work.cancelled
+        work.release.set()
+        assert await second == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert work.calls == 1
+        assert flights.status() == {"in_flight": 0, "started": 1, "coalesced": 1}
+
+    asyncio.run(main())
+
+
+def test_last_caller_cancelled_cancels_the_shared_task():
+    async def main():
+        flights, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(2)]
+        await _settle()
+        for caller in callers:
+            caller.cancel()
+            await _settle()
+        assert work.cancelled
+        assert flights.status()["in_flight"] == 0
+        # The next caller starts afresh instead of joining the cancelled task
+        work.release.set()
+        assert await flights.do("key", work) == "result"
+        assert work.calls == 2
+
+    asyncio.run(main())
+
+
+def test_error_reaches_every_waiter():
+    async def main():
+        flights = SingleFlight("test")
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("broken input")
+
+        outcomes = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert len(calls) == 1
+        assert [type(outcome) for outcome in outcomes] == [ValueError] * 3
+        assert all(str(outcome) == "broken input" for outcome in outcomes)
+        assert flights.status()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+class FakePool:
+    """Records the lane and deadline each conversion ran with."""
+
+    workers = 1
+
+    def __init__(self):
+        self.runs = []
+
+    async def run(self, fn, *args):
+        self.runs.append((current_lane(), round(time_budget())))
+        await asyncio.sleep(0.05)
+        return "markdown"
+
+
+@pytest.mark.parametrize("callers, runs", [
+    ([("premium", 60), ("premium", 60)], [("premium", 60)]),
+    ([("premium", 60), ("anonymous", 60)], [("premium", 60), ("anonymous", 60)]),
+    ([("premium", 5), ("premium", 60)], [("premium", 5), ("premium", 60)]),
+])
+def test_conversions_are_only_shared_within_a_lane_and_deadline(callers, runs):
+    pool = FakePool()
+    service = ConversionService(pool, ConversionCache())
+
+    async def caller(lane: str, seconds: float) -> str:
+        set_lane(lane)
+        set_deadline(seconds)
+        return await service.convert(b"same content", "txt")
+
+    async def main():
+        return await asyncio.gather(*(caller(lane, seconds) for lane, seconds in callers))
+
+    assert asyncio.run(main()) == ["markdown"] * len(callers)
+    assert pool.runs == runs
@@ -0,0 +1,22 @@
+import pytest
+
+from src.services.converters import InvalidConversionOptions
+from src.services.spreadsheet_converters import parse_cell_range
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("B2:F100", (2, 2, 6, 100)),
+    ("A:D", (1, None, 4, None)),
+    ("3:50", (None, 3, None, 50)),
+    ("C7", (3, 7, 3, 7)),
+    ("$a$1:$b$2", (1, 1, 2, 2)),
+    ("AA1:AB", (27, 1, 28, None)),
+])
+def test_parse_cell_range(value, expected):
+    assert parse_cell_range(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "F1:B1", "A9:A2", "A1:B2:C3", "1A", "ABCD1"])
+def test_parse_cell_range_rejects_bad_ranges(value):
+    with pytest.raises(InvalidConversionOptions):
+        parse_cell_range(value)
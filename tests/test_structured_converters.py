@@ -0,0 +1,104 @@
+import io
+import json
+
+import pytest
+
+from src.services.structured_converters import (
+    NotTabular, convert_structured, format_cell, iter_json_array, xml_to_markdown,
+)
+
+VALUES = [123456, 'a "quoted" string', {"k": [1, 2.5]}, True, None, 1.5e3, -0.25, 1e-7, "é☃", [], {}]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_iter_json_array_across_chunk_boundaries(chunk_size):
+    text = io.StringIO(json.dumps(VALUES))
+    assert list(iter_json_array(text, chunk_size=chunk_size)) == VALUES
+
+
+@pytest.mark.parametrize("document", ["[1 2]", "[1,", "[1.]", "[1,]", '[{"a": 1}, {"a": 2'])
+def test_iter_json_array_rejects_malformed_arrays(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(document), chunk_size=2))
+
+
+def test_iter_json_array_needs_an_array():
+    with pytest.raises(NotTabular):
+        list(iter_json_array(io.StringIO('{"a": 1}')))
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+
+@pytest.mark.parametrize("content", [b'[{"a": 1}, {"a": 2', b'{"a": 1}', b'[1, {"a": 2}]', b'[]', b'not json'])
+def test_json_that_is_not_a_table_falls_back_to_a_fenced_block(content):
+    assert convert_structured(content, 'json') == f"```json\n{content.decode()}\n```"
+
+
+def test_json_objects_become_rows():
+    content = b'[{"name": "a", "qty": 1}, {"name": "b", "extra": [1, 2]}]'
+    assert convert_structured(content, 'json') == (
+        "| name | qty | extra |\n"
+        "| ---- | --: | ----- |\n"
+        "| a    |   1 |       |\n"
+        "| b    |     | [1,2] |\n"
+    )
+
+
+@pytest.mark.parametrize("content", [
+    b"name,qty\nwidget,3\n",
+    b"name;qty\nwidget;3\n",
+    b"name\tqty\nwidget\t3\n",
+    b"name|qty\nwidget|3\n",
+])
+def test_csv_dialect_is_sniffed(content):
+    assert convert_structured(content, 'csv') == (
+        "| name   | qty |\n"
+        "| ------ | --: |\n"
+        "| widget |   3 |\n"
+    )
+
+
+def test_csv_quoted_delimiters_and_single_columns():
+    assert convert_structured(b'a,b\n"x, y",2\n', 'csv') == "| a    |   b |\n| ---- | --: |\n| x, y |   2 |\n"
+    # Nothing to sniff a delimiter from: one column per line
+    assert convert_structured(b"single\nvalue\n", 'csv') == "| single |\n| ------ |\n| value  |\n"
+
+
+def test_xml_records_are_flattened():
+    content = (
+        b'<items xmlns="urn:example">'
+        b'<item id="1"><name>A</name><tags><t>x</t><t>y</t></tags></item>'
+        b'<item id="2">plain text</item>'
+        b'</items>'
+    )
+    assert xml_to_markdown(io.BytesIO(content)) == (
+        "## item\n\n"
+        "| @id | name | tags | #text      |\n"
+        "| --: | ---- | ---- | ---------- |\n"
+        "|   1 | A    | x y  |            |\n"
+        "|   2 |      |      | plain text |\n"
+    )
+
+
+@pytest.mark.parametrize("content", [b"<doc><p>only one</p></doc>", b"<rss><channel/><channel/></rss>"])
+def test_xml_without_records_is_not_tabular(content):
+    with pytest.raises(NotTabular):
+        xml_to_markdown(io.BytesIO(content))
+
+
+def test_cells_escape_pipes_and_newlines():
+    assert format_cell("x|y\r\nz") == "x\\|y<br>z"
+    assert format_cell({"a": "b"}) == '{"a":"b"}'
+    assert format_cell(None) == ''
+    assert format_cell("a" * 10, 5) == "aaaa…"
+    assert convert_structured(b'[{"a": "x|y"}]', 'json') == "| a    |\n| ---- |\n| x\\|y |\n"
+
+
+def test_row_cap_adds_a_notice():
+    assert convert_structured(b"[1, 2, 3, 4]", 'json', max_rows=2) == (
+        "| value |\n| ----: |\n|     1 |\n|     2 |\n\n*Output truncated after 2 rows.*\n"
+    )
+
+
+def test_empty_input():
+    assert convert_structured(b"", 'csv') == ''
+    assert convert_structured(b"", 'json') == "```json\n\n```"
@@ -0,0 +1,54 @@
+import codecs
+
+import pytest
+
+from src.services.text_converters import convert_text, detect_encoding, fence, truncate
+
+GERMAN = "Größe und Übergröße, schön tschüß. " * 20
+
+
+@pytest.mark.parametrize("content, encoding", [
+    (codecs.BOM_UTF8 + b"abc", "utf-8-sig"),
+    ("abc".encode("utf-16"), "utf-16"),
+    ("abc".encode("utf-32"), "utf-32"),
+    ("plain ascii and ünïcode".encode("utf-8"), "utf-8"),
+])
+def test_detect_encoding_from_boms_and_utf8(content, encoding):
+    assert detect_encoding(content) == encoding
+
+
+def test_legacy_charsets_are_decoded():
+    # charset-normalizer (when installed) may name a compatible code page; the text is what matters
+    assert convert_text(GERMAN.encode("cp1252"), "txt") == GERMAN
+    assert convert_text("привет мир, как дела?".encode("utf-16"), "txt") == "привет мир, как дела?"
+
+
+def test_bom_and_crlf_are_normalized():
+    assert convert_text(codecs.BOM_UTF8 + b"hi\r\nthere", "md") == "hi\nthere"
+
+
+@pytest.mark.parametrize("extension, language", [("py", "python"), ("js", "javascript"), ("json", "json")])
+def test_code_is_fenced_with_its_language(extension, language):
+    assert convert_text(b"x = 1", extension) == f"```{language}\nx = 1\n```"
+
+
+@pytest.mark.parametrize("extension", ["txt", "md"])
+def test_prose_is_not_fenced(extension):
+    assert convert_text(b"# Title\n\ntext\n", extension) == "# Title\n\ntext\n"
+
+
+def test_fence_is_longer_than_any_backtick_run():
+    assert convert_text(b'x = "```"\nprint("````")', "py") == '`````python\nx = "```"\nprint("````")\n`````'
+    # Inline code (fewer than three backticks) needs no longer fence
+    assert fence("`a` and ``b``") == "```\n`a` and ``b``\n```"
+
+
+def test_truncation_cuts_at_a_line_and_reports_the_rest():
+    text = "line one\nline two\nline three\n"
+    assert truncate(text, 20) == ("line one\nline two", 12)
+    assert truncate(text, 0) == (text, 0)
+    assert convert_text(text.encode(), "txt", max_chars=20) == "line one\nline two\n\n[... truncated 12 characters ...]\n"
+
+
+def test_truncation_without_a_nearby_line_break():
+    assert convert_text(b"a" * 30, "js", max_chars=10) == "```javascript\naaaaaaaaaa\n```\n\n[... truncated 20 characters ...]\n"
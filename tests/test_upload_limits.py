@@ -0,0 +1,97 @@
+from typing import List
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("python_multipart")
+
+from fastapi import FastAPI, File, HTTPException, UploadFile  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.services.upload_limits import UploadLimitMiddleware, UploadTooLarge, file_extension, read_upload  # noqa: E402
+
+MAX_FILE_SIZE = 1024
+MAX_TOTAL_SIZE = 4096
+SUPPORTED = {"txt", "pdf"}
+
+
+def make_app() -> FastAPI:
+    """The conversion routes' upload handling, registered as in src/main.py."""
+    app = FastAPI()
+
+    @app.post("/convert-file/")
+    async def convert_file(file: UploadFile = File(...)):
+        if file_extension(file.filename) not in SUPPORTED:
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+        content = await read_upload(file, MAX_FILE_SIZE)
+        return {"size": len(content)}
+
+    @app.post("/convert-to-markdown/")
+    async def convert_files(files: List[UploadFile] = File(...)):
+        results, errors = {}, {}
+        for file in files:
+            if file_extension(file.filename) not in SUPPORTED:
+                errors[file.filename] = "Unsupported file type"
+                continue
+            try:
+                results[file.filename] = len(await read_upload(file, MAX_FILE_SIZE))
+            except UploadTooLarge as e:
+                errors[file.filename] = e.detail
+        return {"results": results, "errors": errors}
+
+    app.add_middleware(
+        UploadLimitMiddleware,
+        paths=["/convert-file/"],
+        max_total_size=MAX_TOTAL_SIZE,
+        max_file_size=MAX_FILE_SIZE,
+        allowed_extensions=SUPPORTED,
+    )
+    app.add_middleware(UploadLimitMiddleware, paths=["/convert-to-markdown/"], max_total_size=MAX_TOTAL_SIZE)
+    return app
+
+
+@pytest.fixture
+def client():
+    return TestClient(make_app())
+
+
+def test_single_file_within_limits(client):
+    response = client.post("/convert-file/", files={"file": ("a.txt", b"x" * 100)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_single_file_oversized_part_is_refused(client):
+    response = client.post("/convert-file/", files={"file": ("a.txt", b"x" * (MAX_FILE_SIZE + 1))})
+    assert response.status_code == 413
+    assert "File too large" in response.json()["detail"]
+
+
+def test_single_file_disallowed_extension_is_refused(client):
+    response = client.post("/convert-file/", files={"file": ("a.exe", b"MZ")})
+    assert response.status_code == 400
+    assert "Unsupported file type: exe" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("path", ["/convert-file/", "/convert-to-markdown/"])
+def test_content_length_over_the_limit_is_refused_unread(client, path):
+    body = b"x" * (MAX_TOTAL_SIZE + 70 * 1024)
+    response = client.post(path, content=body, headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 413
+    assert "Upload too large" in response.json()["detail"]
+
+
+def test_batch_reports_bad_files_and_converts_the_rest(client):
+    files = [
+        ("files", ("good.txt", b"x" * 100)),
+        ("files", ("big.pdf", b"x" * (MAX_FILE_SIZE + 1))),
+        ("files", ("virus.exe", b"MZ")),
+        ("files", ("other.pdf", b"y" * 10)),
+    ]
+    response = client.post("/convert-to-markdown/", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["results"] == {"good.txt": 100, "other.pdf": 10}
+    assert set(body["errors"]) == {"big.pdf", "virus.exe"}
+    assert "File too large" in body["errors"]["big.pdf"]